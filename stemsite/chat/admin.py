@@ -12,6 +12,9 @@ class ChatMessageInline(admin.TabularInline):
     can_delete = False
     show_change_link = True
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('sender', 'receiver')
+
 # -----------------------------
 # ChatRoom Admin
 # -----------------------------
@@ -20,6 +23,10 @@ class ChatRoomAdmin(admin.ModelAdmin):
     list_display = ('name', 'participant_list')
     inlines = [ChatMessageInline]
 
+    def get_queryset(self, request):
+        # One prefetch for the whole changelist page instead of a query per row
+        return super().get_queryset(request).prefetch_related('participants')
+
     def participant_list(self, obj):
         return ", ".join([user.username for user in obj.participants.all()]) or "No participants"
     participant_list.short_description = 'Participants'
@@ -38,6 +45,7 @@ class ChatMessageAdmin(admin.ModelAdmin):
         'reply_link',  # Add reply column
     )
     readonly_fields = ('room', 'sender', 'receiver', 'guest_name', 'content', 'timestamp')
+    list_select_related = ('room', 'sender', 'receiver')
 
     # Show "Guest" when guest sends
     def display_sender(self, obj):
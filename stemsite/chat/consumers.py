@@ -1,12 +1,37 @@
 import json
+import asyncio
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
-# Track online admins safely
-online_admins = set()
+from .presence import get_presence, HEARTBEAT_INTERVAL
+from .message_buffer import message_buffer, WRITE_BEHIND
+from .utils import student_room_name
+
+logger = logging.getLogger(__name__)
+
+# The admin account never changes while the process runs: look it up once
+_NOT_LOADED = object()
+_admin_user_id = _NOT_LOADED
+
+
+async def get_admin_user_id():
+    """Process-wide cached id of the "admin" user (None if it does not exist)."""
+    global _admin_user_id
+    if _admin_user_id is _NOT_LOADED:
+        _admin_user_id = await _load_admin_user_id()
+    return _admin_user_id
+
+
+@database_sync_to_async
+def _load_admin_user_id():
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.filter(username="admin").values_list("id", flat=True).first()
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    # settings.CHAT_WRITE_BEHIND: broadcast first, persist in batches
+    write_behind = WRITE_BEHIND
 
     async def connect(self):
         user = self.scope["user"]
@@ -16,164 +41,174 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # -------------------------------
         raw_room = self.scope["url_route"]["kwargs"]["room_name"].lower()
 
+        # Who is on this socket is fixed for its whole life
+        if not user.is_authenticated:
+            self.role = "guest"
+        elif user.username == "admin":
+            self.role = "admin"
+        else:
+            self.role = "student"
+
         # Force student_<username>_admin format for all students
-        if user.is_authenticated and user.username != "admin":
-            self.room_name = f"student_{user.username.lower()}_admin"
+        if self.role == "student":
+            self.room_name = student_room_name(user.username)
         else:
             # guests or admin connection
             self.room_name = raw_room
 
         self.room_group_name = f"chat_{self.room_name}"
 
+        # Resolved once, then reused for every message on this socket
+        self.room_id = None
+        self.receiver_id = None
+        self.guest_name = None
+        self.heartbeat_task = None
+
         # Join the unified room
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
         # Guests join the guest notification group
-        if not user.is_authenticated:
+        if self.role == "guest":
             await self.channel_layer.group_add("chat_guests", self.channel_name)
+            # Room is created on the first message, not on every widget open
+            self.guest_name = self.room_name[:-len("_admin")] if self.room_name.endswith("_admin") else self.room_name
 
         # Ensure student room exists
-        if user.is_authenticated and user.username != "admin":
-            from .models import ChatRoom
-            room, _ = await database_sync_to_async(ChatRoom.objects.get_or_create)(
-                name=self.room_name
-            )
-            await database_sync_to_async(lambda: room.participants.add(user))()
+        if self.role == "student":
+            self.room_id = await self.get_or_create_student_room(user)
 
         await self.accept()
 
-        # Admin online tracking
-        if user.is_authenticated and user.username == "admin":
-            online_admins.add(self.channel_name)
+        # Admin online tracking (shared across workers, see chat/presence.py)
+        if self.role == "admin":
+            came_online = await get_presence().admin_connected(self.channel_name)
+            self.heartbeat_task = asyncio.create_task(self.presence_heartbeat())
 
-            # Notify all guests/students
-            await self.channel_layer.group_send(
-                "chat_guests",
-                {"type": "admin_status", "online": True}
-            )
+            # Notify all guests/students, only when the status actually changes
+            if came_online:
+                await self.channel_layer.group_send(
+                    "chat_guests",
+                    {"type": "admin_status", "online": True}
+                )
 
         # Send current admin status
         await self.send(json.dumps({
             "type": "admin_status",
-            "online": bool(online_admins)
+            "online": await get_presence().ais_admin_online()
         }))
 
     async def disconnect(self, close_code):
-        user = self.scope["user"]
-
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
-        if not user.is_authenticated:
+        if self.role == "guest":
             await self.channel_layer.group_discard("chat_guests", self.channel_name)
 
-        if user.is_authenticated and user.username == "admin":
-            if self.channel_name in online_admins:
-                online_admins.remove(self.channel_name)
+        if self.role == "admin":
+            if self.heartbeat_task:
+                self.heartbeat_task.cancel()
 
-            if not online_admins:
+            if await get_presence().admin_disconnected(self.channel_name):
                 await self.channel_layer.group_send(
                     "chat_guests",
                     {"type": "admin_status", "online": False}
                 )
 
+        # Nothing this socket sent may stay only in memory
+        if self.write_behind:
+            await message_buffer.flush()
+
+    async def presence_heartbeat(self):
+        """Keep this admin socket's presence alive while it stays connected."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await get_presence().heartbeat(self.channel_name)
+            except Exception as e:
+                logger.error(f"[CHAT PRESENCE ❌] heartbeat failed: {e}")
+
     async def receive(self, text_data):
         data = json.loads(text_data)
         message = data.get("message")
-        sender_type = data.get("sender_type")
-        sender_code = data.get("sender")
-
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        from .models import ChatRoom, ChatMessage
+        if not message:
+            return
 
         # -------------------------------
         # GUEST → ADMIN
         # -------------------------------
-        if sender_type == "guest":
-            guest_id = sender_code
-            admin = await self.get_admin_user()
-            room = await self.get_or_create_guest_room(guest_id)
-
-            await self.save_message(
-                room=room,
-                sender=None,
-                receiver=admin,
+        if self.role == "guest":
+            if self.room_id is None:
+                self.room_id = await self.get_or_create_room(self.room_name)
+
+            await self.save_and_broadcast(
+                {"type": "chat_message", "message": message, "sender": self.guest_name},
+                sender_id=None,
+                receiver_id=await get_admin_user_id(),
                 content=message,
-                guest_name=guest_id,
-                message_type="guest"
-            )
-
-            await self.channel_layer.group_send(
-                f"chat_{room.name}",
-                {"type": "chat_message", "message": message, "sender": guest_id}
+                guest_name=self.guest_name,
+                message_type="guest",
             )
             return
 
         # -------------------------------
         # STUDENT → ADMIN
         # -------------------------------
-        if sender_type == "student":
-            try:
-                student = await database_sync_to_async(User.objects.get)(username=sender_code)
-            except User.DoesNotExist:
-                await self.send(json.dumps({"error": "Student not found"}))
-                return
-
-            admin = await self.get_admin_user()
-            room = await self.get_or_create_student_room(student)
-
-            await self.save_message(
-                room=room,
-                sender=student,
-                receiver=admin,
+        if self.role == "student":
+            user = self.scope["user"]
+            await self.save_and_broadcast(
+                {"type": "chat_message", "message": message, "sender": user.username},
+                sender_id=user.id,
+                receiver_id=await get_admin_user_id(),
                 content=message,
                 guest_name=None,
-                message_type="student"
-            )
-
-            # Broadcast to normalized lowercase group
-            await self.channel_layer.group_send(
-                f"chat_{room.name.lower()}",
-                {"type": "chat_message", "message": message, "sender": student.username}
+                message_type="student",
             )
             return
 
         # -------------------------------
         # ADMIN → STUDENT/GUEST
         # -------------------------------
-        if sender_type == "admin":
-            admin = await self.get_admin_user()
-
-            try:
-                room = await database_sync_to_async(ChatRoom.objects.get)(name=self.room_name)
-            except ChatRoom.DoesNotExist:
-                await self.send(json.dumps({"error": "Room not found"}))
-                return
-
-            participants = await database_sync_to_async(
-                lambda: list(room.participants.exclude(username="admin"))
-            )()
-
-            if participants:
-                receiver = participants[0]
-                guest_name = None
-            else:
-                guest_name = self.room_name.replace("_admin", "")
-                receiver = None
-
-            await self.save_message(
-                room=room,
-                sender=admin,
-                receiver=receiver,
+        if self.role == "admin":
+            if self.room_id is None:
+                self.room_id = await self.get_room_id(self.room_name)
+                if self.room_id is None:
+                    await self.send(json.dumps({"error": "Room not found"}))
+                    return
+
+            # Student rooms have a participant; guest rooms never do
+            if self.receiver_id is None and not self.room_name.startswith("guest_"):
+                self.receiver_id = await self.get_room_participant_id(self.room_id)
+
+            guest_name = None if self.receiver_id else self.room_name.replace("_admin", "")
+
+            await self.save_and_broadcast(
+                {"type": "chat_message", "message": message, "sender": "admin"},
+                sender_id=self.scope["user"].id,
+                receiver_id=self.receiver_id,
                 content=message,
                 guest_name=guest_name,
-                message_type="admin"
+                message_type="admin",
             )
 
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {"type": "chat_message", "message": message, "sender": "admin"}
-            )
+    async def save_and_broadcast(self, event, **fields):
+        """
+        Broadcast and persist concurrently: the INSERT runs in the DB thread
+        pool while group_send goes out, so delivery never waits on the database.
+        In write-behind mode the row is only queued for the next bulk flush.
+        """
+        if self.write_behind:
+            from .models import ChatMessage
+            await self.channel_layer.group_send(self.room_group_name, event)
+            message_buffer.add(ChatMessage(room_id=self.room_id, is_read=False, **fields))
+            return
+
+        results = await asyncio.gather(
+            self.channel_layer.group_send(self.room_group_name, event),
+            self.save_message(room_id=self.room_id, **fields),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"[CHAT ❌] {self.room_name}: {result}")
 
     # ==============================
     # Event Handlers
@@ -195,34 +230,43 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # DB Helpers
     # ==============================
     @database_sync_to_async
-    def get_admin_user(self):
-        from django.contrib.auth import get_user_model
-        return get_user_model().objects.get(username="admin")
+    def get_or_create_room(self, room_name):
+        from .models import ChatRoom
+        return ChatRoom.objects.get_or_create(name=room_name)[0].id
+
+    @database_sync_to_async
+    def get_room_id(self, room_name):
+        from .models import ChatRoom
+        return ChatRoom.objects.filter(name=room_name).values_list("id", flat=True).first()
 
     @database_sync_to_async
-    def get_or_create_guest_room(self, guest_id):
+    def get_room_participant_id(self, room_id):
         from .models import ChatRoom
-        room_name = f"{guest_id}_admin"
-        return ChatRoom.objects.get_or_create(name=room_name)[0]
+        return (
+            ChatRoom.participants.through.objects.filter(chatroom_id=room_id)
+            .exclude(user__username="admin")
+            .values_list("user_id", flat=True)
+            .first()
+        )
 
     @database_sync_to_async
     def get_or_create_student_room(self, student):
         from .models import ChatRoom
-        room_name = f"student_{student.username}_admin".lower()
+        room_name = student_room_name(student.username)
         room, _ = ChatRoom.objects.get_or_create(name=room_name)
         room.participants.add(student)
-        return room
+        return room.id
 
     @database_sync_to_async
-    def save_message(self, room, sender, receiver, content, guest_name, message_type):
+    def save_message(self, room_id, sender_id, receiver_id, content, guest_name, message_type):
         from .models import ChatMessage
+        # Ids only: a single INSERT, no lookups
         return ChatMessage.objects.create(
-            room=room,
-            sender=sender,
-            receiver=receiver,
+            room_id=room_id,
+            sender_id=sender_id,
+            receiver_id=receiver_id,
             content=content,
             guest_name=guest_name,
             message_type=message_type,
             is_read=False
         )
-
@@ -0,0 +1,100 @@
+import json
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+
+from chat.consumers import ChatConsumer
+from chat.message_buffer import message_buffer
+from chat.models import ChatMessage, ChatRoom
+
+BENCH_ROOM = "guest_benchfanout_admin"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure chat fan-out latency (send on one socket -> receive on another) "
+        "with and without write-behind persistence. Uses the configured database "
+        "and channel layer; bench rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500, help="Messages per run.")
+        parser.add_argument("--listeners", type=int, default=5, help="Sockets receiving each message.")
+        parser.add_argument("--warmup", type=int, default=10,
+                            help="Messages sent first and left out of the stats (room creation, lookups).")
+        parser.add_argument("--db-latency-ms", type=float, default=0,
+                            help="Add this much latency to every SQL statement (simulates a remote Postgres).")
+
+    def handle(self, *args, **options):
+        if options["db_latency_ms"]:
+            delay = options["db_latency_ms"] / 1000
+
+            def slow_execute(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+
+            def add_latency(sender, connection, **kwargs):
+                connection.execute_wrappers.append(slow_execute)
+
+            connection_created.connect(add_latency, weak=False)
+
+        try:
+            for write_behind in (False, True):
+                samples = async_to_sync(self.run)(
+                    write_behind, options["messages"], options["listeners"], options["warmup"]
+                )
+                label = "write-behind" if write_behind else "insert per message"
+                self.stdout.write(
+                    f"{label:<20} p50={percentile(samples, 50):7.2f} ms  "
+                    f"p99={percentile(samples, 99):7.2f} ms  "
+                    f"max={max(samples):7.2f} ms  mean={statistics.mean(samples):7.2f} ms"
+                )
+        finally:
+            ChatRoom.objects.filter(name=BENCH_ROOM).delete()
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f"/ws/chat/{BENCH_ROOM}/")
+        communicator.scope["user"] = AnonymousUser()
+        communicator.scope["url_route"] = {"kwargs": {"room_name": BENCH_ROOM}}
+        connected, _ = await communicator.connect()
+        assert connected
+        await communicator.receive_from()  # initial admin_status
+        return communicator
+
+    async def run(self, write_behind, count, listeners, warmup):
+        ChatConsumer.write_behind = write_behind
+        await ChatRoom.objects.filter(name=BENCH_ROOM).adelete()
+        sender = await self.connect()
+        receivers = [await self.connect() for _ in range(listeners)]
+
+        samples = []
+        for i in range(warmup + count):
+            started = time.perf_counter()
+            await sender.send_to(text_data=json.dumps({"message": f"bench {i}", "sender_type": "guest"}))
+            for receiver in receivers:
+                while True:
+                    data = json.loads(await receiver.receive_from(timeout=10))
+                    if data.get("type") == "chat_message":
+                        break
+            if i >= warmup:
+                samples.append((time.perf_counter() - started) * 1000)
+            await sender.receive_from(timeout=10)  # sender's own echo
+
+        for communicator in [sender, *receivers]:
+            await communicator.disconnect()
+        await message_buffer.flush()
+
+        saved = await ChatMessage.objects.filter(room__name=BENCH_ROOM).acount()
+        self.stdout.write(f"  ({saved} of {warmup + count} messages saved)")
+        return samples
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from chat.models import ChatRoom
+
+
+def guest_room_names(guest_id):
+    # Guest ids look like "guest_ab12cd34" (room "<id>_admin"); sessions
+    # from before the guest cookie hold the bare hex (room "guest_<id>_admin").
+    return {f"{guest_id}_admin", f"guest_{guest_id}_admin"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete guest-only sessions and guest_*_admin chat rooms that never received a message "
+        "(or, with --inactive-days, that have been silent that long)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+        parser.add_argument("--inactive-days", type=int, default=None,
+                            help="Also prune guest rooms whose last message is older than this.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per DELETE.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        batch_size = options["batch_size"]
+
+        # ------------------ Guest rooms ------------------
+        rooms = (
+            ChatRoom.objects.filter(name__startswith="guest_", name__endswith="_admin")
+            .annotate(last_message_at=Max("messages__timestamp"))
+            .values_list("id", "name", "last_message_at")
+        )
+        cutoff = None
+        if options["inactive_days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["inactive_days"])
+
+        prune_room_ids, kept_rooms = [], set()
+        for room_id, name, last_message_at in rooms.iterator(chunk_size=batch_size):
+            if last_message_at is None or (cutoff and last_message_at < cutoff):
+                prune_room_ids.append(room_id)
+            else:
+                kept_rooms.add(name)
+
+        # ------------------ Guest-only sessions ------------------
+        # Sessions created by the old context processor hold nothing but a
+        # guest_id; keep the ones whose guest still has a live conversation.
+        prune_session_keys = []
+        sessions = Session.objects.only("session_key", "session_data")
+        for session in sessions.iterator(chunk_size=batch_size):
+            data = session.get_decoded()
+            if set(data) != {"guest_id"}:
+                continue
+            if guest_room_names(data["guest_id"]) & kept_rooms:
+                continue
+            prune_session_keys.append(session.session_key)
+
+        self.stdout.write(
+            f"Guest chat rooms to prune: {len(prune_room_ids)} | "
+            f"guest-only sessions to prune: {len(prune_session_keys)}"
+        )
+        if dry_run:
+            return
+
+        for start in range(0, len(prune_room_ids), batch_size):
+            ChatRoom.objects.filter(id__in=prune_room_ids[start:start + batch_size]).delete()
+        for start in range(0, len(prune_session_keys), batch_size):
+            Session.objects.filter(session_key__in=prune_session_keys[start:start + batch_size]).delete()
+
+        self.stdout.write(self.style.SUCCESS("Guest chat cleanup done."))
@@ -0,0 +1,95 @@
+# chat/message_buffer.py
+
+import asyncio
+import atexit
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Optional write-behind for ChatMessage rows (settings.CHAT_WRITE_BEHIND).
+# Messages are broadcast first and queued here; the queue is written with
+# one bulk_create every FLUSH_INTERVAL_MS or as soon as FLUSH_BATCH_SIZE
+# messages are waiting, whichever comes first. Consumers flush on
+# disconnect and the process flushes whatever is left on exit.
+WRITE_BEHIND = getattr(settings, "CHAT_WRITE_BEHIND", False)
+FLUSH_INTERVAL_MS = getattr(settings, "CHAT_WRITE_BEHIND_INTERVAL_MS", 200)
+FLUSH_BATCH_SIZE = getattr(settings, "CHAT_WRITE_BEHIND_BATCH_SIZE", 100)
+
+# A failing database must not grow the queue forever
+MAX_PENDING = FLUSH_BATCH_SIZE * 50
+
+
+def _bulk_insert(messages):
+    from .models import ChatMessage
+    ChatMessage.objects.bulk_create(messages, batch_size=FLUSH_BATCH_SIZE)
+
+
+class MessageBuffer:
+
+    def __init__(self, interval_ms=FLUSH_INTERVAL_MS, batch_size=FLUSH_BATCH_SIZE):
+        self.interval = interval_ms / 1000
+        self.batch_size = batch_size
+        self.pending = []
+        self.timer = None
+        self.lock = None
+        self.loop = None
+
+    def _bind_loop(self):
+        # Timer and lock belong to the event loop that is serving consumers
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.lock = asyncio.Lock()
+            self.timer = None
+        return loop
+
+    def add(self, message):
+        """Queue an unsaved ChatMessage. Never waits on the database."""
+        self.pending.append(message)
+        loop = self._bind_loop()
+
+        if len(self.pending) >= self.batch_size:
+            loop.create_task(self.flush())
+        elif self.timer is None:
+            self.timer = loop.call_later(self.interval, lambda: loop.create_task(self.flush()))
+
+    async def flush(self):
+        """Write everything queued so far with bulk_create."""
+        self._bind_loop()
+
+        async with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+
+            try:
+                await database_sync_to_async(_bulk_insert)(batch)
+            except Exception as e:
+                logger.error(f"[CHAT WRITE-BEHIND ❌] {len(batch)} message(s) not saved, will retry: {e}")
+                self.pending = (batch + self.pending)[-MAX_PENDING:]
+                if self.pending and self.timer is None:
+                    loop = self.loop
+                    self.timer = loop.call_later(self.interval, lambda: loop.create_task(self.flush()))
+                return 0
+
+        return len(batch)
+
+    def flush_sync(self):
+        """Last-chance flush at interpreter exit (no event loop running)."""
+        batch, self.pending = self.pending, []
+        if batch:
+            try:
+                _bulk_insert(batch)
+            except Exception as e:
+                logger.error(f"[CHAT WRITE-BEHIND ❌] {len(batch)} message(s) lost at shutdown: {e}")
+
+
+message_buffer = MessageBuffer()
+atexit.register(message_buffer.flush_sync)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatmessage_room_timestamp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['room'], name='chatmsg_room_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Student rooms: one lowercase room per student, as the consumer names them
+
+from django.db import migrations
+
+
+def merge_mixed_case_rooms(apps, schema_editor):
+    """
+    The AJAX views used to create student_<Username>_admin next to the
+    consumer's student_<username>_admin. Move the messages and participants
+    of each mixed-case room into the lowercase one and drop it.
+    """
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+
+    for room in ChatRoom.objects.filter(name__startswith='student_').order_by('pk'):
+        name = room.name.lower()
+        if room.name == name:
+            continue
+        target, _ = ChatRoom.objects.get_or_create(name=name)
+        ChatMessage.objects.filter(room=room).update(room=target)
+        target.participants.add(*room.participants.all())
+        room.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_chatmessage_unread_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_mixed_case_rooms, migrations.RunPython.noop),
+    ]
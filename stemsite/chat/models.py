@@ -38,6 +38,14 @@ class ChatMessage(models.Model):
         default="guest"
     )
 
+    class Meta:
+        indexes = [
+            # Keyset paging of a room's history: WHERE room = ? ORDER BY timestamp, id
+            models.Index(fields=["room", "timestamp", "id"], name="chatmsg_room_ts_id_idx"),
+            # Inbox unread counts only ever look at the unread rows of a room
+            models.Index(fields=["room"], condition=models.Q(is_read=False), name="chatmsg_room_unread_idx"),
+        ]
+
     def __str__(self):
         sender_name = self.sender.username if self.sender else self.guest_name or "Unknown"
         receiver_name = self.receiver.username if self.receiver else "Admin"
@@ -0,0 +1,148 @@
+# chat/presence.py
+
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Admin presence shared by every worker process.
+#
+# Each admin socket is a member of a Redis sorted set scored by its expiry
+# time and refreshes itself with a heartbeat. A separate "online" key with
+# the same TTL is refreshed alongside, so the status lookup used by views
+# and consumers is a single EXISTS. If a worker dies without a disconnect,
+# its heartbeats stop and the admin shows offline after PRESENCE_TTL.
+PRESENCE_TTL = getattr(settings, "CHAT_PRESENCE_TTL", 60)
+HEARTBEAT_INTERVAL = PRESENCE_TTL / 3
+
+ADMINS_KEY = "chat:presence:admins"
+ONLINE_KEY = "chat:presence:online"
+
+# Drop the socket and, if it was the last live one, the online key, as one
+# step: a connect from another worker can never land between the count
+# and the delete and have its fresh online key removed.
+DISCONNECT_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local remaining = redis.call('ZCARD', KEYS[1])
+if remaining == 0 then
+    redis.call('DEL', KEYS[2])
+end
+return remaining
+"""
+
+
+class MemoryPresence:
+    """Single-process fallback (tests, InMemoryChannelLayer, local dev)."""
+
+    def __init__(self):
+        self.admins = {}
+
+    def _live(self):
+        now = time.time()
+        self.admins = {name: expires for name, expires in self.admins.items() if expires > now}
+        return self.admins
+
+    async def admin_connected(self, channel_name):
+        """Register an admin socket; True if the admin just came online."""
+        was_online = bool(self._live())
+        self.admins[channel_name] = time.time() + PRESENCE_TTL
+        return not was_online
+
+    async def heartbeat(self, channel_name):
+        self.admins[channel_name] = time.time() + PRESENCE_TTL
+
+    async def admin_disconnected(self, channel_name):
+        """Drop an admin socket; True if no admin is left online."""
+        self.admins.pop(channel_name, None)
+        return not self._live()
+
+    async def ais_admin_online(self):
+        return self.is_admin_online()
+
+    def is_admin_online(self):
+        return bool(self._live())
+
+
+class RedisPresence:
+    """Presence in the Redis that already backs CHANNEL_LAYERS."""
+
+    def __init__(self, url):
+        self.url = url
+        self._async_client = None
+        self._sync_client = None
+        self._disconnect_script = None
+
+    @property
+    def aredis(self):
+        if self._async_client is None:
+            import redis.asyncio
+            self._async_client = redis.asyncio.Redis.from_url(self.url)
+        return self._async_client
+
+    @property
+    def redis(self):
+        if self._sync_client is None:
+            import redis
+            self._sync_client = redis.Redis.from_url(self.url)
+        return self._sync_client
+
+    async def _touch(self, channel_name):
+        now = time.time()
+        async with self.aredis.pipeline(transaction=True) as pipe:
+            pipe.zadd(ADMINS_KEY, {channel_name: now + PRESENCE_TTL})
+            pipe.zremrangebyscore(ADMINS_KEY, "-inf", now)
+            pipe.expire(ADMINS_KEY, PRESENCE_TTL)
+            pipe.exists(ONLINE_KEY)
+            pipe.set(ONLINE_KEY, 1, ex=PRESENCE_TTL)
+            results = await pipe.execute()
+        return bool(results[-2])  # the online key already existed
+
+    async def admin_connected(self, channel_name):
+        was_online = await self._touch(channel_name)
+        return not was_online
+
+    async def heartbeat(self, channel_name):
+        await self._touch(channel_name)
+
+    async def admin_disconnected(self, channel_name):
+        if self._disconnect_script is None:
+            self._disconnect_script = self.aredis.register_script(DISCONNECT_SCRIPT)
+        remaining = await self._disconnect_script(keys=[ADMINS_KEY, ONLINE_KEY], args=[channel_name, time.time()])
+        return not remaining
+
+    async def ais_admin_online(self):
+        return bool(await self.aredis.exists(ONLINE_KEY))
+
+    def is_admin_online(self):
+        return bool(self.redis.exists(ONLINE_KEY))
+
+
+def _build_presence():
+    backend = getattr(settings, "CHAT_PRESENCE_BACKEND", None)
+    if backend is None:
+        layer = settings.CHANNEL_LAYERS.get("default", {}).get("BACKEND", "")
+        backend = "redis" if "Redis" in layer else "memory"
+
+    if backend == "redis":
+        return RedisPresence(getattr(settings, "REDIS_URL", "redis://127.0.0.1:6379"))
+    return MemoryPresence()
+
+
+_presence = None
+
+
+def get_presence():
+    """The presence backend for the current settings (built on first use)."""
+    global _presence
+    if _presence is None:
+        _presence = _build_presence()
+    return _presence
+
+
+@receiver(setting_changed)
+def _reset_presence(setting, **kwargs):
+    global _presence
+    if setting in ("CHAT_PRESENCE_BACKEND", "CHANNEL_LAYERS", "REDIS_URL"):
+        _presence = None
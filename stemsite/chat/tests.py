@@ -1,3 +1,374 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timezone as dt_timezone
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import presence as presence_module
+from .models import ChatMessage, ChatRoom
+from .presence import PRESENCE_TTL, MemoryPresence, RedisPresence
+from .utils import GUEST_COOKIE_NAME, GUEST_COOKIE_SALT, student_room_name
+from .views import _decode_cursor, _encode_cursor
+
+User = get_user_model()
+
+
+#---------------------Index Usage---------------------
+class ChatIndexUsageTests(TestCase):
+    """History paging and inbox unread counts must read their indexes."""
+
+    def setUp(self):
+        rooms = ChatRoom.objects.bulk_create(ChatRoom(name=f"guest_{i:04x}_admin") for i in range(50))
+        self.room = rooms[0]
+        ChatMessage.objects.bulk_create(
+            ChatMessage(room=room, content=f"hello {i}", guest_name="guest", is_read=bool(i % 2))
+            for room in rooms
+            for i in range(20)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"{index_name} not used:\n{plan}")
+
+    def test_room_history_page(self):
+        self.assertUsesIndex(
+            ChatMessage.objects.filter(room=self.room).order_by("-timestamp", "-id")[:50],
+            "chatmsg_room_ts_id_idx",
+        )
+
+    def test_room_unread_count(self):
+        self.assertUsesIndex(
+            ChatMessage.objects.filter(room=self.room, is_read=False).values("id"),
+            "chatmsg_room_unread_idx",
+        )
+
+
+#---------------------History Paging---------------------
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatHistoryTests(TestCase):
+    """Keyset cursors, and one lowercase student room for every reader and writer."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="pass")
+        self.student = User.objects.create_user(username="Dayo", password="pass")
+        self.room = ChatRoom.objects.create(name="student_dayo_admin")
+        ChatMessage.objects.bulk_create(
+            ChatMessage(room=self.room, sender=self.student, receiver=self.admin,
+                        content=f"m{i}", message_type="student")
+            for i in range(1, 6)
+        )
+        # Same instant for every message: only the id breaks the tie
+        self.moment = datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc)
+        ChatMessage.objects.filter(room=self.room).update(timestamp=self.moment)
+        self.ids = list(ChatMessage.objects.filter(room=self.room).order_by("id").values_list("id", flat=True))
+        self.client.force_login(self.student)
+
+    def load(self, **params):
+        response = self.client.get(reverse("load_messages"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_round_trip(self):
+        cursor = _encode_cursor({"timestamp": self.moment, "id": 42})
+        self.assertEqual(_decode_cursor(cursor), (self.moment, 42))
+
+    def test_malformed_cursor(self):
+        for cursor in ("abc", "12", "1-x", "-5-3", None):
+            self.assertIsNone(_decode_cursor(cursor), cursor)
+        response = self.client.get(reverse("load_messages"), {"before": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_before_pages_back_through_equal_timestamps(self):
+        page = self.load(limit=2)
+        self.assertEqual([m["message"] for m in page["messages"]], ["m4", "m5"])
+        self.assertTrue(page["has_more"])
+
+        page = self.load(limit=2, before=page["before"])
+        self.assertEqual([m["message"] for m in page["messages"]], ["m2", "m3"])
+        self.assertTrue(page["has_more"])
+
+        page = self.load(limit=2, before=page["before"])
+        self.assertEqual([m["message"] for m in page["messages"]], ["m1"])
+        self.assertFalse(page["has_more"])
+
+    def test_since_polls_past_equal_timestamps(self):
+        cursor = _encode_cursor({"timestamp": self.moment, "id": self.ids[2]})
+        page = self.load(limit=1, since=cursor)
+        self.assertEqual([m["message"] for m in page["messages"]], ["m4"])
+        self.assertTrue(page["has_more"])
+
+        page = self.load(limit=1, since=page["since"])
+        self.assertEqual([m["message"] for m in page["messages"]], ["m5"])
+        self.assertFalse(page["has_more"])
+
+        page = self.load(since=page["since"])
+        self.assertEqual(page["messages"], [])
+        self.assertFalse(page["has_more"])
+
+    def test_mixed_case_username_shares_one_room(self):
+        self.assertEqual(student_room_name("Dayo"), "student_dayo_admin")
+        response = self.client.post(
+            reverse("send_chat_message"), json.dumps({"message": "hello"}), content_type="application/json"
+        )
+        self.assertTrue(response.json()["success"])
+        self.assertFalse(ChatRoom.objects.filter(name="student_Dayo_admin").exists())
+        self.assertEqual(self.load()["messages"][-1]["message"], "hello")
+
+        self.client.force_login(self.admin)
+        self.client.post(reverse("admin_reply_chat", args=[self.room.name]), {"message": "hi Dayo"})
+        reply = ChatMessage.objects.get(content="hi Dayo")
+        self.assertEqual(reply.room, self.room)
+        self.assertEqual(reply.receiver, self.student)
+
+    def test_admin_reply_rejects_malformed_cursor(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("admin_reply_chat", args=[self.room.name]), {"before": "abc"})
+        self.assertEqual(response.status_code, 400)
+        # A rejected request does not mark the room read
+        self.assertEqual(ChatMessage.objects.filter(room=self.room, is_read=False).count(), 5)
+
+    def test_legacy_mixed_case_room_is_merged(self):
+        legacy = ChatRoom.objects.create(name="student_Dayo_admin")
+        legacy.participants.add(self.student)
+        ChatMessage.objects.create(room=legacy, sender=self.student, content="old", message_type="student")
+
+        import_module("chat.migrations.0007_lowercase_student_rooms").merge_mixed_case_rooms(apps, None)
+
+        self.assertFalse(ChatRoom.objects.filter(pk=legacy.pk).exists())
+        self.assertEqual(self.room.messages.count(), 6)
+        self.assertIn(self.student, self.room.participants.all())
+
+
+#---------------------Presence---------------------
+class AdminPresenceTests(TestCase):
+    """Online while any admin socket is alive, offline after the last one leaves or goes quiet."""
+
+    def setUp(self):
+        self.presence = MemoryPresence()
+
+    def test_first_and_last_socket(self):
+        self.assertTrue(async_to_sync(self.presence.admin_connected)("one"))
+        self.assertFalse(async_to_sync(self.presence.admin_connected)("two"))
+        self.assertTrue(self.presence.is_admin_online())
+
+        self.assertFalse(async_to_sync(self.presence.admin_disconnected)("one"))
+        self.assertTrue(async_to_sync(self.presence.ais_admin_online)())
+        self.assertTrue(async_to_sync(self.presence.admin_disconnected)("two"))
+        self.assertFalse(self.presence.is_admin_online())
+
+    def test_socket_without_heartbeat_expires(self):
+        with mock.patch("chat.presence.time.time", return_value=1000):
+            async_to_sync(self.presence.admin_connected)("one")
+        with mock.patch("chat.presence.time.time", return_value=1000 + PRESENCE_TTL - 1):
+            self.assertTrue(self.presence.is_admin_online())
+            async_to_sync(self.presence.heartbeat)("one")
+        with mock.patch("chat.presence.time.time", return_value=1000 + 2 * PRESENCE_TTL - 2):
+            self.assertTrue(self.presence.is_admin_online())
+        with mock.patch("chat.presence.time.time", return_value=1000 + 2 * PRESENCE_TTL):
+            self.assertFalse(self.presence.is_admin_online())
+            # The dead socket does not count: the next admin comes online
+            self.assertTrue(async_to_sync(self.presence.admin_connected)("two"))
+
+    def test_check_admin_status(self):
+        with mock.patch("chat.views.get_presence", return_value=self.presence):
+            self.assertFalse(self.client.get(reverse("check_admin_status")).json()["online"])
+            async_to_sync(self.presence.admin_connected)("one")
+            self.assertTrue(self.client.get(reverse("check_admin_status")).json()["online"])
+
+    def test_backend_follows_settings(self):
+        with override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels_redis.core.RedisChannelLayer"}}):
+            self.assertIsInstance(presence_module.get_presence(), RedisPresence)
+        with override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}):
+            self.assertIsInstance(presence_module.get_presence(), MemoryPresence)
+        with override_settings(CHAT_PRESENCE_BACKEND="memory",
+                               CHANNEL_LAYERS={"default": {"BACKEND": "channels_redis.core.RedisChannelLayer"}}):
+            self.assertIsInstance(presence_module.get_presence(), MemoryPresence)
+
+
+def _redis_url():
+    """REDIS_URL when a Redis server answers there, else None."""
+    url = getattr(settings, "REDIS_URL", "redis://127.0.0.1:6379")
+    try:
+        import redis
+        redis.Redis.from_url(url, socket_connect_timeout=0.5).ping()
+    except Exception:
+        return None
+    return url
+
+
+@skipUnless(_redis_url(), "needs a Redis server at REDIS_URL")
+class RedisPresenceTests(SimpleTestCase):
+    """The shared backend, against a real Redis under test-only keys."""
+
+    KEYS = {"ADMINS_KEY": "test:chat:presence:admins", "ONLINE_KEY": "test:chat:presence:online"}
+
+    def setUp(self):
+        for name, key in self.KEYS.items():
+            patcher = mock.patch.object(presence_module, name, key)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.presence = RedisPresence(_redis_url())
+        self.addCleanup(self.presence.redis.delete, *self.KEYS.values())
+
+    def run_async(self, steps):
+        # One event loop for the whole scenario: the async client is bound to it
+        async def scenario():
+            try:
+                return [await step() for step in steps]
+            finally:
+                await self.presence.aredis.aclose()
+        return async_to_sync(scenario)()
+
+    def test_first_and_last_socket(self):
+        p = self.presence
+        results = self.run_async([
+            lambda: p.admin_connected("one"),
+            lambda: p.admin_connected("two"),
+            lambda: p.admin_disconnected("one"),
+            p.ais_admin_online,
+            lambda: p.admin_disconnected("two"),
+            p.ais_admin_online,
+        ])
+        self.assertEqual(results, [True, False, False, True, True, False])
+        self.assertFalse(p.is_admin_online())
+
+    def test_disconnect_keeps_online_key_of_a_new_socket(self):
+        p = self.presence
+        results = self.run_async([
+            lambda: p.admin_connected("one"),
+            lambda: p.admin_connected("two"),
+            lambda: p.admin_disconnected("one"),
+        ])
+        self.assertEqual(results, [True, False, False])
+        self.assertTrue(p.is_admin_online())
+
+    def test_expired_sockets_do_not_count(self):
+        p = self.presence
+        p.redis.zadd(presence_module.ADMINS_KEY, {"dead": 1})
+        results = self.run_async([
+            lambda: p.admin_connected("one"),
+            lambda: p.admin_disconnected("one"),
+        ])
+        self.assertEqual(results, [True, True])
+        self.assertFalse(p.is_admin_online())
+
+
+#---------------------Inbox---------------------
+class AdminInboxTests(TestCase):
+    """Filters, unread counts and ordering of the admin inbox."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="pass")
+        self.guest_room, self.student_room, self.empty_room = ChatRoom.objects.bulk_create([
+            ChatRoom(name="guest_ab12_admin"),
+            ChatRoom(name="student_dayo_admin"),
+            ChatRoom(name="student_quiet_admin"),
+        ])
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room=self.student_room, content="old question", message_type="student", is_read=True),
+            ChatMessage(room=self.guest_room, content="hello", guest_name="Ada"),
+            ChatMessage(room=self.guest_room, content="anyone there?", guest_name="Ada"),
+            # The admin's own messages never count as unread
+            ChatMessage(room=self.guest_room, content="yes", message_type="admin", sender=self.admin),
+        ])
+        ChatMessage.objects.filter(room=self.student_room).update(timestamp=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        patcher = mock.patch("chat.views.get_presence", return_value=MemoryPresence())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.admin)
+
+    def inbox(self, **params):
+        response = self.client.get(reverse("admin_inbox"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["current_filter"], list(response.context["rooms"])
+
+    def test_all_rooms_latest_activity_first(self):
+        current, rooms = self.inbox()
+        self.assertEqual(current, "all")
+        self.assertEqual([room.name for room in rooms], ["guest_ab12_admin", "student_dayo_admin", "student_quiet_admin"])
+        guest, student, empty = rooms
+        self.assertEqual((guest.unread_count, guest.kind, guest.last_message), (2, "guest", "yes"))
+        self.assertEqual((student.unread_count, student.kind), (0, "student"))
+        self.assertEqual((empty.unread_count, empty.last_message_at), (0, None))
+
+    def test_filters(self):
+        expected = {
+            "unread": ["guest_ab12_admin"],
+            "guest": ["guest_ab12_admin"],
+            "student": ["student_dayo_admin", "student_quiet_admin"],
+        }
+        for name, rooms in expected.items():
+            current, page = self.inbox(filter=name)
+            self.assertEqual(current, name)
+            self.assertEqual([room.name for room in page], rooms, name)
+
+        current, page = self.inbox(filter="bogus")
+        self.assertEqual((current, len(page)), ("all", 3))
+
+    def test_opening_a_room_reads_it(self):
+        self.client.get(reverse("admin_reply_chat", args=[self.guest_room.name]))
+        _, rooms = self.inbox(filter="unread")
+        self.assertEqual(rooms, [])
+
+    def test_unreachable_presence_shows_admin_offline(self):
+        broken = mock.Mock()
+        broken.is_admin_online.side_effect = ConnectionRefusedError("redis down")
+        with mock.patch("chat.views.get_presence", return_value=broken):
+            response = self.client.get(reverse("admin_inbox"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["admin_online"])
+
+
+#---------------------Guest Chat---------------------
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class GuestChatTests(TestCase):
+    """The AJAX fallback and guest page use the widget's cookie identity, never a session."""
+
+    def setUp(self):
+        User.objects.create_superuser(username="admin", email="admin@example.com", password="pass")
+
+    def guest_id(self, response):
+        signer = signing.get_cookie_signer(salt=GUEST_COOKIE_NAME + GUEST_COOKIE_SALT)
+        return signer.unsign(response.cookies[GUEST_COOKIE_NAME].value)
+
+    def send(self, message):
+        return self.client.post(
+            reverse("send_guest_message"), json.dumps({"message": message, "guest_name": "Ada"}),
+            content_type="application/json",
+        )
+
+    def test_fallback_joins_the_widget_room(self):
+        guest_id = self.guest_id(self.client.get(reverse("guest_identity")))
+
+        response = self.send("hello")
+        self.assertEqual(response.json(), {"status": "ok"})
+        self.assertEqual(self.guest_id(response), guest_id)
+        self.assertEqual(ChatMessage.objects.get(content="hello").room.name, f"{guest_id}_admin")
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_first_fallback_message_mints_the_cookie(self):
+        guest_id = self.guest_id(self.send("hello"))
+        self.assertRegex(guest_id, r"^guest_[0-9a-f]{8}$")
+        self.send("again")
+        self.assertEqual(ChatRoom.objects.get().messages.count(), 2)
+        self.assertFalse(Session.objects.exists())
+
+    def test_guest_page_uses_the_cookie(self):
+        guest_id = self.guest_id(self.client.get(reverse("guest_identity")))
+        response = self.client.get(reverse("guest_chat"))
+        self.assertEqual(response.context["room_name"], f"{guest_id}_admin")
+        self.assertFalse(Session.objects.exists())
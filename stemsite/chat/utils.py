@@ -0,0 +1,47 @@
+# chat/utils.py
+
+import uuid
+
+from django.conf import settings
+
+# Guests are identified by a signed cookie rather than a session, so an
+# anonymous visitor costs no django_session row, not even after opening
+# the chat widget.
+GUEST_COOKIE_NAME = "chat_guest_id"
+GUEST_COOKIE_SALT = "chat.guest_id"
+GUEST_COOKIE_MAX_AGE = getattr(settings, "CHAT_GUEST_COOKIE_MAX_AGE", 60 * 60 * 24 * 30)
+
+
+def student_room_name(username):
+    """The one room of a student's conversation with the admins, always lowercase."""
+    return f"student_{username}_admin".lower()
+
+
+def new_guest_id():
+    return f"guest_{uuid.uuid4().hex[:8]}"
+
+
+def read_guest_id(request):
+    """
+    Return the visitor's guest id, or "" if they never opened the chat.
+    Falls back to the legacy session value without creating a session.
+    """
+    guest_id = request.get_signed_cookie(GUEST_COOKIE_NAME, default="", salt=GUEST_COOKIE_SALT)
+    if guest_id:
+        return guest_id
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return request.session.get("guest_id", "")
+    return ""
+
+
+def set_guest_cookie(response, guest_id):
+    response.set_signed_cookie(
+        GUEST_COOKIE_NAME,
+        guest_id,
+        salt=GUEST_COOKIE_SALT,
+        max_age=GUEST_COOKIE_MAX_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
+    return response
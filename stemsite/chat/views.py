@@ -1,29 +1,33 @@
-import uuid
 import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.contrib.auth import get_user_model
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import Q, F, Count, IntegerField, OuterRef, Prefetch, Subquery, Value, Case, When, CharField
+from django.db.models.functions import Coalesce, Left
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from .models import ChatRoom, ChatMessage
-from chat.consumers import online_admins
+from .utils import new_guest_id, read_guest_id, set_guest_cookie, student_room_name
+from chat.presence import get_presence
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 # -------------------- Helper --------------------
-def _room_name_for_student(username: str) -> str:
-    """Standardized room name for all students (same format as Dayo)."""
-    return f"student_{username}_admin"
-
-
 def _room_name_for_guest(guest_id: str) -> str:
-    return f"guest_{guest_id}_admin"
+    """Widget ids already carry the prefix (guest_ab12cd34); legacy session ids are bare hex."""
+    if not guest_id.startswith("guest_"):
+        guest_id = f"guest_{guest_id}"
+    return f"{guest_id}_admin"
 
 
 def _push_to_group(room_name: str, message: str, sender_username: str, receiver_username: str):
@@ -42,24 +46,109 @@ def _push_to_group(room_name: str, message: str, sender_username: str, receiver_
     )
 
 
+# -------------------- History paging --------------------
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+HISTORY_FIELDS = ("id", "timestamp", "content", "message_type", "guest_name", "sender_id", "sender__username")
+
+
+def _encode_cursor(row):
+    # "<microseconds since epoch>-<id>": exact, URL safe, sortable like the index
+    ts = row["timestamp"]
+    micros = (ts - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)) // timedelta(microseconds=1)
+    return f"{micros}-{row['id']}"
+
+
+def _decode_cursor(cursor):
+    try:
+        micros, msg_id = cursor.split("-", 1)
+        return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=int(micros)), int(msg_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _history_page(request, messages):
+    """
+    Keyset-paginate a room's messages on (timestamp, id).
+
+    ?since=<cursor>  -> messages newer than the cursor (incremental polling)
+    ?before=<cursor> -> the page just older than the cursor (scroll back)
+    neither          -> the latest page
+    Rows come from values(), oldest first. Returns (rows, meta) or None
+    for a malformed cursor.
+    """
+    try:
+        limit = min(int(request.GET.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = HISTORY_PAGE_SIZE
+    limit = max(limit, 1)
+
+    since, before = request.GET.get("since"), request.GET.get("before")
+    messages = messages.values(*HISTORY_FIELDS)
+
+    if since:
+        cursor = _decode_cursor(since)
+        if cursor is None:
+            return None
+        ts, msg_id = cursor
+        rows = list(
+            messages.filter(Q(timestamp__gt=ts) | Q(timestamp=ts, id__gt=msg_id))
+            .order_by("timestamp", "id")[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        if before:
+            cursor = _decode_cursor(before)
+            if cursor is None:
+                return None
+            ts, msg_id = cursor
+            messages = messages.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=msg_id))
+        rows = list(messages.order_by("-timestamp", "-id")[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+
+    meta = {
+        "has_more": has_more,
+        # pass back as ?before= to scroll up, ?since= to poll for new messages
+        "before": _encode_cursor(rows[0]) if rows else before,
+        "since": _encode_cursor(rows[-1]) if rows else since,
+    }
+    return rows, meta
+
+
 # -------------------- Guest --------------------
+@never_cache
+def guest_identity(request):
+    """
+    Return the chat identity for the floating chat widget.
+    Called when the widget is opened; the guest id is minted here and
+    kept in a signed cookie, so anonymous page views never touch the
+    session table.
+    """
+    if request.user.is_authenticated:
+        return JsonResponse({"guest_id": None, "username": request.user.username})
+
+    guest_id = read_guest_id(request) or new_guest_id()
+    return set_guest_cookie(JsonResponse({"guest_id": guest_id}), guest_id)
+
+
 def guest_chat(request):
-    """Guest chat page: create guest_id in session and show chat UI."""
-    guest_id = request.session.get("guest_id")
-    if not guest_id:
-        guest_id = uuid.uuid4().hex[:8]
-        request.session["guest_id"] = guest_id
+    """Guest chat page: same signed-cookie identity (and room) as the chat widget."""
+    guest_id = read_guest_id(request) or new_guest_id()
 
     room_name = _room_name_for_guest(guest_id)
     # ensure room exists
     ChatRoom.objects.get_or_create(name=room_name)
 
-    return render(request, "chat/chat.html", {
+    response = render(request, "chat/chat.html", {
         "room_name": room_name,
         "sender": guest_id,
         "chat_type": "guest",
         "is_admin": False
     })
+    return set_guest_cookie(response, guest_id)
 
 
 @csrf_exempt
@@ -75,17 +164,14 @@ def send_guest_message(request):
         if not message:
             return JsonResponse({"error": "Empty message"}, status=400)
 
-        guest_id = request.session.get("guest_id")
-        if not guest_id:
-            # if session lost, create a new guest id (fallback)
-            guest_id = uuid.uuid4().hex[:8]
-            request.session["guest_id"] = guest_id
+        # no cookie yet (widget never opened): mint the id here
+        guest_id = read_guest_id(request) or new_guest_id()
 
         room_name = _room_name_for_guest(guest_id)
         room, _ = ChatRoom.objects.get_or_create(name=room_name)
 
         # use a placeholder guest user or create one
-        guest_user, _ = User.objects.get_or_create(username=f"guest_{guest_id}")
+        guest_user, _ = User.objects.get_or_create(username=room_name[:-len("_admin")])
         admin = User.objects.filter(is_superuser=True).first()
         if not admin:
             return JsonResponse({"error": "No admin user found"}, status=500)
@@ -102,7 +188,7 @@ def send_guest_message(request):
         # Push realtime to channel group
         _push_to_group(room.name, message, guest_user.username, admin.username)
 
-        return JsonResponse({"status": "ok"})
+        return set_guest_cookie(JsonResponse({"status": "ok"}), guest_id)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
@@ -112,7 +198,7 @@ def send_guest_message(request):
 def student_chat(request):
     """Student chat page — uses the unified room name format (student_<username>_admin)."""
     user = request.user
-    room_name = _room_name_for_student(user.username)
+    room_name = student_room_name(user.username)
 
     # ensure room exists
     room, _ = ChatRoom.objects.get_or_create(name=room_name)
@@ -143,14 +229,15 @@ def send_chat_message(request):
         if not admin:
             return JsonResponse({"success": False, "error": "No admin found"})
 
-        room_name = _room_name_for_student(user.username)
+        room_name = student_room_name(user.username)
         room, _ = ChatRoom.objects.get_or_create(name=room_name)
 
         cm = ChatMessage.objects.create(
             room=room,
             sender=user,
             receiver=admin,
-            content=message
+            content=message,
+            message_type="student",
         )
 
         # realtime push
@@ -163,29 +250,26 @@ def send_chat_message(request):
 
 @login_required
 def load_messages(request):
-    """Load all messages between the logged-in student and admin."""
+    """Load the student's conversation with admin, one keyset page at a time."""
     if not request.user.is_authenticated:
         return JsonResponse({"messages": []})
 
     user = request.user
-    admin = User.objects.filter(is_superuser=True).first()
-    if not admin:
-        return JsonResponse({"messages": []})
 
-    # use unified room name
-    room_name = _room_name_for_student(user.username)
-    msgs = ChatMessage.objects.filter(
-        (Q(sender=user) & Q(receiver=admin)) |
-        (Q(sender=admin) & Q(receiver=user))
-    ).order_by("timestamp")
+    # use unified room name (same as the consumer)
+    room_name = student_room_name(user.username)
+    page = _history_page(request, ChatMessage.objects.filter(room__name=room_name))
+    if page is None:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+    rows, meta = page
 
     data = [{
-        "sender": "student" if m.sender == user else "admin",
-        "message": m.content,
-        "timestamp": m.timestamp.isoformat() if getattr(m, "timestamp", None) else None
-    } for m in msgs]
+        "sender": "student" if m["sender_id"] == user.id else "admin",
+        "message": m["content"],
+        "timestamp": m["timestamp"].isoformat() if m["timestamp"] else None
+    } for m in rows]
 
-    return JsonResponse({"messages": data})
+    return JsonResponse({"messages": data, **meta})
 
 
 # -------------------- Admin --------------------
@@ -203,29 +287,28 @@ def admin_reply_chat(request, room_name):
     """
     Admin replies to student or guest. Handles GET to show messages and POST to send a reply.
     Uses correct model fields and pushes to the channels group so the student sees it realtime.
+    Only the latest page of history is rendered; older pages come from fetch_room_messages.
     """
     room = get_object_or_404(ChatRoom, name=room_name)
-    messages = room.messages.order_by("timestamp")
 
     if request.method == "POST":
         # admin posting a reply from admin UI
         text = request.POST.get("message", "").strip()
         if text:
             admin_user = request.user
-            # decide receiver: if room is student_<username>_admin -> student username is second segment
+            # decide receiver: if room is student_<username>_admin -> student username sits in between
             receiver_username = None
             if room_name.startswith("student_") and room_name.endswith("_admin"):
-                receiver_username = room_name.split("_")[1]
+                receiver_username = room_name[len("student_"):-len("_admin")]
             elif room_name.startswith("guest_"):
                 # for guest we may have guest_<id>_admin
                 receiver_username = room_name.replace("guest_", "").replace("_admin", "")
             # get receiver user object if student; for guest we create/get a guest user
             receiver_user = None
             if receiver_username:
-                # try to find normal user first
-                try:
-                    receiver_user = User.objects.get(username=receiver_username)
-                except User.DoesNotExist:
+                # try to find normal user first (room names are lowercased)
+                receiver_user = User.objects.filter(username__iexact=receiver_username).order_by("pk").first()
+                if receiver_user is None:
                     # fallback to guest_{id} user object (if guest)
                     receiver_user, _ = User.objects.get_or_create(username=f"guest_{receiver_username}")
 
@@ -234,7 +317,8 @@ def admin_reply_chat(request, room_name):
                 room=room,
                 sender=admin_user,
                 receiver=receiver_user,
-                content=text
+                content=text,
+                message_type="admin",
             )
 
             # push to group so student/guest sees it instantly
@@ -243,12 +327,18 @@ def admin_reply_chat(request, room_name):
             # after POST redirect to same page to avoid resubmission
             return redirect(request.path)
 
-    # Mark guest messages as read (only for guest names)
-    messages.filter(is_read=False, sender__username__startswith='guest').update(is_read=True)
+    page = _history_page(request, ChatMessage.objects.filter(room=room))
+    if page is None:
+        return HttpResponseBadRequest("Invalid cursor")
+    messages, meta = page
+
+    # Opening the room reads everything the admin has not answered yet
+    _unread_messages(ChatMessage.objects.filter(room=room)).update(is_read=True)
 
     return render(request, "chat/admin_reply_chat.html", {
         "room": room,
         "messages": messages,
+        "history": meta,
         "admin_username": request.user.username
     })
 
@@ -265,40 +355,117 @@ def admin_reply_guest(request, guest_id):
     })
 
 
+# -------------------- Inbox --------------------
+INBOX_PAGE_SIZE = 50
+INBOX_PREVIEW_LENGTH = 80
+
+INBOX_FILTERS = ("all", "unread", "guest", "student")
+
+
+def _unread_messages(messages):
+    # Everything in a room the admin did not send and has not opened yet
+    return messages.filter(is_read=False).exclude(message_type="admin")
+
+
+def _inbox_rooms():
+    """
+    Every room with its latest message, unread count and kind, as one query.
+    The correlated subqueries are served by the (room, timestamp, id) and
+    partial (room) WHERE NOT is_read indexes on ChatMessage.
+    """
+    latest = ChatMessage.objects.filter(room=OuterRef("pk")).order_by("-timestamp", "-id")
+    unread = (
+        _unread_messages(ChatMessage.objects.filter(room=OuterRef("pk")))
+        .order_by()
+        .values("room")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    return ChatRoom.objects.annotate(
+        last_message_at=Subquery(latest.values("timestamp")[:1]),
+        last_message=Subquery(latest.annotate(preview=Left("content", INBOX_PREVIEW_LENGTH)).values("preview")[:1]),
+        last_message_type=Subquery(latest.values("message_type")[:1]),
+        unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)),
+        kind=Case(
+            When(name__startswith="guest_", then=Value("guest")),
+            When(name__startswith="student_", then=Value("student")),
+            default=Value("other"),
+            output_field=CharField(),
+        ),
+    )
+
+
 @staff_member_required
 def admin_inbox(request):
-    rooms = ChatRoom.objects.all().order_by("-id")
-    return render(request, "chat/admin_inbox.html", {"rooms": rooms})
+    """
+    Paginated inbox, most recent activity first. One COUNT, one page query
+    and one participants prefetch per page, however many rooms exist.
+    """
+    current = request.GET.get("filter", "all")
+    if current not in INBOX_FILTERS:
+        current = "all"
+
+    rooms = _inbox_rooms()
+    if current == "unread":
+        rooms = rooms.filter(unread_count__gt=0)
+    elif current in ("guest", "student"):
+        rooms = rooms.filter(name__startswith=f"{current}_")
+
+    rooms = rooms.order_by(F("last_message_at").desc(nulls_last=True), "-id").prefetch_related(
+        Prefetch("participants", queryset=User.objects.only("id", "username"))
+    )
+    page = Paginator(rooms, INBOX_PAGE_SIZE).get_page(request.GET.get("page"))
+
+    return render(request, "chat/admin_inbox.html", {
+        "rooms": page.object_list,
+        "page_obj": page,
+        "filters": INBOX_FILTERS,
+        "current_filter": current,
+        "admin_online": _admin_online(),
+    })
 
 
 # -------------------- Admin Status --------------------
+def _admin_online():
+    # Presence lives in Redis: if it cannot be reached, show the admin offline rather than fail the page
+    try:
+        return get_presence().is_admin_online()
+    except Exception as e:
+        logger.error(f"[CHAT PRESENCE ❌] status lookup failed: {e}")
+        return False
+
+
 def check_admin_status(request):
-    return JsonResponse({"online": len(online_admins) > 0})
+    return JsonResponse({"online": _admin_online()})
 
 
 @login_required
 @staff_member_required
 def fetch_room_messages(request, room_name):
     """
-    Fetch all messages for a given room (student or guest) for admin page.
+    Fetch messages for a given room (student or guest) for admin page,
+    keyset-paginated: poll with ?since=<cursor>, scroll back with ?before=<cursor>.
     """
     room_name = room_name.lower()  # normalize to match consumer
     room = get_object_or_404(ChatRoom, name=room_name)
-    messages = room.messages.order_by("timestamp")
+    page = _history_page(request, ChatMessage.objects.filter(room=room))
+    if page is None:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+    rows, meta = page
 
     data = []
-    for m in messages:
-        if m.sender and m.sender.username == "admin":
+    for m in rows:
+        if m["sender__username"] == "admin":
             sender_label = "admin"
-        elif m.message_type == "student":
-            sender_label = m.sender.username if m.sender else "student"
+        elif m["message_type"] == "student":
+            sender_label = m["sender__username"] or "student"
         else:
-            sender_label = m.guest_name or "Guest"
+            sender_label = m["guest_name"] or "Guest"
 
         data.append({
             "sender": sender_label,
-            "message": m.content,
-            "timestamp": m.timestamp.strftime("%H:%M")
+            "message": m["content"],
+            "timestamp": m["timestamp"].strftime("%H:%M")
         })
 
-    return JsonResponse({"messages": data})
+    return JsonResponse({"messages": data, **meta})
@@ -12,6 +12,7 @@ from .models import Enrollment
 from django.utils import timezone
 from django.utils.timezone import localtime
 from django.utils.html import format_html
+from django.template.defaultfilters import linebreaksbr
 from main.brevo_email import send_brevo_email
 
 from .models import *
@@ -21,6 +22,28 @@ logger = logging.getLogger(__name__)
 
 # =============== FORMS ==================
 
+# =============== MIXINS ==================
+from main.utils import exports
+
+
+class ExportActionsMixin:
+    """
+    "Export as CSV / Excel" actions. The action receives the changelist
+    queryset (filters, search, "select all"), which main/utils/exports.py
+    streams row by row; set export_columns and export_filename.
+    """
+    export_columns = ()
+    export_filename = "export"
+
+    @admin.action(description="Export selected as CSV")
+    def export_as_csv(self, request, queryset):
+        return exports.export_response(queryset, self.export_columns, self.export_filename, "csv")
+
+    @admin.action(description="Export selected as Excel (.xlsx)")
+    def export_as_xlsx(self, request, queryset):
+        return exports.export_response(queryset, self.export_columns, self.export_filename, "xlsx")
+
+
 # =============== ADMIN CLASSES ==================
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -75,7 +98,7 @@ def mark_enrollment_paid(self, request, queryset):
 def activate_course(self, request, queryset):
     updated = 0
 
-    for enrollment in queryset:
+    for enrollment in queryset.select_related("course"):
         if not enrollment.is_course_activated:
             enrollment.is_course_activated = True
             enrollment.is_active = True
@@ -184,9 +207,50 @@ class EmailTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'subject')
     search_fields = ('name', 'subject')
 
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    raw_id_fields = ('broadcast',)
+    actions = ['retry_now']
+
+    @admin.action(description="Retry selected emails now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='pending', next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} email(s) re-queued.", messages.SUCCESS)
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('reference', 'event', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event')
+    search_fields = ('reference',)
+    readonly_fields = ('reference', 'event', 'payload', 'received_at', 'processed_at', 'last_error')
+    actions = ['retry_now']
+
+    @admin.action(description="Re-apply selected events now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='processed').update(
+            status='pending', next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} event(s) re-queued.", messages.SUCCESS)
+
+@admin.register(LiveSessionReminder)
+class LiveSessionReminderAdmin(admin.ModelAdmin):
+    list_display = ('session', 'student', 'window', 'queued_at')
+    list_filter = ('window',)
+    search_fields = ('session__title', 'student__username', 'student__email')
+    list_select_related = ('session__course', 'student')
+    raw_id_fields = ('session', 'student')
+
 # main/admin.py
 @admin.register(CoursePayment)
-class CoursePaymentAdmin(admin.ModelAdmin):
+class CoursePaymentAdmin(ExportActionsMixin, admin.ModelAdmin):
     list_display = (
         "enrollment",
         "course",
@@ -220,7 +284,9 @@ class CoursePaymentAdmin(admin.ModelAdmin):
         "created_at",
     )
 
-    actions = ["verify_payments", "block_dashboard", "unblock_dashboard"]
+    actions = ["verify_payments", "block_dashboard", "unblock_dashboard", "export_as_csv", "export_as_xlsx"]
+    export_columns = exports.COURSE_PAYMENT_COLUMNS
+    export_filename = "payments"
 
     # --------------------------------------------------
     # Proof of payment link
@@ -397,6 +463,11 @@ from django.contrib.auth import get_user_model
 
 from .models import AdminMessage, Notification, Enrollment
 from main.utils.email_helpers import send_broadcast_email
+from main.utils.broadcast import param, queue_broadcast
+from main.utils.notifications import (
+    GLOBAL_TIMETABLE_CREATED, LIVE_SESSION_CREATED, TIMETABLE_CREATED, fan_out_notifications, resolve_recipients,
+)
+from main.utils import dashboard_cache
 
 User = get_user_model()
 
@@ -435,48 +506,50 @@ class AdminMessageAdmin(admin.ModelAdmin):
                 message_text = form.cleaned_data["message"]
 
                 selected_ids = request.POST.getlist("_selected_action")
-                students = User.objects.filter(id__in=selected_ids)
-
-                sent_count = 0
-
-                for student in students:
-                    # 1️⃣ Save AdminMessage
-                    AdminMessage.objects.create(
-                        student=student,
-                        title=title,
-                        message=message_text,
-                    )
+                students = resolve_recipients(User.objects.filter(id__in=selected_ids))
+
+                # 1️⃣ Save AdminMessages
+                AdminMessage.objects.bulk_create(
+                    [
+                        AdminMessage(student=student, title=title, message=message_text)
+                        for student in students
+                    ],
+                    batch_size=500,
+                )
+                # bulk_create sends no post_save, so refresh their dashboards here
+                dashboard_cache.invalidate_users(
+                    [student.pk for student in students], "admin_messages", "student_profile"
+                )
 
-                    # 2️⃣ Create dashboard notification
-                    Notification.objects.create(
-                        student=student,
-                        notif_type="message",
-                        title=title,
-                        message=message_text,
-                    )
+                # 2️⃣ Create dashboard notifications
+                fan_out_notifications(
+                    students,
+                    notif_type="message",
+                    title=title,
+                    message=message_text,
+                )
 
-                    # 3️⃣ Send email via Brevo
-                    try:
-                        send_brevo_email(
-                            to_email=student.email,
-                            subject=f"New Message: {title}",
-                            html_content=f"""
-                                <p>Hello {student.get_full_name() or student.username},</p>
-                                <p>You have received a new message from the admin:</p>
-                                <p><strong>{title}</strong></p>
-                                <p>{message_text}</p>
-                                <br>
-                                <p>— STEM CodeMaster Team</p>
-                            """,
-                        )
-                        sent_count += 1
-                    except Exception:
-                        # Email failure must NOT stop admin action
-                        pass
+                # 3️⃣ Queue one email body for everyone (main/utils/broadcast.py);
+                # the admin's text travels as escaped params, never in the body
+                # Brevo runs through its template engine
+                text_params = {"title": title, "message": linebreaksbr(message_text)}
+                queued = queue_broadcast(
+                    ((student.email, {"student_name": student.get_full_name() or student.username, **text_params})
+                     for student in students),
+                    subject=f"New Message: {title}",
+                    html_content=f"""
+                        <p>Hello {param("student_name")},</p>
+                        <p>You have received a new message from the admin:</p>
+                        <p><strong>{param("title")}</strong></p>
+                        <p>{param("message")}</p>
+                        <br>
+                        <p>— STEM CodeMaster Team</p>
+                    """,
+                )
 
                 self.message_user(
                     request,
-                    f"✅ Message sent to {sent_count} student(s) successfully.",
+                    f"✅ Message sent to {len(students)} student(s) successfully ({queued} email(s) queued).",
                     messages.SUCCESS,
                 )
 
@@ -526,78 +599,93 @@ def send_custom_notification(modeladmin, request, queryset):
             title = form.cleaned_data.get("title")
             message_text = form.cleaned_data.get("message")
 
-            for student in queryset:
-                user_obj = getattr(student, "user", student)  # Ensure we have a User object
-
-                # -------------------------------
-                # Prepare title/message
-                # -------------------------------
-                if notif_type == "assignment" and assignment:
-                    title_final = title or f"New Assignment: {assignment.title}"
-                    message_final = message_text or assignment.instructions
-
-                elif notif_type == "material" and material:
-                    title_final = title or f"New Material: {material.title}"
-                    message_final = message_text or material.description
-
-                elif notif_type == "live" and live_session:
-                    title_final = title or f"Upcoming Live Session: {live_session.title}"
-                    message_final = message_text or (
-                        f"Join link: {live_session.link}\n"
-                        f"Starts at: {live_session.start_time.strftime('%d %b, %Y %I:%M %p')}"
-                    )
-
-                elif notif_type == "message":
-                    title_final = title or "Message from Admin"
-                    message_final = message_text or "You have received a new message from admin."
-
-                elif notif_type == "general":
-                    title_final = title or "General Notification"
-                    message_final = message_text or "Important information for you."
-
-                elif notif_type == "timetable" and course:
-                    title_final = title or f"Schedule / Timetable for {course.title}"
-                    timetable_entries = Timetable.objects.filter(student=user_obj, course=course)
-                    if timetable_entries.exists():
-                        lines = [
-                            f"{t.day}: {t.start_time.strftime('%H:%M')} - {t.end_time.strftime('%H:%M')} ({t.instructor})"
-                            for t in timetable_entries
-                        ]
-                        message_final = message_text or "Course Timetable:\n" + "\n".join(lines)
-                    else:
-                        message_final = message_text or "No timetable set yet for this course."
+            # Ensure we have User objects (queryset may hold Enrollments)
+            students = resolve_recipients(
+                [getattr(student, "user_id", None) or student.pk for student in queryset]
+            )
 
-                else:
-                    title_final = title or "Notification"
-                    message_final = message_text or "You have a new notification."
-
-                # -------------------------------
-                # Save dashboard notification
-                # -------------------------------
-                Notification.objects.create(
-                    student=user_obj,
-                    notif_type=notif_type,
-                    title=title_final,
-                    message=message_final,
+            # -------------------------------
+            # Prepare title/message
+            # -------------------------------
+            if notif_type == "assignment" and assignment:
+                title_final = title or f"New Assignment: {assignment.title}"
+                message_final = message_text or assignment.instructions
+
+            elif notif_type == "material" and material:
+                title_final = title or f"New Material: {material.title}"
+                message_final = message_text or material.description
+
+            elif notif_type == "live" and live_session:
+                title_final = title or f"Upcoming Live Session: {live_session.title}"
+                message_final = message_text or (
+                    f"Join link: {live_session.link}\n"
+                    f"Starts at: {live_session.start_time.strftime('%d %b, %Y %I:%M %p')}"
                 )
 
-                # -------------------------------
-                # Send email notification via Brevo HTTP API
-                # -------------------------------
-                try:
-                    send_brevo_email(
-                        to_email=user_obj.email,
-                        subject=title_final,
-                        html_content=f"""
-                            <p>Hello {user_obj.get_full_name() or user_obj.username},</p>
-                            <p>{message_final.replace('\n', '<br>')}</p>
-                            <br>
-                            <p>— STEM CodeMaster Team</p>
-                        """,
+            elif notif_type == "message":
+                title_final = title or "Message from Admin"
+                message_final = message_text or "You have received a new message from admin."
+
+            elif notif_type == "general":
+                title_final = title or "General Notification"
+                message_final = message_text or "Important information for you."
+
+            elif notif_type == "timetable" and course:
+                title_final = title or f"Schedule / Timetable for {course.title}"
+
+                # One query for every selected student's timetable
+                lines_by_student = {}
+                timetable_entries = Timetable.objects.filter(
+                    student__in=students, course=course.title
+                ).order_by("date", "start_time")
+                for t in timetable_entries:
+                    lines_by_student.setdefault(t.student_id, []).append(
+                        f"{t.date}: {t.start_time.strftime('%H:%M')} - {t.end_time.strftime('%H:%M')} ({t.instructor})"
                     )
-                except Exception:
-                    # Do not block action if email fails
-                    continue
+
+                def message_final(user_obj):
+                    if message_text:
+                        return message_text
+                    lines = lines_by_student.get(user_obj.pk)
+                    if lines:
+                        return "Course Timetable:\n" + "\n".join(lines)
+                    return "No timetable set yet for this course."
+
+            else:
+                title_final = title or "Notification"
+                message_final = message_text or "You have a new notification."
+
+            # -------------------------------
+            # Save dashboard notifications
+            # -------------------------------
+            fan_out_notifications(
+                students,
+                notif_type=notif_type,
+                title=title_final,
+                message=message_final,
+            )
+
+            # -------------------------------
+            # Queue one email body for everyone (main/utils/broadcast.py);
+            # the message travels as an escaped param, so admin text is never
+            # parsed by Brevo's template engine
+            # -------------------------------
+            shared_message = None if callable(message_final) else linebreaksbr(message_final or "")
+
+            def email_params(user_obj):
+                message = linebreaksbr(message_final(user_obj)) if shared_message is None else shared_message
+                return {"student_name": user_obj.get_full_name() or user_obj.username, "message": message}
+
+            queue_broadcast(
+                ((user_obj.email, email_params(user_obj)) for user_obj in students),
+                subject=title_final,
+                html_content=f"""
+                    <p>Hello {param("student_name")},</p>
+                    <p>{param("message")}</p>
+                    <br>
+                    <p>— STEM CodeMaster Team</p>
+                """,
+            )
 
             messages.success(
                 request, f"✅ Notifications sent to {queryset.count()} student(s)."
@@ -615,21 +703,26 @@ def send_custom_notification(modeladmin, request, queryset):
     
 #-------------------testing--------------------
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(ExportActionsMixin, admin.ModelAdmin):
     list_display = (
-        "full_name", "email", "program", "skill_level", "is_enrollment_paid",
+        "full_name", "email", "course", "program", "skill_level", "is_enrollment_paid",
         "is_course_activated", "is_active", "is_activation_email_sent"
     )
-    list_filter = ("program", "skill_level", "is_enrollment_paid", "is_course_activated", "is_active")
-    search_fields = ("full_name", "email", "program", "skill_level")
+    list_filter = ("course", "program", "skill_level", "is_enrollment_paid", "is_course_activated", "is_active")
+    search_fields = ("full_name", "email", "course__title", "program", "skill_level")
+    list_select_related = ("course",)
     readonly_fields = ("secret_code",)
 
     actions = [
         "mark_enrollment_paid",
         "resend_secret_code",
         "activate_course",
-        "send_custom_notification"
+        "send_custom_notification",
+        "export_as_csv",
+        "export_as_xlsx",
     ]
+    export_columns = exports.ENROLLMENT_COLUMNS
+    export_filename = "enrollments"
 
     # -------------------------------
     # Admin Action: Mark Paid & Send Secret Code
@@ -729,15 +822,21 @@ class EnrollmentAdmin(admin.ModelAdmin):
 #-------------Assignment---------------
 from django.conf import settings
 from .models import Assignment, Notification
-from .forms import AssignmentAdminForm
+from .forms import AssignmentAdminForm, BulkCorrectionForm
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from main.utils.bulk_corrections import apply_corrections
+from main.utils.submission_zip import submission_zip_response
 
 @admin.register(Assignment)
 class AssignmentAdmin(admin.ModelAdmin):
     form = AssignmentAdminForm
-    list_display = ('title', 'course', 'due_date', 'upload_date')
+    list_display = ('title', 'course', 'due_date', 'upload_date', 'submissions_zip_link')
     search_fields = ('title', 'course__title')
     list_filter = ('course', 'due_date')
     filter_horizontal = ('recipients',)
+    actions = ['download_submissions']
 
     fieldsets = (
         (None, {
@@ -749,13 +848,98 @@ class AssignmentAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
         # No more manual notifications/emails here
 
+    # -------------------------------
+    # Submissions as one streamed zip (main/utils/submission_zip.py)
+    # -------------------------------
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "<int:assignment_id>/submissions.zip",
+                self.admin_site.admin_view(self.submissions_zip_view),
+                name="assignment_submissions_zip",
+            ),
+            path(
+                "<int:assignment_id>/corrections/",
+                self.admin_site.admin_view(self.bulk_corrections_view),
+                name="assignment_bulk_corrections",
+            ),
+        ]
+        return custom_urls + urls
+
+    def _submissions_zip(self, assignments, filename):
+        submissions = AssignmentSubmission.objects.filter(assignment__in=assignments) \
+            .select_related('assignment', 'student').order_by('assignment_id', 'submitted_at')
+        return submission_zip_response(submissions, filename)
+
+    def submissions_zip_view(self, request, assignment_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        assignment = get_object_or_404(Assignment, pk=assignment_id)
+        return self._submissions_zip([assignment], f"{assignment.title}_submissions")
+
+    @admin.action(description="Download all submissions (zip)")
+    def download_submissions(self, request, queryset):
+        return self._submissions_zip(queryset, "assignment_submissions")
+
+    # -------------------------------
+    # Corrections for the whole class in one upload (main/utils/bulk_corrections.py)
+    # -------------------------------
+    def bulk_corrections_view(self, request, assignment_id):
+        if not request.user.has_perm("main.change_assignmentsubmission"):
+            raise PermissionDenied
+        assignment = get_object_or_404(Assignment, pk=assignment_id)
+        result = None
+
+        if request.method == "POST":
+            form = BulkCorrectionForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    result = apply_corrections(
+                        assignment, form.cleaned_data["archive"], form.cleaned_data["comments"]
+                    )
+                except ValueError as e:
+                    form.add_error("comments", str(e))
+                else:
+                    level = messages.SUCCESS if not (result["unmatched_files"] or result["failed"]) else messages.WARNING
+                    self.message_user(
+                        request,
+                        f"{result['updated']} submission(s) updated: {result['files']} correction file(s), "
+                        f"{result['comments']} feedback comment(s).",
+                        level,
+                    )
+                    form = BulkCorrectionForm()
+        else:
+            form = BulkCorrectionForm()
+
+        return render(request, "admin/bulk_corrections_form.html", {
+            **self.admin_site.each_context(request),
+            "title": f"Upload corrections: {assignment.title}",
+            "assignment": assignment,
+            "form": form,
+            "result": result,
+        })
+
+    def submissions_zip_link(self, obj):
+        return format_html(
+            '<a href="{}">Download zip</a> | <a href="{}">Upload corrections</a>',
+            reverse("admin:assignment_submissions_zip", args=[obj.pk]),
+            reverse("admin:assignment_bulk_corrections", args=[obj.pk]),
+        )
+
+    submissions_zip_link.short_description = "Submissions"
+
 
 #-----------Assignment Submission----------------
 @admin.register(AssignmentSubmission)
-class AssignmentSubmissionAdmin(admin.ModelAdmin):
+class AssignmentSubmissionAdmin(ExportActionsMixin, admin.ModelAdmin):
     list_display = ('assignment', 'student', 'submitted_at')
     list_filter = ('assignment',)
     search_fields = ('student__username', 'assignment__title')
+    list_select_related = ('assignment', 'student')
+    actions = ['download_files', 'export_as_csv', 'export_as_xlsx']
+    export_columns = exports.SUBMISSION_COLUMNS
+    export_filename = "submissions"
     readonly_fields = ('assignment', 'student', 'file', 'submitted_at')
 
     fieldsets = (
@@ -767,13 +951,22 @@ class AssignmentSubmissionAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description="Download selected files (zip)")
+    def download_files(self, request, queryset):
+        return submission_zip_response(queryset.select_related('assignment', 'student'), "submissions")
+
 #-----------------Material------------
 from django import forms
 from .models import Material
+from django.urls import reverse_lazy
+from .forms import DirectUploadModelForm
 
 
 # ---------- Admin form ----------
-class MaterialAdminForm(forms.ModelForm):
+class MaterialAdminForm(DirectUploadModelForm):
+    upload_purpose = "material"
+    upload_scope = "staff"
+
     class Meta:
         model = Material
         fields = '__all__'
@@ -782,6 +975,10 @@ class MaterialAdminForm(forms.ModelForm):
                 'size': 10,
                 'style': 'width: 400px;',
             }),
+            'file': forms.ClearableFileInput(attrs={
+                'data-direct-upload': 'material',
+                'data-direct-upload-sign': reverse_lazy('direct_upload_sign'),
+            }),
         }
 
 
@@ -792,6 +989,9 @@ class MaterialAdmin(admin.ModelAdmin):
     search_fields = ('title', 'course__title')
     filter_horizontal = ('recipients',)
 
+    class Media:
+        js = ('assets/js/direct_upload.js',)
+
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
         # Dashboard notifications & emails handled in signals
@@ -805,6 +1005,7 @@ admin.site.register(Material, MaterialAdmin)
 
 #---------Live Session Admin-----------
 from datetime import timedelta
+from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import redirect
 from django.urls import path
@@ -839,11 +1040,12 @@ class LiveSessionAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def send_reminders_view(self, request):
-        from main.tasks import send_upcoming_live_session_reminders
-        send_upcoming_live_session_reminders()
+        # One scheduler tick; the ledger makes it safe next to the running worker
+        from main.utils.email_reminders import send_upcoming_live_session_reminders
+        queued, failed = send_upcoming_live_session_reminders()
         self.message_user(
             request,
-            "✅ Live session reminders queued successfully!",
+            f"✅ {queued} live session reminder(s) queued." + (f" {failed} will be retried." if failed else ""),
             level=messages.SUCCESS,
         )
         return redirect("..")
@@ -859,28 +1061,21 @@ class LiveSessionAdmin(admin.ModelAdmin):
         if change:
             return
 
-        # Students assigned manually
-        assigned_students = obj.students.all()
-
-        # Students enrolled in the course
-        enrolled_ids = Enrollment.objects.filter(
-            course=obj.course, is_active=True
-        ).values_list("user", flat=True)
-        enrolled_students = obj.students.model.objects.filter(id__in=enrolled_ids)
-
-        # Combine unique students
-        students = set(list(assigned_students) + list(enrolled_students))
+        # Students assigned manually + students enrolled in the course (one query)
+        students = User.objects.filter(
+            Q(pk__in=obj.students.values("pk"))
+            | Q(enrolments__course=obj.course, enrolments__is_active=True)
+        )
 
         # Dashboard notifications ONLY (no email here)
-        for student in students:
-            Notification.objects.create(
-                student=student,
-                notif_type="live_session",
-                title=f"New Live Session: {obj.title}",
-                message=f"A new live session '{obj.title}' has been scheduled.",
-                obj_content_type=ContentType.objects.get_for_model(LiveSession),
-                obj_id=obj.id,
-            )
+        fan_out_notifications(
+            students,
+            notif_type="live_session",
+            title=f"New Live Session: {obj.title}",
+            message=f"A new live session '{obj.title}' has been scheduled.",
+            obj=obj,
+            event=LIVE_SESSION_CREATED,
+        )
 
         # Admin feedback
         self.message_user(
@@ -921,8 +1116,8 @@ class TimetableAdmin(admin.ModelAdmin):
             return
 
         # Dashboard notification ONLY
-        Notification.objects.create(
-            student=student,
+        fan_out_notifications(
+            [student],
             notif_type="timetable",
             title=f"New Class TimeTable: {obj.course}",
             message=(
@@ -930,8 +1125,8 @@ class TimetableAdmin(admin.ModelAdmin):
                 f"from {obj.start_time.strftime('%H:%M')} to {obj.end_time.strftime('%H:%M')}. "
                 f"Instructor: {obj.instructor}."
             ),
-            obj_content_type=ContentType.objects.get_for_model(Timetable),
-            obj_id=obj.id,
+            obj=obj,
+            event=TIMETABLE_CREATED,
         )
 
         # Admin feedback message
@@ -959,30 +1154,22 @@ class GlobalTimetableAdmin(admin.ModelAdmin):
         if change:
             return  # Only notify on new timetable entries
 
-        enrollments = Enrollment.objects.filter(course=obj.course).select_related("user")
-        notifications_sent = 0
-
-        for enr in enrollments:
-            student = getattr(enr, "user", None)
-            if not student:
-                continue
-
-            # Dashboard notification ONLY
-            Notification.objects.create(
-                student=student,
-                notif_type="schedule",
-                title=f"New Class Scheduled: {obj.course}",
-                message=(
-                    f"Class '{getattr(obj.course, 'title', str(obj.course))}' "
-                    f"scheduled on {obj.date} from {obj.start_time.strftime('%H:%M')} "
-                    f"to {obj.end_time.strftime('%H:%M')}. "
-                    f"Instructor: {obj.instructor}."
-                ),
-                obj_content_type=ContentType.objects.get_for_model(GlobalTimetable),
-                obj_id=obj.id,
-            )
-
-            notifications_sent += 1
+        # Dashboard notifications ONLY
+        counts = fan_out_notifications(
+            User.objects.filter(enrolments__course=obj.course),
+            notif_type="schedule",
+            title=f"New Class Scheduled: {obj.course}",
+            message=(
+                f"Class '{getattr(obj.course, 'title', str(obj.course))}' "
+                f"scheduled on {obj.date} from {obj.start_time.strftime('%H:%M')} "
+                f"to {obj.end_time.strftime('%H:%M')}. "
+                f"Instructor: {obj.instructor}."
+            ),
+            obj=obj,
+            event=GLOBAL_TIMETABLE_CREATED,
+        )
+        # The post_save receiver usually got there first: report who is notified, not who was new
+        notifications_sent = counts["recipients"]
 
         self.message_user(
             request,
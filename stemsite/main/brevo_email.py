@@ -1,29 +1,49 @@
-import requests
 from django.conf import settings
 
+from main.utils import http_client
 
-BREVO_SEND_EMAIL_URL = "https://api.brevo.com/v3/smtp/email"
 
+BREVO_SEND_EMAIL_PATH = "/v3/smtp/email"
 
-def send_brevo_email(to_email, subject, html_content):
+
+class BrevoError(Exception):
     """
-    Send email using Brevo HTTP API (Render free-tier safe)
+    Brevo answered with an error. status_code tells a request Brevo
+    rejected (4xx, e.g. an invalid address) from an outage (5xx).
     """
 
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _brevo_headers():
     if not settings.BREVO_API_KEY:
         raise ValueError("BREVO_API_KEY is not set")
 
-    headers = {
+    return {
         "api-key": settings.BREVO_API_KEY,
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
 
+
+def _brevo_sender():
+    return {
+        "name": settings.BREVO_SENDER_NAME,
+        "email": settings.BREVO_SENDER_EMAIL,
+    }
+
+
+def send_brevo_email(to_email, subject, html_content):
+    """
+    Send email using Brevo HTTP API (Render free-tier safe)
+    """
+
+    headers = _brevo_headers()
+
     payload = {
-        "sender": {
-            "name": settings.BREVO_SENDER_NAME,
-            "email": settings.BREVO_SENDER_EMAIL,
-        },
+        "sender": _brevo_sender(),
         "to": [
             {
                 "email": to_email,
@@ -33,18 +53,109 @@ def send_brevo_email(to_email, subject, html_content):
         "htmlContent": html_content,
     }
 
-    response = requests.post(
-        BREVO_SEND_EMAIL_URL,
+    response = http_client.post(
+        "brevo",
+        BREVO_SEND_EMAIL_PATH,
+        endpoint="brevo.send",
         headers=headers,
         json=payload,
-        timeout=10,
     )
 
     if response.status_code not in (200, 201):
-        raise Exception(
+        raise BrevoError(
             f"Brevo email failed "
-            f"[{response.status_code}]: {response.text}"
+            f"[{response.status_code}]: {response.text}",
+            response.status_code,
+        )
+
+    return True
+
+
+def send_brevo_batch(emails):
+    """
+    Send many emails in a single Brevo HTTP call using messageVersions.
+    emails: iterable of dicts with to_email, subject and html_content keys.
+    Every version carries its own recipient, subject and body.
+    """
+    emails = list(emails)
+    if not emails:
+        return True
+
+    headers = _brevo_headers()
+
+    first = emails[0]
+    payload = {
+        "sender": _brevo_sender(),
+        "subject": first["subject"],
+        "htmlContent": first["html_content"],
+        "messageVersions": [
+            {
+                "to": [{"email": email["to_email"]}],
+                "subject": email["subject"],
+                "htmlContent": email["html_content"],
+            }
+            for email in emails
+        ],
+    }
+
+    response = http_client.post(
+        "brevo",
+        BREVO_SEND_EMAIL_PATH,
+        endpoint="brevo.send_batch",
+        headers=headers,
+        json=payload,
+        timeout=30,
+    )
+
+    if response.status_code not in (200, 201):
+        raise BrevoError(
+            f"Brevo batch email failed "
+            f"[{response.status_code}]: {response.text}",
+            response.status_code,
         )
 
     return True
 
+
+def send_brevo_broadcast(subject, html_content, recipients):
+    """
+    Send one body to many recipients in a single Brevo HTTP call.
+    html_content holds {{ params.x }} placeholders; recipients is an
+    iterable of (to_email, params) pairs, filled in by Brevo per version.
+    """
+    recipients = list(recipients)
+    if not recipients:
+        return True
+
+    headers = _brevo_headers()
+
+    payload = {
+        "sender": _brevo_sender(),
+        "subject": subject,
+        "htmlContent": html_content,
+        "messageVersions": [
+            {
+                "to": [{"email": to_email}],
+                "params": params,
+            }
+            for to_email, params in recipients
+        ],
+    }
+
+    response = http_client.post(
+        "brevo",
+        BREVO_SEND_EMAIL_PATH,
+        endpoint="brevo.send_broadcast",
+        headers=headers,
+        json=payload,
+        timeout=30,
+    )
+
+    if response.status_code not in (200, 201):
+        raise BrevoError(
+            f"Brevo broadcast email failed "
+            f"[{response.status_code}]: {response.text}",
+            response.status_code,
+        )
+
+    return True
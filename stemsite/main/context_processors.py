@@ -1,11 +1,11 @@
 # main/context_processors.py
+from chat.utils import read_guest_id
+
+
 def guest_chat_id(request):
     if request.user.is_authenticated:
         return {}  # real users already have username
 
-    if 'guest_id' not in request.session:
-        import uuid
-        request.session['guest_id'] = f"guest_{uuid.uuid4().hex[:8]}"  
-
-    return {"guest_id": request.session.get("guest_id")}
-
+    # Read only: the guest id is minted by chat's guest_identity view when
+    # the visitor actually opens the chat, never on a plain page view.
+    return {"guest_id": read_guest_id(request)}
@@ -9,6 +9,45 @@ from django.forms import HiddenInput
 
 from .models import CoursePayment, Course
 from .models import Enrollment, ContactMessage, Profile
+from main.utils.direct_upload import UploadError, claim_upload
+
+
+# ----------------------------
+# Direct uploads (main/utils/direct_upload.py)
+# ----------------------------
+class DirectUploadModelForm(forms.ModelForm):
+    """
+    ModelForm whose file may arrive as an upload_token (the file is already
+    in storage, sent there by assets/js/direct_upload.js) instead of the
+    file bytes. Subclasses set upload_purpose and upload_field; the view
+    passes upload_scope, the object the visitor was authorised to upload to.
+    """
+    upload_purpose = None
+    upload_field = "file"
+    upload_scope = None
+
+    upload_token = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, upload_scope=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if upload_scope is not None:
+            self.upload_scope = upload_scope
+        # Either the file or an upload_token, checked in clean()
+        field = self.fields[self.upload_field]
+        self.upload_required, field.required = field.required, False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        token = cleaned_data.get("upload_token")
+        if token:
+            try:
+                cleaned_data[self.upload_field] = claim_upload(token, self.upload_purpose, self.upload_scope)
+            except UploadError as e:
+                self.add_error(self.upload_field, str(e))
+        elif self.upload_required and not cleaned_data.get(self.upload_field) \
+                and self.upload_field not in self.errors:
+            self.add_error(self.upload_field, self.fields[self.upload_field].error_messages["required"])
+        return cleaned_data
 
 
 # ----------------------------
@@ -92,7 +131,7 @@ class EnrollmentForm(forms.ModelForm):
             return cleaned_data
 
         # Check if course has a minimum level
-        required_level = COURSE_MIN_LEVEL.get(course)
+        required_level = COURSE_MIN_LEVEL.get(course.title)
         if required_level:
             if SKILL_LEVEL_ORDER[skill_level] < SKILL_LEVEL_ORDER[required_level]:
                 raise ValidationError(
@@ -105,7 +144,10 @@ class EnrollmentForm(forms.ModelForm):
 # ----------------------------
 # Payment Proof Form (Bank transfer proof)
 # ----------------------------
-class PaymentProofForm(forms.ModelForm):
+class PaymentProofForm(DirectUploadModelForm):
+    upload_purpose = "enrollment_proof"
+    upload_field = "proof_of_payment"
+
     class Meta:
         model = Enrollment
         fields = ['proof_of_payment']
@@ -116,7 +158,7 @@ class PaymentProofForm(forms.ModelForm):
     # Optionally validate file type/size:
     def clean_proof_of_payment(self):
         file = self.cleaned_data.get('proof_of_payment')
-        if not file:
+        if not file and not self.data.get('upload_token'):
             raise ValidationError("Please upload a valid proof of payment.")
         if file:
             # Example: limit size to 5MB
@@ -385,7 +427,9 @@ class AssignmentSendForm(forms.Form):
 from django import forms
 from .models import AssignmentSubmission
 
-class AssignmentSubmissionForm(forms.ModelForm):
+class AssignmentSubmissionForm(DirectUploadModelForm):
+    upload_purpose = "submission"
+
     class Meta:
         model = AssignmentSubmission
         fields = ['file']
@@ -429,6 +473,7 @@ class AssignmentSendForm(forms.ModelForm):
 
 
 #--------------Assignment Admin-------------
+import zipfile
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import Assignment
@@ -448,6 +493,25 @@ class AssignmentAdminForm(forms.ModelForm):
         fields = ['course', 'title', 'instructions', 'due_date', 'file', 'recipients']
 
 
+class BulkCorrectionForm(forms.Form):
+    archive = forms.FileField(
+        label="Corrections (zip)",
+        help_text="One file per student, named after the username, e.g. ada.pdf or the names from the submissions zip.",
+    )
+    comments = forms.FileField(
+        label="Feedback (CSV)",
+        required=False,
+        help_text="Optional: columns 'username' and 'feedback'.",
+    )
+
+    def clean_archive(self):
+        archive = self.cleaned_data["archive"]
+        if not zipfile.is_zipfile(archive):
+            raise forms.ValidationError("Upload a .zip file.")
+        archive.seek(0)
+        return archive
+
+
 #---------TimeTable AdminForm-----------
 from django import forms
 from django.contrib.admin.widgets import AdminDateWidget, AdminTimeWidget
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+
+from main.models import EmailTemplate
+from main.utils.template_cache import get_email_template
+
+BENCH_TEMPLATE = "bench_broadcast"
+
+BENCH_BODY = """
+<p>Hello {{ name }},</p>
+<p>{% if course %}Your course <strong>{{ course }}</strong> has news.{% else %}We have news.{% endif %}</p>
+<ul>{% for item in items %}<li>{{ item|title }}</li>{% endfor %}</ul>
+<p>Questions? Reply to {{ email|default:"support@stemcodemaster.com" }}.</p>
+<p>- STEM CodeMaster Team</p>
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-recipient cost of rendering an admin EmailTemplate for a broadcast: "
+        "fetch + parse per recipient versus the compiled template cache. "
+        "Uses the configured database; the bench template is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipients", type=int, default=1000, help="Recipients in the broadcast.")
+        parser.add_argument("--db-latency-ms", type=float, default=0,
+                            help="Add this much latency to every SQL statement (simulates a remote Postgres).")
+
+    def handle(self, *args, **options):
+        if options["db_latency_ms"]:
+            delay = options["db_latency_ms"] / 1000
+
+            def slow_execute(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+
+            connection.execute_wrappers.append(slow_execute)
+
+        contexts = [
+            {"name": f"Student {i}", "course": "Python Programming", "email": f"s{i}@example.com",
+             "items": ["new material", "live session", "assignment"]}
+            for i in range(options["recipients"])
+        ]
+
+        def uncached(context):
+            template = EmailTemplate.objects.get(name=BENCH_TEMPLATE)
+            ctx = Context(context)
+            return Template(template.subject).render(ctx), Template(template.body).render(ctx)
+
+        def cached(context):
+            return get_email_template(BENCH_TEMPLATE).render(context)
+
+        EmailTemplate.objects.filter(name=BENCH_TEMPLATE).delete()
+        EmailTemplate.objects.create(name=BENCH_TEMPLATE, subject="News for {{ name }}", body=BENCH_BODY)
+        try:
+            results = {}
+            for label, render in (("fetch + parse per recipient", uncached), ("compiled template cache", cached)):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    rendered = [render(context) for context in contexts]
+                    elapsed = time.perf_counter() - started
+                results[label] = (elapsed, len(queries.captured_queries), rendered)
+        finally:
+            EmailTemplate.objects.filter(name=BENCH_TEMPLATE).delete()
+
+        count = options["recipients"]
+        for label, (elapsed, queries, _) in results.items():
+            self.stdout.write(
+                f"{label:<28} {elapsed * 1000:9.1f} ms total  "
+                f"{elapsed * 1_000_000 / count:8.1f} µs/recipient  {queries} queries"
+            )
+
+        (before, _, old), (after, _, new) = results.values()
+        assert old == new, "cached render differs from the uncached one"
+        self.stdout.write(f"Speed-up: x{before / after:.1f}")
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from main.brevo_email import send_brevo_batch
+from main.tests_support import StubServer
+from main.utils import http_client
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Brevo batch sends with a new connection per call (plain requests.post) "
+        "against the pooled integration client, using a local stub server that "
+        "charges a handshake delay for every new connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200, help="Batch sends per mode.")
+        parser.add_argument("--batch", type=int, default=50, help="Emails per batch send.")
+        parser.add_argument("--handshake-ms", type=float, default=30, help="Simulated TCP+TLS setup per connection.")
+        parser.add_argument("--latency-ms", type=float, default=5, help="Simulated upstream processing per request.")
+
+    def handle(self, *args, **options):
+        emails = [
+            {"to_email": f"bench{i}@example.com", "subject": "Bench", "html_content": "<p>Hi</p>"}
+            for i in range(options["batch"])
+        ]
+
+        with StubServer(handshake_ms=options["handshake_ms"], latency_ms=options["latency_ms"]) as stub:
+            with override_settings(BREVO_API_URL=stub.url, BREVO_API_KEY="bench"):
+                url = stub.url + "/v3/smtp/email"
+
+                def unpooled():
+                    # What every call used to do: a fresh connection each time
+                    requests.post(url, json={"messageVersions": emails}, timeout=30)
+
+                def pooled():
+                    send_brevo_batch(emails)
+
+                results = {}
+                for label, send in (("new connection per call", unpooled), ("pooled client", pooled)):
+                    http_client.close_sessions()
+                    http_client.reset_metrics()
+                    connections_before = stub.connections
+                    samples = []
+                    started = time.perf_counter()
+                    for _ in range(options["calls"]):
+                        t0 = time.perf_counter()
+                        send()
+                        samples.append((time.perf_counter() - t0) * 1000)
+                    elapsed = time.perf_counter() - started
+                    results[label] = (samples, elapsed, stub.connections - connections_before)
+
+                metrics = http_client.metrics_snapshot()
+
+        for label, (samples, elapsed, connections) in results.items():
+            self.stdout.write(
+                f"{label:>24}: {options['calls'] / elapsed:8.1f} calls/s "
+                f"({options['calls'] * options['batch'] / elapsed:8.0f} emails/s), "
+                f"p50 {statistics.median(samples):6.2f} ms, p99 {percentile(samples, 99):6.2f} ms, "
+                f"{connections} connection(s)"
+            )
+
+        baseline = results["new connection per call"][1]
+        pooled_elapsed = results["pooled client"][1]
+        self.stdout.write(f"Throughput gain from connection reuse: x{baseline / pooled_elapsed:.2f}")
+
+        for endpoint, stats in metrics.items():
+            self.stdout.write(f"{endpoint}: {stats}")
@@ -0,0 +1,79 @@
+import tempfile
+import time
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from main.utils.direct_upload import claim_upload, issue_upload, receive_local_upload
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker time per assignment upload: the file proxied through Django "
+        "(multipart parse + storage upload) versus a direct upload (sign + claim). "
+        "Files go to a temporary directory; --storage-mbps / --storage-rtt-ms make "
+        "the storage behave like a remote one (Cloudinary)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=float, default=20, help="Size of the uploaded file.")
+        parser.add_argument("--uploads", type=int, default=5, help="Uploads per flow.")
+        parser.add_argument("--storage-mbps", type=float, default=0,
+                            help="Bandwidth from the worker to storage, in megabits/s (0: local disk speed).")
+        parser.add_argument("--storage-rtt-ms", type=float, default=0,
+                            help="Round trip added to every storage call.")
+
+    def handle(self, *args, **options):
+        size = int(options["size_mb"] * 1024 * 1024)
+        data = b"%PDF" + b"x" * (size - 4)
+        rtt = options["storage_rtt_ms"] / 1000
+        mbps = options["storage_mbps"]
+
+        save, stored_size = FileSystemStorage._save, FileSystemStorage.size
+
+        def remote_save(storage, name, content):
+            time.sleep(rtt + (content.size * 8 / (mbps * 1_000_000) if mbps else 0))
+            return save(storage, name, content)
+
+        def remote_size(storage, name):
+            time.sleep(rtt)
+            return stored_size(storage, name)
+
+        factory = RequestFactory()
+        scope = "1:1"
+
+        def proxied():
+            request = factory.post("/", {"file": SimpleUploadedFile("work.pdf", data)})
+            uploaded = request.FILES["file"]  # multipart parse, as the view does
+            FileSystemStorage().save("assignments/submissions/work.pdf", uploaded)
+
+        def direct():
+            upload = issue_upload("submission", scope, "work.pdf")  # /uploads/sign/
+            paused = time.perf_counter()
+            # Browser -> storage: not worker time
+            with mock.patch.object(FileSystemStorage, "_save", save):
+                receive_local_upload(upload["token"], SimpleUploadedFile("work.pdf", data))
+            skipped = time.perf_counter() - paused
+            claim_upload(upload["token"], "submission", scope)  # form post
+            return skipped
+
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), \
+                mock.patch.object(FileSystemStorage, "_save", remote_save), \
+                mock.patch.object(FileSystemStorage, "size", remote_size):
+            results = {}
+            for label, flow in (("proxied through Django", proxied), ("direct to storage", direct)):
+                worker = 0
+                for _ in range(options["uploads"]):
+                    started = time.perf_counter()
+                    skipped = flow() or 0
+                    worker += time.perf_counter() - started - skipped
+                results[label] = worker / options["uploads"]
+
+        self.stdout.write(f"{options['size_mb']:g} MB file, {options['uploads']} uploads per flow")
+        for label, per_upload in results.items():
+            self.stdout.write(f"{label:<24} {per_upload * 1000:9.1f} ms worker time/upload")
+        before, after = results.values()
+        self.stdout.write(f"Speed-up: x{before / after:.0f}")
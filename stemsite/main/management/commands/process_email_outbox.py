@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.utils.email_outbox import BATCH_SIZE, BROADCAST_BATCH_SIZE, deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OutgoingEmail rows through Brevo in batches (runs as a loop by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the outbox once and exit.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Emails per Brevo call.")
+        parser.add_argument("--broadcast-batch-size", type=int, default=BROADCAST_BATCH_SIZE,
+                            help="Broadcast recipients per Brevo call.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        broadcast_batch_size = options["broadcast_batch_size"]
+
+        while True:
+            sent_total = failed_total = 0
+
+            # Keep draining while there is due work
+            while True:
+                sent, failed = deliver_pending(batch_size=batch_size, broadcast_batch_size=broadcast_batch_size)
+                sent_total += sent
+                failed_total += failed
+                if not sent and not failed:
+                    break
+
+            if sent_total or failed_total:
+                self.stdout.write(f"Outbox: {sent_total} sent, {failed_total} failed (will retry)")
+
+            if options["once"]:
+                return
+
+            time.sleep(options["interval"])
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.utils.paystack import BATCH_SIZE, apply_pending_events
+
+
+class Command(BaseCommand):
+    help = "Apply Paystack webhook events to enrollments, course payments and service requests (runs as a loop by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Apply pending events once and exit.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Events per batch.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when nothing is pending.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        while True:
+            processed_total = failed_total = 0
+
+            # Keep going while batches make progress; failures wait for their retry time
+            while True:
+                processed, failed = apply_pending_events(batch_size=batch_size)
+                processed_total += processed
+                failed_total += failed
+                if not processed:
+                    break
+
+            if processed_total or failed_total:
+                self.stdout.write(f"Payment events: {processed_total} applied, {failed_total} failed")
+
+            if options["once"]:
+                return
+
+            time.sleep(options["interval"])
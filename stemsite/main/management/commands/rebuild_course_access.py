@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main.utils.entitlements import REBUILD_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the CourseAccess table from Enrollment and CoursePayment. "
+        "Signals keep it current; run this after bulk edits that skip them "
+        "(queryset.update(), raw SQL, loaddata)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE, help="Enrollments per upsert.")
+
+    def handle(self, *args, **options):
+        total = rebuild(batch_size=options["batch_size"])
+        self.stdout.write(f"Course access rebuilt for {total} enrollment(s)")
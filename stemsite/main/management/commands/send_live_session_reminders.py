@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.utils.email_reminders import BATCH_SIZE, send_upcoming_live_session_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue 24-hour, 3-hour and 1-hour live session reminders "
+        "(dashboard notification + outbox email per student). Runs as a loop by default."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run a single tick and exit.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Reminders per transaction.")
+        parser.add_argument("--interval", type=float, default=60.0, help="Seconds between ticks.")
+
+    def handle(self, *args, **options):
+        while True:
+            queued, failed = send_upcoming_live_session_reminders(batch_size=options["batch_size"])
+
+            if queued or failed:
+                self.stdout.write(f"Reminders: {queued} queued, {failed} failed (will retry)")
+
+            if options["once"]:
+                return
+
+            time.sleep(options["interval"])
@@ -0,0 +1,34 @@
+# Enrollment.course: free-text title -> ForeignKey to Course (step 1 of 3)
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0057_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='enrollment',
+            unique_together=set(),
+        ),
+        migrations.RenameField(
+            model_name='enrollment',
+            old_name='course',
+            new_name='course_title',
+        ),
+        # Defaulted so that step 3 can be reversed on a populated table
+        migrations.AlterField(
+            model_name='enrollment',
+            name='course_title',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='course',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='main.course'),
+        ),
+    ]
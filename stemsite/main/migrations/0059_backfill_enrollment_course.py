@@ -0,0 +1,83 @@
+# Enrollment.course: map stored titles to Course rows (step 2 of 3)
+
+from django.db import migrations
+from django.db.models import Count, Exists, OuterRef
+
+
+def _normalize(title):
+    return " ".join((title or "").split()).casefold()
+
+
+def backfill_course(apps, schema_editor):
+    Course = apps.get_model('main', 'Course')
+    Enrollment = apps.get_model('main', 'Enrollment')
+
+    # Duplicate titles resolve to the first course in display order
+    courses = {}
+    for course in Course.objects.order_by('-order', '-pk'):
+        courses[_normalize(course.title)] = course
+
+    titles = list(Enrollment.objects.filter(course__isnull=True).values_list('course_title', flat=True).distinct())
+
+    # Never invent a Course: it would be listed on the public site. Titles
+    # with no matching Course stop the migration so the admin can add them.
+    unmatched = sorted({(title or "").strip() or "<blank>" for title in titles if _normalize(title) not in courses})
+    if unmatched:
+        raise RuntimeError(
+            "Enrollments refer to course titles with no matching Course: "
+            + ", ".join(repr(title) for title in unmatched)
+            + ". Create these courses in the admin (or correct the enrollments), then run migrate again."
+        )
+
+    for title in titles:
+        Enrollment.objects.filter(course__isnull=True, course_title=title).update(course=courses[_normalize(title)])
+
+    merge_duplicate_enrollments(apps)
+
+
+def merge_duplicate_enrollments(apps):
+    """
+    Titles that only differed in case or spacing now point a user at the
+    same Course twice, which step 3's unique (user, course) rejects. Keep
+    one enrollment per pair (verified payment, then paid, activated,
+    active, oldest) and move the others' payments onto it.
+    """
+    CoursePayment = apps.get_model('main', 'CoursePayment')
+    Enrollment = apps.get_model('main', 'Enrollment')
+
+    clashes = (
+        Enrollment.objects.values('user_id', 'course_id')
+        .annotate(rows=Count('pk')).filter(rows__gt=1)
+    )
+    verified = CoursePayment.objects.filter(enrollment=OuterRef('pk'), is_verified=True)
+    for clash in clashes:
+        enrollments = list(
+            Enrollment.objects.filter(user_id=clash['user_id'], course_id=clash['course_id'])
+            .annotate(has_verified_payment=Exists(verified))
+            .order_by('-has_verified_payment', '-is_enrollment_paid', '-is_course_activated', '-is_active', 'pk')
+        )
+        keep, duplicates = enrollments[0], enrollments[1:]
+        duplicate_ids = [enrollment.pk for enrollment in duplicates]
+        CoursePayment.objects.filter(enrollment_id__in=duplicate_ids).update(enrollment=keep)
+        Enrollment.objects.filter(pk__in=duplicate_ids).delete()
+        print(
+            f"\n  Merged enrollment(s) {duplicate_ids} into {keep.pk} "
+            f"(user {clash['user_id']}, course {clash['course_id']})"
+        )
+
+
+def restore_course_title(apps, schema_editor):
+    Enrollment = apps.get_model('main', 'Enrollment')
+    for enrollment in Enrollment.objects.select_related('course').only('pk', 'course__title'):
+        Enrollment.objects.filter(pk=enrollment.pk).update(course_title=enrollment.course.title[:100])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0058_enrollment_course_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_course, restore_course_title),
+    ]
@@ -0,0 +1,31 @@
+# Enrollment.course: drop the old title column and enforce the FK (step 3 of 3)
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0059_backfill_enrollment_course'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='enrollment',
+            name='course_title',
+        ),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='main.course'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='enrollment',
+            unique_together={('user', 'course')},
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'is_active'], name='enrollment_course_active_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:51
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('main', '0060_enrollment_course_not_null'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminmessage',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['student', '-created_at'], name='adminmsg_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursepayment',
+            index=models.Index(condition=models.Q(('is_verified', True)), fields=['enrollment', 'course'], name='cpay_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(django.db.models.functions.text.Upper('email'), django.db.models.functions.text.Upper('secret_code'), condition=models.Q(('is_active', True)), name='enrollment_login_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['user', '-submitted_at'], name='enrollment_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livesession',
+            index=models.Index(condition=models.Q(('reminder_24hr_sent', False)), fields=['start_time'], name='live_due_24hr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livesession',
+            index=models.Index(condition=models.Q(('reminder_sent', False)), fields=['start_time'], name='live_due_3hr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livesession',
+            index=models.Index(condition=models.Q(('reminder_1hr_sent', False)), fields=['start_time'], name='live_due_1hr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['student', '-created_at'], name='notif_student_unread_idx'),
+        ),
+        # Login looks users up with username__iexact / email__iexact; auth_user
+        # belongs to django.contrib.auth, so its functional indexes are raw SQL
+        # (valid on both PostgreSQL and SQLite).
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX IF NOT EXISTS auth_user_username_ci_idx ON auth_user (UPPER("username"));',
+                'CREATE INDEX IF NOT EXISTS auth_user_email_ci_idx ON auth_user (UPPER("email"));',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS auth_user_username_ci_idx;',
+                'DROP INDEX IF EXISTS auth_user_email_ci_idx;',
+            ],
+        ),
+    ]
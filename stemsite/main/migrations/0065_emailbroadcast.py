@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0064_notification_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('html_content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='params',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='html_content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='broadcast',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='emails', to='main.emailbroadcast'),
+        ),
+    ]
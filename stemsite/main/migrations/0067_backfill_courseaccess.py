@@ -0,0 +1,40 @@
+# CourseAccess: one row per existing enrollment (same rule as main/utils/entitlements.py)
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+def backfill_course_access(apps, schema_editor):
+    CourseAccess = apps.get_model('main', 'CourseAccess')
+    CoursePayment = apps.get_model('main', 'CoursePayment')
+    Enrollment = apps.get_model('main', 'Enrollment')
+
+    verified = CoursePayment.objects.filter(enrollment=OuterRef('pk'), course=OuterRef('course'), is_verified=True)
+    enrollments = Enrollment.objects.annotate(
+        has_verified_payment=Exists(verified),
+        has_blocked_payment=Exists(verified.filter(dashboard_blocked=True)),
+    ).only('id', 'user_id', 'course_id', 'is_course_activated')
+
+    rows = []
+    for enrollment in enrollments.iterator(chunk_size=1000):
+        if enrollment.has_blocked_payment:
+            status = 'blocked'
+        elif enrollment.has_verified_payment or enrollment.is_course_activated:
+            status = 'active'
+        else:
+            status = 'unpaid'
+        rows.append(CourseAccess(
+            enrollment_id=enrollment.pk, user_id=enrollment.user_id, course_id=enrollment.course_id, status=status,
+        ))
+    CourseAccess.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0066_courseaccess'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_course_access, migrations.RunPython.noop),
+    ]
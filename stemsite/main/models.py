@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -18,18 +20,6 @@ class Enrollment(models.Model):
         ('Hybrid Program', 'Hybrid Program'),
     ]
 
-    COURSE_CHOICES = [
-        ('App Inventor', 'App Inventor'),
-        ('Advance Full Stack Web Development with Django', 'Advance Full Stack Web Development with Django'),
-        ('Robotics with Arduino Uno and Micro:bit', 'Robotics with Arduino Uno and Micro:bit'),
-        ('Python Programming', 'Python Programming'),
-        ('Full Stack Web Development with Django', 'Full Stack Web Development with Django'),
-        ('Scratch and PictoBlox Coding', 'Scratch and PictoBlox Coding'),
-        ('Frontend Web Development (HTML, CSS & JavaScript)', 'Frontend Web Development (HTML, CSS & JavaScript)'),
-        ('Responsive Web Development with Bootstrap 5', 'Responsive Web Development with Bootstrap 5'),
-        ('Full Stack Web Development with Laravel', 'Full Stack Web Development with Laravel'),
-    ]
-
     CLASS_TYPE_CHOICES = [
         ('Evening / After-School Class', 'Evening / After-School Class'),
         ('Weekend Class', 'Weekend Class'),
@@ -55,7 +45,7 @@ class Enrollment(models.Model):
     
     # Program details
     program = models.CharField(max_length=50, choices=PROGRAM_CHOICES)
-    course = models.CharField(max_length=100, choices=COURSE_CHOICES)
+    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name="enrollments")
     class_type = models.CharField(max_length=50, choices=CLASS_TYPE_CHOICES)
     skill_level = models.CharField(max_length=20,choices=SKILL_LEVEL_CHOICES,blank=False)
     
@@ -83,6 +73,18 @@ class Enrollment(models.Model):
     
     class Meta:
         unique_together = ('user', 'course')
+        indexes = [
+            # "Active students of course X" fan-outs (signals, admin, notifications)
+            models.Index(fields=["course", "is_active"], name="enrollment_course_active_idx"),
+            # Secret code login: email__iexact + secret_code__iexact on active rows
+            models.Index(
+                Upper("email"), Upper("secret_code"),
+                condition=Q(is_active=True),
+                name="enrollment_login_ci_idx",
+            ),
+            # A student's enrollments, latest first (portal)
+            models.Index(fields=["user", "-submitted_at"], name="enrollment_user_recent_idx"),
+        ]
     
     
     def __str__(self):
@@ -252,10 +254,46 @@ class CoursePayment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     dashboard_blocked = models.BooleanField(default=False)  # ✅ new field
 
+    class Meta:
+        indexes = [
+            # "Has this enrollment a verified payment (for this course)?"
+            models.Index(fields=["enrollment", "course"], condition=Q(is_verified=True), name="cpay_verified_idx"),
+        ]
+
     def __str__(self):
         return f"{self.enrollment.full_name} - {self.course.title} - {self.amount_paid}"
 
 
+class CourseAccess(models.Model):
+    """
+    Whether a student may use a course (dashboard, materials), precomputed
+    per enrollment from Enrollment and CoursePayment by
+    main/utils/entitlements.py. Kept current by signals; rebuilt with
+    `python manage.py rebuild_course_access`. Read it with has_access().
+    """
+    ACTIVE = 'active'
+    UNPAID = 'unpaid'
+    BLOCKED = 'blocked'
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (UNPAID, 'Awaiting payment'),
+        (BLOCKED, 'Blocked'),
+    ]
+
+    enrollment = models.OneToOneField('Enrollment', on_delete=models.CASCADE, related_name='access')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_access')
+    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=UNPAID)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'course')
+        verbose_name_plural = 'course access'
+
+    def __str__(self):
+        return f"{self.user} - {self.course_id} - {self.status}"
+
+
 # models.py
 
 class BankDetails(models.Model):
@@ -361,6 +399,11 @@ class AdminMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_archived = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Dashboard inbox: a student's non-archived messages, newest first
+            models.Index(fields=["student", "-created_at"], condition=Q(is_archived=False), name="adminmsg_inbox_idx"),
+        ]
 
     def __str__(self):
         return f"To {self.student.username} - {self.title}"
@@ -403,10 +446,47 @@ class LiveSession(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Reminder scans: upcoming sessions whose reminder is still due.
+            # Partial, so each index only holds the sessions left to remind.
+            models.Index(fields=["start_time"], condition=Q(reminder_24hr_sent=False), name="live_due_24hr_idx"),
+            models.Index(fields=["start_time"], condition=Q(reminder_sent=False), name="live_due_3hr_idx"),
+            models.Index(fields=["start_time"], condition=Q(reminder_1hr_sent=False), name="live_due_1hr_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.course.title}"
 
 
+class LiveSessionReminder(models.Model):
+    """
+    Delivery ledger for live session reminders: one row per (session,
+    student, window), written in the same transaction as the reminder's
+    Notification and outbox email. The unique constraint is what makes the
+    scheduler (`python manage.py send_live_session_reminders`) safe to
+    crash, re-run or run twice.
+    """
+    WINDOW_CHOICES = [
+        ('24hr', '24 hours'),
+        ('3hr', '3 hours'),
+        ('1hr', '1 hour'),
+    ]
+
+    session = models.ForeignKey(LiveSession, on_delete=models.CASCADE, related_name='reminders')
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='live_session_reminders')
+    window = models.CharField(max_length=5, choices=WINDOW_CHOICES)
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'student', 'window'], name='live_reminder_once'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} reminder to {self.student_id} for session {self.session_id}"
+
+
 #--------parent testimonial----------
 class ParentTestimonial(models.Model):
     name = models.CharField(max_length=100)
@@ -452,11 +532,24 @@ class Notification(models.Model):
     message = models.TextField(blank=True, null=True)
     obj_content_type = models.ForeignKey('contenttypes.ContentType', null=True, blank=True, on_delete=models.SET_NULL)
     obj_id = models.PositiveIntegerField(null=True, blank=True)
+    # What happened to obj, e.g. "live_session.created" (see main/utils/notifications.py).
+    # Blank for manual notifications, which are never de-duplicated.
+    event = models.CharField(max_length=50, blank=True, default='')
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Dashboard bell: a student's unread notifications, newest first
+            models.Index(fields=["student", "-created_at"], condition=Q(is_read=False), name="notif_student_unread_idx"),
+        ]
+        constraints = [
+            # One notification per recipient per event, however many code paths emit it
+            models.UniqueConstraint(
+                fields=["event", "obj_id", "student"], condition=~Q(event=""), name="notif_event_once"
+            ),
+        ]
 
     def __str__(self):
         return f"Notif to {self.student.username}: {self.title}"
@@ -498,3 +591,92 @@ class Program(models.Model):
 
 
 
+
+
+#------------------Email Outbox---------------------
+class EmailBroadcast(models.Model):
+    """
+    One email sent to many students, rendered once: the body holds Brevo
+    placeholders ({{ params.student_name }}) and every OutgoingEmail of the
+    broadcast only carries its recipient and params (main/utils/broadcast.py).
+    """
+    subject = models.CharField(max_length=255)
+    html_content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting to be delivered by the outbox worker
+    (`python manage.py process_email_outbox`).
+    Signals and views only insert rows here; Brevo is called off the request path.
+    Broadcast rows leave html_content empty and use broadcast + params instead.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    html_content = models.TextField(blank=True)
+    broadcast = models.ForeignKey(
+        EmailBroadcast, on_delete=models.CASCADE, blank=True, null=True, related_name='emails'
+    )
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
+
+
+#------------------Paystack Webhook Events---------------------
+class PaymentEvent(models.Model):
+    """
+    A Paystack charge event received by the webhook, one row per transaction
+    reference. The unique reference makes Paystack's retries and duplicate
+    deliveries no-ops; the payment worker
+    (`python manage.py process_payment_events`) applies pending rows to
+    Enrollment, CoursePayment or services.ServiceRequest.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
+    reference = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='payevent_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.reference} ({self.status})"
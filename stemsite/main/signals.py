@@ -1,9 +1,10 @@
 # main/signals.py
 
 import logging
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.contrib.contenttypes.models import ContentType
 from django.utils.timezone import localtime
 from django.contrib.auth import get_user_model
 from django.template.loader import render_to_string
@@ -14,37 +15,69 @@ from .models import (
     LiveSession,
     Timetable,
     AdminMessage,
-    Notification,
     Enrollment,
     GlobalTimetable,
+    CoursePayment,
+    AssignmentSubmission,
+    Complaint,
+    Profile,
+    StudentCourse,
+    Course,
+    ParentTestimonial,
+    CoursePlan,
+    AboutSection,
+    ProgramIntro,
+    Program,
+    EmailTemplate,
+)
+from main.utils import dashboard_cache, entitlements, page_cache, template_cache
+from main.utils.broadcast import param, queue_broadcast
+from main.utils.email_outbox import build_email, queue_emails  # ✅ Delivered by the outbox worker
+from main.utils.notifications import (
+    GLOBAL_TIMETABLE_CREATED, LIVE_SESSION_CREATED, TIMETABLE_CREATED, fan_out_notifications, resolve_recipients,
 )
-from main.brevo_email import send_brevo_email  # ✅ Our existing Brevo helper
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
 # -------------------------------
-# HELPER — Send Email via Brevo
+# HELPER — Build outbox email
 # -------------------------------
-def send_student_email(to_email, subject, template_name=None, context=None):
+def build_student_email(to_email, subject, template_name=None, context=None):
     """
-    Render the template and send email via Brevo.
+    Render the template into an unsaved OutgoingEmail.
     template_name: template filename without .html in main/templates/emails/
+    Receivers collect these and queue them with one bulk INSERT; the
+    `process_email_outbox` worker sends them through Brevo.
     """
-    try:
-        html_content = None
-        if template_name:
-            html_content = render_to_string(f"emails/{template_name}.html", context or {})
-
-        send_brevo_email(
-            to_email=to_email,
-            subject=subject,
-            html_content=html_content
-        )
-        logger.info(f"[EMAIL SENT ✅] To: {to_email} | Subject: {subject} | Template: {template_name or 'N/A'}")
-    except Exception as e:
-        logger.error(f"[EMAIL FAILED ❌] To: {to_email} | Subject: {subject} | Template: {template_name or 'N/A'} | Error: {e}")
+    html_content = None
+    if template_name:
+        html_content = render_to_string(f"emails/{template_name}.html", context or {})
+
+    return build_email(to_email, subject, html_content)
+
+
+def queue_student_emails(emails, label):
+    queued = queue_emails(emails)
+    logger.info(f"[EMAIL QUEUED 📬] {queued} email(s) | {label}")
+    return queued
+
+
+def queue_student_broadcast(students, subject, template_name, context, label):
+    """
+    Render the template once with a {{ params.student_name }} placeholder
+    (context may use param("student_name")) and queue it for every student,
+    see main/utils/broadcast.py.
+    """
+    html_content = render_to_string(f"emails/{template_name}.html", context)
+    queued = queue_broadcast(
+        ((student.email, {"student_name": student.get_full_name() or student.username}) for student in students),
+        subject,
+        html_content,
+    )
+    logger.info(f"[EMAIL QUEUED 📬] {queued} email(s), rendered once | {label}")
+    return queued
 
 
 # ======================================================
@@ -55,34 +88,32 @@ def notify_assignment(sender, instance, created, **kwargs):
     if not created:
         return
 
-    enrollments = Enrollment.objects.filter(course=instance.course, is_active=True).select_related("user")
-    for enroll in enrollments:
-        user = enroll.user
-        if not user or not getattr(user, "email", None):
-            continue
-
-        # Dashboard notification
-        Notification.objects.create(
-            student=user,
-            notif_type="assignment",
-            title=f"New Assignment: {instance.title}",
-            message=f"A new assignment '{instance.title}' was added.",
-            obj_content_type=ContentType.objects.get_for_model(Assignment),
-            obj_id=instance.id,
-        )
-
-        # Brevo HTML email
-        send_student_email(
-            to_email=user.email,
-            subject=f"New Assignment: {instance.title}",
-            template_name="assignment_notification",
-            context={
-                "student_name": user.get_full_name() or user.username,
-                "assignment_title": instance.title,
-                "course_title": str(instance.course),
-                "due_date": instance.due_date.strftime("%A, %b %d, %Y") if instance.due_date else "N/A",
-            }
-        )
+    students = resolve_recipients(
+        User.objects.filter(enrolments__course=instance.course, enrolments__is_active=True).exclude(email="")
+    )
+
+    # Dashboard notifications
+    fan_out_notifications(
+        students,
+        notif_type="assignment",
+        title=f"New Assignment: {instance.title}",
+        message=f"A new assignment '{instance.title}' was added.",
+        obj=instance,
+    )
+
+    # Brevo HTML email (queued, rendered once)
+    queue_student_broadcast(
+        students,
+        subject=f"New Assignment: {instance.title}",
+        template_name="assignment_notification",
+        context={
+            "student_name": param("student_name"),
+            "assignment_title": instance.title,
+            "course_title": str(instance.course),
+            "due_date": instance.due_date.strftime("%A, %b %d, %Y") if instance.due_date else "N/A",
+        },
+        label=f"Assignment {instance.id}",
+    )
 
 
 # ======================================================
@@ -93,39 +124,36 @@ def notify_material(sender, instance, created, **kwargs):
     if not created:
         return
 
-    enrolled_user_ids = Enrollment.objects.filter(course=instance.course, is_active=True).values_list("user", flat=True)
-    students = User.objects.filter(id__in=enrolled_user_ids)
+    students = resolve_recipients(
+        User.objects.filter(enrolments__course=instance.course, enrolments__is_active=True).exclude(email="")
+    )
 
     uploaded_on = localtime(instance.uploaded_at).strftime("%A, %b %d, %Y %H:%M") if instance.uploaded_at else "Not specified"
     instructor_name = "TBA"
 
-    for student in students:
-        if not getattr(student, "email", None):
-            continue
-
-        # Dashboard notification
-        Notification.objects.create(
-            student=student,
-            notif_type="material",
-            title=f"New Material: {instance.title}",
-            message=f"New learning material '{instance.title}' is available.",
-            obj_content_type=ContentType.objects.get_for_model(Material),
-            obj_id=instance.id,
-        )
-
-        send_student_email(
-            to_email=student.email,
-            subject=f"New Material Added: {instance.title}",
-            template_name="material_notification",
-            context={
-                "student_name": student.get_full_name() or student.username,
-                "course_name": str(instance.course),
-                "material_title": instance.title,
-                "material_description": instance.description or "No description provided.",
-                "uploaded_on": uploaded_on,
-                "instructor_name": instructor_name,
-            }
-        )
+    # Dashboard notifications
+    fan_out_notifications(
+        students,
+        notif_type="material",
+        title=f"New Material: {instance.title}",
+        message=f"New learning material '{instance.title}' is available.",
+        obj=instance,
+    )
+
+    queue_student_broadcast(
+        students,
+        subject=f"New Material Added: {instance.title}",
+        template_name="material_notification",
+        context={
+            "student_name": param("student_name"),
+            "course_name": str(instance.course),
+            "material_title": instance.title,
+            "material_description": instance.description or "No description provided.",
+            "uploaded_on": uploaded_on,
+            "instructor_name": instructor_name,
+        },
+        label=f"Material {instance.id}",
+    )
 
 
 # ======================================================
@@ -136,44 +164,41 @@ def notify_live_session(sender, instance, created, **kwargs):
     if not created:
         return
 
-    assigned_students = instance.students.all()
-    enrolled_ids = Enrollment.objects.filter(course=instance.course, is_active=True).values_list("user", flat=True)
-    enrolled_students = User.objects.filter(id__in=enrolled_ids)
-
-    students = set(list(assigned_students) + list(enrolled_students))
+    # Students assigned manually + students enrolled in the course, in one query
+    students = resolve_recipients(
+        User.objects.filter(
+            Q(pk__in=instance.students.values("pk"))
+            | Q(enrolments__course=instance.course, enrolments__is_active=True)
+        ).exclude(email="")
+    )
     join_link = getattr(instance, "join_link", "#")
 
-    for student in students:
-        if not getattr(student, "email", None):
-            continue
-
-        student_name = student.get_full_name() or str(student)
-
-        # Dashboard notification
-        Notification.objects.create(
-            student=student,
-            notif_type="live_session",
-            title=f"New Live Session: {instance.title}",
-            message=f"A new live session '{instance.title}' has been scheduled.\nClick here to join: {join_link}",
-            obj_content_type=ContentType.objects.get_for_model(LiveSession),
-            obj_id=instance.id,
-        )
-
-        send_student_email(
-            to_email=student.email,
-            subject=f"New Live Session Scheduled: {instance.title}",
-            template_name="livesession_notification",
-            context={
-                "student_name": student_name,
-                "course_name": str(instance.course),
-                "session_title": instance.title,
-                "session_description": instance.description or "No description provided.",
-                "start_time": localtime(instance.start_time).strftime("%A, %b %d, %Y %H:%M") if instance.start_time else "",
-                "end_time": localtime(instance.end_time).strftime("%A, %b %d, %Y %H:%M") if instance.end_time else "",
-                "join_link": join_link,
-                "instructor_name": str(getattr(instance, "instructor", "TBA")),
-            }
-        )
+    # Dashboard notifications
+    fan_out_notifications(
+        students,
+        notif_type="live_session",
+        title=f"New Live Session: {instance.title}",
+        message=f"A new live session '{instance.title}' has been scheduled.\nClick here to join: {join_link}",
+        obj=instance,
+        event=LIVE_SESSION_CREATED,
+    )
+
+    queue_student_broadcast(
+        students,
+        subject=f"New Live Session Scheduled: {instance.title}",
+        template_name="livesession_notification",
+        context={
+            "student_name": param("student_name"),
+            "course_name": str(instance.course),
+            "session_title": instance.title,
+            "session_description": instance.description or "No description provided.",
+            "start_time": localtime(instance.start_time).strftime("%A, %b %d, %Y %H:%M") if instance.start_time else "",
+            "end_time": localtime(instance.end_time).strftime("%A, %b %d, %Y %H:%M") if instance.end_time else "",
+            "join_link": join_link,
+            "instructor_name": str(getattr(instance, "instructor", "TBA")),
+        },
+        label=f"LiveSession {instance.id}",
+    )
 
 
 # ======================================================
@@ -189,17 +214,17 @@ def notify_timetable(sender, instance, created, **kwargs):
         return
 
     # Dashboard notification
-    Notification.objects.create(
-        student=user,
+    fan_out_notifications(
+        [user],
         notif_type="timetable",
         title="New Class Schedule",
         message=f"A new class timetable has been added for {instance.course}.",
-        obj_content_type=ContentType.objects.get_for_model(Timetable),
-        obj_id=instance.id,
+        obj=instance,
+        event=TIMETABLE_CREATED,
     )
 
-    # Brevo email
-    send_student_email(
+    # Brevo email (queued)
+    queue_student_emails([build_student_email(
         to_email=user.email,
         subject="New Class Timetable Added",
         template_name="timetable_notification",
@@ -211,7 +236,7 @@ def notify_timetable(sender, instance, created, **kwargs):
             "end_time": instance.end_time.strftime("%H:%M") if getattr(instance, "end_time", None) else "",
             "instructor_name": str(getattr(instance, "instructor", "")) or "TBA",
         }
-    )
+    )], f"Timetable {instance.id}")
 
 
 # ======================================================
@@ -227,16 +252,15 @@ def notify_admin_message(sender, instance, created, **kwargs):
         return
 
     # Dashboard notification
-    Notification.objects.create(
-        student=student,
+    fan_out_notifications(
+        [student],
         notif_type="admin_msg",
         title=f"Admin Message: {instance.title}",
         message=instance.message,
-        obj_content_type=ContentType.objects.get_for_model(AdminMessage),
-        obj_id=instance.id,
+        obj=instance,
     )
 
-    send_student_email(
+    queue_student_emails([build_student_email(
         to_email=student.email,
         subject=f"Message from Admin: {instance.title}",
         template_name="admin_message_email",
@@ -245,8 +269,8 @@ def notify_admin_message(sender, instance, created, **kwargs):
             "content": instance.message,
             "student_name": student.get_full_name() or student.username,
         }
-    )
-    
+    )], f"AdminMessage {instance.id}")
+
 #=========================================
 #Schedule
 #=========================================
@@ -255,48 +279,37 @@ def notify_globaltimetable(sender, instance, created, **kwargs):
     if not created:
         return  # Only notify on new timetable entries
 
-    enrollments = Enrollment.objects.filter(course=instance.course).select_related("user")
-    content_type = ContentType.objects.get_for_model(GlobalTimetable)
-
-    for enr in enrollments:
-        student = getattr(enr, "user", None)
-        if not student:
-            continue
-
-        # --- Dashboard Notification ---
-        Notification.objects.create(
-            student=student,
-            notif_type="schedule",
-            title=f"New Class Scheduled: {instance.course.title}",
-            message=(
-                f"Class '{instance.course.title}' scheduled on {instance.date} "
-                f"from {instance.start_time.strftime('%H:%M')} "
-                f"to {instance.end_time.strftime('%H:%M')}. "
-                f"Instructor: {instance.instructor or 'TBA'}."
-            ),
-            obj_content_type=content_type,
-            obj_id=instance.id,
-        )
-
-        # --- Brevo Email ---
-        if student.email:
-            try:
-                html_content = render_to_string(
-                    "emails/globaltimetable_notification.html",  # your template
-                    {
-                        "student": student,   # matches {{ student.username }}
-                        "schedule": instance  # matches {{ schedule.course.title }}, etc.
-                    }
-                )
-
-                send_brevo_email(
-                    to_email=student.email,
-                    subject=f"New Class Scheduled: {instance.course.title}",
-                    html_content=html_content,
-                )
-
-            except Exception as e:
-                print(f"❌ Failed to send email to {student.email}: {e}")
+    students = resolve_recipients(User.objects.filter(enrolments__course=instance.course))
+
+    # --- Dashboard Notifications ---
+    fan_out_notifications(
+        students,
+        notif_type="schedule",
+        title=f"New Class Scheduled: {instance.course.title}",
+        message=(
+            f"Class '{instance.course.title}' scheduled on {instance.date} "
+            f"from {instance.start_time.strftime('%H:%M')} "
+            f"to {instance.end_time.strftime('%H:%M')}. "
+            f"Instructor: {instance.instructor or 'TBA'}."
+        ),
+        obj=instance,
+        event=GLOBAL_TIMETABLE_CREATED,
+    )
+
+    # --- Brevo Email (queued, rendered once) ---
+    html_content = render_to_string(
+        "emails/globaltimetable_notification.html",
+        {
+            "student": {"username": param("username")},  # matches {{ student.username }}
+            "schedule": instance  # matches {{ schedule.course.title }}, etc.
+        }
+    )
+    queued = queue_broadcast(
+        ((student.email, {"username": student.username}) for student in students),
+        f"New Class Scheduled: {instance.course.title}",
+        html_content,
+    )
+    logger.info(f"[EMAIL QUEUED 📬] {queued} email(s), rendered once | GlobalTimetable {instance.id}")
 
 # ======================================================
 # 6️⃣ SECRET CODE GENERATION (plain text)
@@ -338,14 +351,119 @@ Best regards,
 STEM CodeMaster Team
 """
 
-    # Send plain text email via Brevo
-    try:
-        send_brevo_email(
-            to_email=instance.email,
-            subject=f"Your STEM CodeMaster Secret Code{' (Auto)' if reason=='Bank transfer proof uploaded' else ''}",
-            html_content=f"<pre>{plain_text_message}</pre>"
-        )
-        logger.info(f"[EMAIL SENT ✅] Secret code to {instance.email}")
-    except Exception as e:
-        logger.error(f"[EMAIL FAILED ❌] Secret code to {instance.email} | Error: {e}")
+    # Queue plain text email for Brevo
+    queue_student_emails([build_email(
+        to_email=instance.email,
+        subject=f"Your STEM CodeMaster Secret Code{' (Auto)' if reason=='Bank transfer proof uploaded' else ''}",
+        html_content=f"<pre>{plain_text_message}</pre>"
+    )], f"Secret code for enrollment {instance.id}")
+
+
+# ======================================================
+# 7️⃣ DASHBOARD CACHE INVALIDATION
+# ======================================================
+# Admin content seen by every enrolled student: bump the shared version.
+SHARED_DASHBOARD_SECTIONS = {
+    Assignment: ("assignments", "student_profile"),
+    Material: ("materials", "student_profile"),
+    LiveSession: ("live_sessions", "student_profile"),
+    GlobalTimetable: ("schedule",),
+    Assignment.recipients.through: ("assignments", "student_profile"),
+    Material.recipients.through: ("materials", "student_profile"),
+    LiveSession.students.through: ("live_sessions", "student_profile"),
+}
+
+# Rows owned by one student: bump that student's version only.
+# Enrollment drives every section (enrolled courses), hence no list.
+USER_DASHBOARD_SECTIONS = {
+    AdminMessage: ("student_id", ("admin_messages", "student_profile")),
+    Timetable: ("student_id", ("schedule", "student_profile")),
+    AssignmentSubmission: ("student_id", ("assignments", "student_profile")),
+    Complaint: ("user_id", ("complaints", "student_profile")),
+    Profile: ("user_id", ("access",)),
+    StudentCourse: ("student_id", ("student_profile",)),
+    Enrollment: ("user_id", ()),
+}
+
+
+@receiver([post_save, post_delete], sender=Assignment)
+@receiver([post_save, post_delete], sender=Material)
+@receiver([post_save, post_delete], sender=LiveSession)
+@receiver([post_save, post_delete], sender=GlobalTimetable)
+def invalidate_shared_dashboard(sender, **kwargs):
+    dashboard_cache.invalidate_shared(*SHARED_DASHBOARD_SECTIONS[sender])
+
+
+@receiver(m2m_changed, sender=Assignment.recipients.through)
+@receiver(m2m_changed, sender=Material.recipients.through)
+@receiver(m2m_changed, sender=LiveSession.students.through)
+def invalidate_dashboard_recipients(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        dashboard_cache.invalidate_shared(*SHARED_DASHBOARD_SECTIONS[sender])
+
+
+@receiver([post_save, post_delete], sender=AdminMessage)
+@receiver([post_save, post_delete], sender=Timetable)
+@receiver([post_save, post_delete], sender=AssignmentSubmission)
+@receiver([post_save, post_delete], sender=Complaint)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver([post_save, post_delete], sender=StudentCourse)
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_student_dashboard(sender, instance, **kwargs):
+    owner_field, sections = USER_DASHBOARD_SECTIONS[sender]
+    dashboard_cache.invalidate_users([getattr(instance, owner_field)], *sections)
+
+
+@receiver([post_save, post_delete], sender=CoursePayment)
+def invalidate_payment_dashboard(sender, instance, **kwargs):
+    # Payment state gates the whole dashboard (verified / blocked)
+    user_ids = Enrollment.objects.filter(pk=instance.enrollment_id).values_list("user_id", flat=True)
+    dashboard_cache.invalidate_users(list(user_ids), "access", "student_profile")
+
+
+# ======================================================
+# 8️⃣ PUBLIC HOME PAGE CACHE
+# ======================================================
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=ParentTestimonial)
+@receiver([post_save, post_delete], sender=CoursePlan)
+@receiver([post_save, post_delete], sender=AboutSection)
+@receiver([post_save, post_delete], sender=ProgramIntro)
+@receiver([post_save, post_delete], sender=Program)
+def bump_home_page_version(sender, **kwargs):
+    page_cache.bump_home_content()
+
+
+# ======================================================
+# 9️⃣ COMPILED EMAIL TEMPLATE CACHE
+# ======================================================
+@receiver([post_save, post_delete], sender=EmailTemplate)
+def invalidate_email_templates(sender, **kwargs):
+    template_cache.invalidate_email_templates()
+
+
+# ======================================================
+# 🔟 COURSE ACCESS (main/utils/entitlements.py)
+# ======================================================
+@receiver(post_save, sender=Enrollment)
+def refresh_enrollment_access(sender, instance, **kwargs):
+    entitlements.refresh_enrollments([instance.pk])
+
+
+@receiver(post_delete, sender=Enrollment)
+def drop_enrollment_access(sender, instance, **kwargs):
+    # The CourseAccess row is deleted with the enrollment (CASCADE)
+    entitlements.invalidate_users([instance.user_id])
+
+
+@receiver(post_save, sender=CoursePayment)
+def refresh_payment_access(sender, instance, **kwargs):
+    entitlements.refresh_enrollments([instance.enrollment_id])
+
 
+@receiver(post_delete, sender=CoursePayment)
+def refresh_deleted_payment_access(sender, instance, **kwargs):
+    # After commit: when the enrollment itself is being deleted (cascade),
+    # it is gone by then and there is nothing to write
+    enrollment_id = instance.enrollment_id
+    transaction.on_commit(lambda: entitlements.refresh_enrollments([enrollment_id]))
@@ -0,0 +1,80 @@
+/**
+ * Direct-to-storage uploads (see main/utils/direct_upload.py).
+ *
+ * <input type="file" data-direct-upload="<purpose>" data-direct-upload-object="<id>">
+ * (data-direct-upload-object / -sign may also sit on the <form>)
+ *
+ * On submit the file is sent straight to storage with a signed upload from
+ * /uploads/sign/, and the form is posted with an upload_token instead of
+ * the file bytes. Any failure falls back to the normal (proxied) upload.
+ */
+(function() {
+  "use strict";
+
+  function csrfToken(form) {
+    const input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+    return input ? input.value : "";
+  }
+
+  async function directUpload(form, input) {
+    const file = input.files[0];
+    const sign = new FormData();
+    sign.append("purpose", input.dataset.directUpload);
+    sign.append("object_id", input.dataset.directUploadObject || form.dataset.directUploadObject || "");
+    sign.append("filename", file.name);
+
+    const signUrl = input.dataset.directUploadSign || form.dataset.directUploadSign || "/uploads/sign/";
+    const signed = await fetch(signUrl, {
+      method: "POST",
+      body: sign,
+      headers: {"X-CSRFToken": csrfToken(form)},
+      credentials: "same-origin",
+    });
+    if (!signed.ok) throw new Error("sign failed");
+    const upload = await signed.json();
+    if (file.size > upload.max_bytes) throw new Error("file too large");
+
+    const body = new FormData();
+    Object.entries(upload.fields).forEach(([name, value]) => body.append(name, value));
+    body.append(upload.file_field, file);
+    const stored = await fetch(upload.upload_url, {method: "POST", body: body});
+    if (!stored.ok) throw new Error("upload failed");
+    return upload.token;
+  }
+
+  function setHidden(form, name, value) {
+    let hidden = form.querySelector('input[type="hidden"][name="' + name + '"]');
+    if (!hidden) {
+      hidden = document.createElement("input");
+      hidden.type = "hidden";
+      hidden.name = name;
+      form.appendChild(hidden);
+    }
+    hidden.value = value;
+  }
+
+  document.addEventListener("submit", async function(event) {
+    const form = event.target;
+    const input = form.querySelector('input[type="file"][data-direct-upload]');
+    if (!input || !input.files.length || form.dataset.directUploadDone) return;
+
+    event.preventDefault();
+    const buttons = form.querySelectorAll('[type="submit"]');
+    buttons.forEach(button => button.disabled = true);
+
+    try {
+      setHidden(form, "upload_token", await directUpload(form, input));
+      input.disabled = true;  // the bytes are already in storage
+    } catch (error) {
+      console.warn("Direct upload unavailable, sending the file with the form:", error);
+    }
+
+    // Keep which submit button was used (admin "Save and add another" etc.)
+    if (event.submitter && event.submitter.name) {
+      setHidden(form, event.submitter.name, event.submitter.value);
+    }
+    buttons.forEach(button => button.disabled = false);
+    form.dataset.directUploadDone = "1";
+    form.submit();
+  });
+})();
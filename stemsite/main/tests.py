@@ -1,3 +1,1470 @@
-from django.test import TestCase
+import csv
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import cloudinary
+import cloudinary.utils
+import requests
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.models import ChatMessage, ChatRoom
+from main.admin import AdminMessageAdmin
+from main.brevo_email import BREVO_SEND_EMAIL_PATH, send_brevo_email
+from main.models import (
+    AdminMessage, Assignment, AssignmentSubmission, Complaint, Course, CourseAccess, CoursePayment, EmailBroadcast,
+    EmailTemplate, Enrollment, GlobalTimetable, LiveSession, LiveSessionReminder, Material, Notification,
+    OutgoingEmail, PaymentEvent, Profile, Timetable,
+)
+from main.tests_support import StubServer
+from main.utils import (
+    direct_upload, email_outbox, entitlements, http_client, page_cache, protected_media, template_cache,
+)
+from main.utils.broadcast import PARAM_PATTERN, queue_broadcasts
+from main.utils.bulk_corrections import apply_corrections, match_username
+from main.utils.direct_upload import UploadError, claim_upload, issue_upload, receive_local_upload
+from main.utils.email_outbox import build_email, deliver_pending, queue_emails
+from main.utils.email_reminders import send_upcoming_live_session_reminders
+from main.utils.notifications import fan_out_notifications
+from main.utils.paystack import apply_pending_events
+from main.utils.submission_zip import fetch, submission_zip_chunks
+from services.models import Service, ServiceRequest
+
+User = get_user_model()
+
+# Tests that save files use local storage (under a temporary MEDIA_ROOT set
+# in setUp), never the project's Cloudinary account
+LOCAL_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+#---------------------Profile View---------------------
+class ProfileViewQueryBudgetTests(TestCase):
+    """
+    The student dashboard must cost a fixed number of queries, whatever
+    the amount of materials, assignments, messages and notifications.
+    """
+
+    # session + user, then the view itself (profile, enrollments, payment,
+    # materials, assignments, submissions, chat, timetable, schedule,
+    # admin messages, live sessions, complaints, notifications)
+    QUERY_BUDGET = 15
+
+    # session + user + chat + notifications, everything else from the cache
+    WARM_QUERY_BUDGET = 4
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("student1", "student1@example.com", "pass12345")
+        Profile.objects.get_or_create(user=self.user)
+        self.course = Course.objects.create(title="Python Programming", description="Python")
+        self.other_course = Course.objects.create(title="App Inventor", description="Apps")
+        self.enrollment = Enrollment.objects.create(
+            user=self.user,
+            full_name="Student One",
+            email=self.user.email,
+            program="Online Program",
+            course=self.course,
+            class_type="Weekend Class",
+            skill_level="Beginner",
+        )
+        CoursePayment.objects.create(
+            enrollment=self.enrollment,
+            course=self.course,
+            amount_paid=100,
+            payment_type="full",
+            payment_method="paystack",
+            reference="ref-profile-1",
+            is_verified=True,
+        )
+        self.room = ChatRoom.objects.create(name=f"student_{self.user.username}_admin")
+        self.client.force_login(self.user)
+
+    def seed(self, n):
+        """Add `n` rows to every dashboard section (bulk, so no signals fire)."""
+        now = timezone.now()
+        today = now.date()
+
+        materials = Material.objects.bulk_create(
+            Material(course=self.course, title=f"Material {i}", file=f"course_materials/m{i}.pdf")
+            for i in range(n)
+        )
+        # Direct recipients of materials from a course the student is not enrolled in
+        extra = Material.objects.bulk_create(
+            Material(course=self.other_course, title=f"Extra {i}", file=f"course_materials/x{i}.pdf")
+            for i in range(n)
+        )
+        Material.recipients.through.objects.bulk_create(
+            Material.recipients.through(material_id=m.id, user_id=self.user.id) for m in extra + materials
+        )
+
+        assignments = Assignment.objects.bulk_create(
+            Assignment(course=self.course, title=f"Assignment {i}", due_date=today + timedelta(days=i))
+            for i in range(n)
+        )
+        Assignment.recipients.through.objects.bulk_create(
+            Assignment.recipients.through(assignment_id=a.id, user_id=self.user.id) for a in assignments
+        )
+        AssignmentSubmission.objects.bulk_create(
+            AssignmentSubmission(assignment=a, student=self.user, file=f"assignments/submissions/s{a.id}.pdf")
+            for a in assignments
+        )
+
+        sessions = LiveSession.objects.bulk_create(
+            LiveSession(course=self.course, title=f"Session {i}", link="https://example.com",
+                        start_time=now + timedelta(hours=i))
+            for i in range(n)
+        )
+        LiveSession.students.through.objects.bulk_create(
+            LiveSession.students.through(livesession_id=s.id, user_id=self.user.id) for s in sessions
+        )
+
+        ChatMessage.objects.bulk_create(
+            ChatMessage(room=self.room, sender=self.user, content=f"Hello {i}") for i in range(n)
+        )
+        Timetable.objects.bulk_create(
+            Timetable(student=self.user, course=self.course.title, date=today,
+                      start_time="09:00", end_time="10:00")
+            for _ in range(n)
+        )
+        GlobalTimetable.objects.bulk_create(
+            GlobalTimetable(course=self.course, date=today, start_time="09:00", end_time="10:00")
+            for _ in range(n)
+        )
+        AdminMessage.objects.bulk_create(
+            AdminMessage(student=self.user, title=f"Message {i}", message="Hi") for i in range(n)
+        )
+        Complaint.objects.bulk_create(
+            Complaint(user=self.user, message=f"Complaint {i}") for i in range(n)
+        )
+        Notification.objects.bulk_create(
+            Notification(student=self.user, title=f"Notification {i}") for i in range(n)
+        )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("profile_view"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_budget_with_few_rows(self):
+        self.seed(1)
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(reverse("profile_view"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.seed(2)
+        few = self.count_queries()
+        self.seed(60)
+        cache.clear()  # bulk_create sends no signals
+        self.assertEqual(self.count_queries(), few)
+
+    def test_sections_are_capped(self):
+        self.seed(60)
+        response = self.client.get(reverse("profile_view"))
+        context = response.context
+        self.assertEqual(len(context["materials"]), 50)
+        self.assertEqual(len(context["assignments"]), 50)
+        self.assertEqual(len(context["chat_messages"]), 50)
+        self.assertEqual(len(context["notifications"]), 20)
+        self.assertEqual(len(context["admin_messages"]), 20)
+        # every listed assignment has its submission mapped
+        self.assertTrue(all(a.id in context["submission_map"] for a in context["assignments"]))
+
+    def test_caps_never_hide_upcoming_entries(self):
+        now = timezone.now()
+        today = timezone.localdate()
+        past = LiveSession.objects.bulk_create(
+            LiveSession(course=self.course, title=f"Past session {i}", link="https://example.com",
+                        start_time=now - timedelta(days=i + 1), end_time=now - timedelta(days=i + 1, hours=-1))
+            for i in range(30)
+        )
+        LiveSession.objects.bulk_create([
+            LiveSession(course=self.course, title="Next session", link="https://example.com",
+                        start_time=now + timedelta(days=1)),
+        ])
+        Timetable.objects.bulk_create(
+            Timetable(student=self.user, course=self.course.title, date=today - timedelta(days=i + 1),
+                      start_time="09:00", end_time="10:00", instructor="Past tutor")
+            for i in range(60)
+        )
+        Timetable.objects.bulk_create([
+            Timetable(student=self.user, course=self.course.title, date=today + timedelta(days=1),
+                      start_time="09:00", end_time="10:00", instructor="Next tutor"),
+        ])
+        GlobalTimetable.objects.bulk_create(
+            GlobalTimetable(course=self.course, date=today - timedelta(days=i + 1),
+                            start_time="09:00", end_time="10:00", instructor="Past class")
+            for i in range(60)
+        )
+        GlobalTimetable.objects.bulk_create([
+            GlobalTimetable(course=self.course, date=today + timedelta(days=1),
+                            start_time="09:00", end_time="10:00", instructor="Next class"),
+        ])
+        cache.clear()
+
+        response = self.client.get(reverse("profile_view"))
+        self.assertContains(response, "Next session")
+        self.assertContains(response, "Next tutor")
+        self.assertContains(response, "Next class")
+        self.assertNotIn(past[0], response.context["live_sessions"])
+
+    def test_repeat_load_is_served_from_cache(self):
+        self.seed(5)
+        self.count_queries()
+        with self.assertNumQueries(self.WARM_QUERY_BUDGET):
+            self.client.get(reverse("profile_view"))
+
+    def test_admin_content_invalidates_cached_sections(self):
+        self.seed(1)
+        self.count_queries()
+        Assignment.objects.create(course=self.course, title="Fresh assignment", due_date=timezone.now().date())
+        AdminMessage.objects.create(student=self.user, title="Fresh message", message="Hi")
+
+        response = self.client.get(reverse("profile_view"))
+        self.assertIn("Fresh assignment", [a.title for a in response.context["assignments"]])
+        self.assertIn("Fresh message", [m.title for m in response.context["admin_messages"]])
+
+
+#---------------------Index Usage---------------------
+class IndexUsageTests(TestCase):
+    """
+    The hot lookups must be answered from their indexes, not a table scan.
+    Runs the real queries against seeded rows and reads the plan from
+    QuerySet.explain(). On PostgreSQL sequential scans are disabled for
+    the test transaction, so a small table cannot hide a missing index.
+    """
+
+    ROWS = 200
+
+    def setUp(self):
+        users = User.objects.bulk_create(
+            User(username=f"idx{i}", email=f"idx{i}@example.com") for i in range(self.ROWS)
+        )
+        self.user = users[0]
+        self.course = Course.objects.create(title="Python Programming", description="Python")
+        self.other_course = Course.objects.create(title="App Inventor", description="Apps")
+        now = timezone.now()
+
+        enrollments = Enrollment.objects.bulk_create(
+            Enrollment(
+                user=user, full_name=user.username, email=user.email, program="Online Program",
+                course=course, class_type="Weekend Class", skill_level="Beginner",
+                secret_code=f"CODE{user.id}", is_active=bool(i % 3),
+                submitted_at=now - timedelta(days=i),
+            )
+            for i, user in enumerate(users)
+            for course in (self.course, self.other_course)
+        )
+        self.enrollment = enrollments[0]
+        CoursePayment.objects.bulk_create(
+            CoursePayment(
+                enrollment=enrollment, course=enrollment.course, amount_paid=100, payment_type="full",
+                payment_method="paystack", reference=f"idx-ref-{i}", is_verified=bool(i % 2),
+            )
+            for i, enrollment in enumerate(enrollments)
+        )
+        Notification.objects.bulk_create(
+            Notification(student=user, title=f"Note {i}", is_read=bool(i % 2))
+            for user in users
+            for i in range(5)
+        )
+        AdminMessage.objects.bulk_create(
+            AdminMessage(student=user, title=f"Message {i}", message="Hi", is_archived=bool(i % 2))
+            for user in users
+            for i in range(5)
+        )
+        LiveSession.objects.bulk_create(
+            LiveSession(
+                course=self.course, title=f"Session {i}", link="https://example.com",
+                start_time=now + timedelta(hours=i - self.ROWS // 2),
+                reminder_sent=i % 4 != 0, reminder_24hr_sent=i % 4 != 0, reminder_1hr_sent=i % 4 != 0,
+            )
+            for i in range(self.ROWS)
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"{index_name} not used:\n{plan}")
+
+    def requirePostgres(self):
+        # Other backends compile iexact to LIKE, which a functional index cannot serve
+        if connection.vendor != "postgresql":
+            self.skipTest("case-insensitive functional indexes are matched on PostgreSQL only")
+
+    def test_secret_code_login_lookup(self):
+        self.requirePostgres()
+        self.assertUsesIndex(
+            Enrollment.objects.filter(email__iexact="IDX1@example.com", secret_code__iexact="code2", is_active=True),
+            "enrollment_login_ci_idx",
+        )
+
+    def test_user_case_insensitive_lookups(self):
+        self.requirePostgres()
+        self.assertUsesIndex(User.objects.filter(username__iexact="IDX1"), "auth_user_username_ci_idx")
+        self.assertUsesIndex(User.objects.filter(email__iexact="IDX1@EXAMPLE.COM"), "auth_user_email_ci_idx")
+
+    def test_latest_enrollment_of_student(self):
+        self.assertUsesIndex(
+            Enrollment.objects.filter(user=self.user).order_by("-submitted_at")[:1],
+            "enrollment_user_recent_idx",
+        )
+
+    def test_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(student=self.user, is_read=False)[:20],
+            "notif_student_unread_idx",
+        )
+
+    def test_verified_course_payment(self):
+        self.assertUsesIndex(
+            CoursePayment.objects.filter(enrollment=self.enrollment, course=self.course, is_verified=True),
+            "cpay_verified_idx",
+        )
+
+    def test_admin_message_inbox(self):
+        self.assertUsesIndex(
+            AdminMessage.objects.filter(student=self.user, is_archived=False).order_by("-created_at")[:20],
+            "adminmsg_inbox_idx",
+        )
+
+    def test_due_live_session_reminders(self):
+        now = timezone.now()
+        for flag, hours, index_name in (
+            ("reminder_24hr_sent", 24, "live_due_24hr_idx"),
+            ("reminder_sent", 3, "live_due_3hr_idx"),
+            ("reminder_1hr_sent", 1, "live_due_1hr_idx"),
+        ):
+            with self.subTest(flag=flag):
+                self.assertUsesIndex(
+                    LiveSession.objects.filter(
+                        **{flag: False}, start_time__gt=now, start_time__lte=now + timedelta(hours=hours)
+                    ),
+                    index_name,
+                )
+
+
+#---------------------Paystack Webhook---------------------
+class PaystackStub:
+    """Builds and signs webhook bodies the way Paystack does, and replays them."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def payload(self, reference, amount, status="success", event="charge.success", metadata=None):
+        return {
+            "event": event,
+            "data": {
+                "reference": reference,
+                "amount": amount,
+                "status": status,
+                "paid_at": "2025-01-01T10:00:00.000Z",
+                "metadata": metadata or {},
+            },
+        }
+
+    def sign(self, body):
+        return hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+
+    def replay(self, payload, signature=None):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            reverse("paystack_webhook"),
+            data=body,
+            content_type="application/json",
+            HTTP_X_PAYSTACK_SIGNATURE=signature if signature is not None else self.sign(body),
+        )
+
+
+# Any call to Paystack from a callback or the worker is a bug
+@mock.patch("requests.get", side_effect=AssertionError("no outbound HTTP expected"))
+class PaystackWebhookTests(TestCase):
+
+    def setUp(self):
+        self.stub = PaystackStub(self.client)
+        self.user = User.objects.create_user("payer", "payer@example.com", "pass12345")
+        self.course = Course.objects.create(title="Python Programming", description="Python")
+        self.enrollment = Enrollment.objects.create(
+            user=self.user, full_name="Pay Er", email=self.user.email, program="Online Program",
+            course=self.course, class_type="Weekend Class", skill_level="Beginner",
+            payment_reference="enrol-ref-1",
+        )
+        self.payment = CoursePayment.objects.create(
+            enrollment=self.enrollment, course=self.course, amount_paid=15000, payment_type="full",
+            payment_method="paystack", reference="CPSK-ref-1",
+        )
+
+    def test_bad_signature_is_rejected(self, _get):
+        response = self.stub.replay(self.stub.payload("enrol-ref-1", 250000), signature="forged")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_replayed_event_is_recorded_and_applied_once(self, _get):
+        payload = self.stub.payload("enrol-ref-1", 250000)
+        for _ in range(3):
+            self.assertEqual(self.stub.replay(payload).status_code, 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+
+        # Nothing changes until the worker runs
+        self.enrollment.refresh_from_db()
+        self.assertFalse(self.enrollment.is_enrollment_paid)
+
+        self.assertEqual(apply_pending_events(), (1, 0))
+        self.assertEqual(apply_pending_events(), (0, 0))
+        self.enrollment.refresh_from_db()
+        self.assertTrue(self.enrollment.is_enrollment_paid)
+        self.assertTrue(self.enrollment.secret_code)
+        self.assertEqual(PaymentEvent.objects.get().status, "processed")
+        self.assertTrue(OutgoingEmail.objects.filter(to_email=self.user.email).exists())
+
+    def test_course_payment_is_verified(self, _get):
+        self.stub.replay(self.stub.payload("CPSK-ref-1", 1500000))
+        apply_pending_events()
+        self.payment.refresh_from_db()
+        self.assertTrue(self.payment.is_verified)
+
+    def test_underpaid_charge_fails_without_retry(self, _get):
+        self.stub.replay(self.stub.payload("CPSK-ref-1", 100))
+        self.assertEqual(apply_pending_events(), (0, 1))
+        self.payment.refresh_from_db()
+        self.assertFalse(self.payment.is_verified)
+        self.assertEqual(PaymentEvent.objects.get().status, "failed")
+
+    def test_service_request_is_marked_paid(self, _get):
+        service = Service.objects.create(name="Website", description="Build")
+        service_request = ServiceRequest.objects.create(
+            service=service, name="Client", email="client@example.com", details="Site",
+            amount_due=5000, status="approved",
+        )
+        self.stub.replay(self.stub.payload(
+            "svc-ref-1", 500000, metadata={"service_request_id": service_request.id}
+        ))
+        apply_pending_events()
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.status, "paid")
+        self.assertEqual(service_request.payments.get().reference, "svc-ref-1")
+
+    def test_other_events_are_acknowledged_but_not_stored(self, _get):
+        response = self.stub.replay(self.stub.payload("enrol-ref-1", 250000, event="transfer.success"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_callbacks_only_read_local_state(self, _get):
+        self.client.force_login(self.user)
+        url = reverse("course_payment_verify", args=["CPSK-ref-1"])
+
+        response = self.client.get(url, follow=False)
+        self.assertRedirects(response, reverse("profile_view"), fetch_redirect_response=False)
+        self.assertIn("being confirmed", str(list(response.wsgi_request._messages)[-1]))
+
+        self.stub.replay(self.stub.payload("CPSK-ref-1", 1500000))
+        apply_pending_events()
+        response = self.client.get(url)
+        self.assertIn("verified successfully", str(list(response.wsgi_request._messages)[-1]))
+
+        response = self.client.get(
+            reverse("enrolment_payment_verify", args=[self.enrollment.id]) + "?reference=enrol-ref-1"
+        )
+        self.assertRedirects(
+            response, reverse("enrolment_success", args=[self.enrollment.id]), fetch_redirect_response=False
+        )
+
+    def test_service_callback_checks_the_request(self, _get):
+        service = Service.objects.create(name="Website", description="Build")
+        service_request = ServiceRequest.objects.create(
+            service=service, name="Client", email="client@example.com", details="Site",
+            amount_due=5000, status="approved",
+        )
+        url = reverse("paystack_callback", args=[service_request.id]) + "?reference=svc-ref-1"
+
+        # Cancelled or failed checkout: Paystack still appends the reference
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, reverse("payment_page", args=[service_request.id]), fetch_redirect_response=False
+        )
+        self.assertIn("could not confirm", str(list(response.wsgi_request._messages)[-1]))
+
+        self.stub.replay(self.stub.payload("svc-ref-1", 500000, metadata={"service_request_id": service_request.id}))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "services/payment_confirming.html")
+
+        apply_pending_events()
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse("services_thank_you"), fetch_redirect_response=False)
+
+
+#---------------------Integration HTTP Client---------------------
+@mock.patch("main.utils.http_client._retry_delay", return_value=0)
+class HttpClientTests(TestCase):
+
+    def setUp(self):
+        http_client.close_sessions()
+        http_client.reset_metrics()
+
+    def tearDown(self):
+        http_client.close_sessions()
+
+    def test_bulk_sends_reuse_one_connection(self, _delay):
+        with StubServer() as stub, self.settings(BREVO_API_URL=stub.url, BREVO_API_KEY="test"):
+            for i in range(5):
+                send_brevo_email(f"user{i}@example.com", "Hi", "<p>Hi</p>")
+            self.assertEqual(stub.connections, 1)
+            self.assertEqual(stub.requests[0][:2], ("POST", BREVO_SEND_EMAIL_PATH))
+
+        stats = http_client.metrics_snapshot()["brevo.send"]
+        self.assertEqual(stats["calls"], 5)
+        self.assertEqual(stats["outcomes"], {"2xx": 5})
+        self.assertEqual(sum(stats["histogram"].values()), 5)
+
+    def test_unavailable_upstream_is_retried(self, _delay):
+        responses = [(503, {}), (200, {"status": True})]
+        with StubServer(responses) as stub, self.settings(PAYSTACK_API_URL=stub.url):
+            response = http_client.post("paystack", "/transaction/initialize", endpoint="paystack.initialize")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(http_client.metrics_snapshot()["paystack.initialize"]["outcomes"], {"retry": 1, "2xx": 1})
+
+    def test_gateway_timeout_is_not_resent_for_post(self, _delay):
+        # The upstream may have charged / sent before the gateway gave up
+        with StubServer([(504, {}), (200, {"status": True})]) as stub, self.settings(PAYSTACK_API_URL=stub.url):
+            response = http_client.post("paystack", "/transaction/initialize")
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_dropped_post_is_not_resent(self, _delay):
+        # The connection died after the upstream read the request
+        with StubServer([(None, None), (200, {"status": True})]) as stub, self.settings(PAYSTACK_API_URL=stub.url):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                http_client.post("paystack", "/transaction/initialize")
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_refused_connection_is_retried_for_post(self, _delay):
+        with StubServer() as stub:
+            url = stub.url  # a port nothing listens on once the stub is gone
+        with self.settings(PAYSTACK_API_URL=url), self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.post("paystack", "/transaction/initialize", endpoint="paystack.initialize")
+        self.assertEqual(
+            http_client.metrics_snapshot()["paystack.initialize"]["outcomes"],
+            {"retry": http_client.MAX_RETRIES, "error": 1},
+        )
+
+    def test_gateway_timeout_is_retried_for_get(self, _delay):
+        with StubServer([(504, {}), (200, {"status": True})]) as stub, self.settings(PAYSTACK_API_URL=stub.url):
+            response = http_client.get("paystack", "/transaction/verify/ref")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(stub.requests), 2)
+
+    def test_client_errors_are_not_retried(self, _delay):
+        with StubServer([(400, {"message": "bad"})]) as stub, self.settings(PAYSTACK_API_URL=stub.url):
+            response = http_client.post("paystack", "/transaction/initialize")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_metrics_endpoint_is_staff_only(self, _delay):
+        http_client._record("brevo.send", "2xx", 12.0)
+        url = reverse("http_client_metrics")
+
+        self.client.force_login(User.objects.create_user("student", "s@example.com", "pass12345"))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user("ops", "ops@example.com", "pass12345", is_staff=True))
+        data = self.client.get(url).json()
+        self.assertEqual(data["endpoints"]["brevo.send"]["calls"], 1)
+
+
+#---------------------Live Session Reminders---------------------
+class LiveSessionReminderTests(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(title="Robotics", description="Robots")
+        self.students = []
+        for i, active in enumerate([True, True, False]):
+            user = User.objects.create_user(f"robot{i}", f"robot{i}@example.com", "pass12345")
+            Enrollment.objects.create(
+                user=user, full_name=f"Robot {i}", email=user.email, program="Online Program",
+                course=self.course, class_type="Weekend Class", skill_level="Beginner", is_active=active,
+            )
+            self.students.append(user)
+        self.picked = User.objects.create_user("guest", "guest@example.com", "pass12345")
+
+    def _session(self, hours, course=None):
+        session = LiveSession.objects.create(
+            course=course or self.course, title="Sensors", link="https://meet.example.com/x",
+            start_time=timezone.now() + timedelta(hours=hours),
+        )
+        session.students.add(self.picked, self.students[0])
+        return session
+
+    def _reminders(self):
+        # Leave out what the "new live session" signal queued on create
+        return Notification.objects.filter(notif_type="live"), OutgoingEmail.objects.filter(subject__contains="Reminder")
+
+    def test_each_recipient_gets_the_current_window_once(self):
+        session = self._session(hours=2)
+
+        self.assertEqual(send_upcoming_live_session_reminders(), (3, 0))
+        self.assertEqual(send_upcoming_live_session_reminders(), (0, 0))
+
+        notifications, emails = self._reminders()
+        self.assertEqual(
+            sorted(emails.values_list("to_email", flat=True)),
+            ["guest@example.com", "robot0@example.com", "robot1@example.com"],
+        )
+        self.assertEqual(notifications.count(), 3)
+        self.assertEqual(set(session.reminders.values_list("window", flat=True)), {"3hr"})
+
+        # The 24-hour window had passed when it was created: closed, never sent
+        session.refresh_from_db()
+        self.assertTrue(session.reminder_24hr_sent)
+        self.assertFalse(session.reminder_sent)
+
+    def test_crash_mid_run_neither_loses_nor_repeats(self):
+        self._session(hours=2)
+        calls = []
+
+        def flaky_queue(broadcasts):
+            calls.append(broadcasts)
+            if len(calls) == 2:
+                raise RuntimeError("worker killed")
+            return queue_broadcasts(broadcasts)
+
+        with mock.patch("main.utils.email_reminders.queue_broadcasts", side_effect=flaky_queue):
+            self.assertEqual(send_upcoming_live_session_reminders(batch_size=1), (2, 1))
+        self.assertEqual(send_upcoming_live_session_reminders(batch_size=1), (1, 0))
+
+        notifications, emails = self._reminders()
+        self.assertEqual(emails.count(), 3)
+        self.assertEqual(notifications.count(), 3)
+        self.assertEqual(LiveSessionReminder.objects.count(), 3)
+
+    def test_queries_do_not_grow_with_sessions(self):
+        def tick_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                send_upcoming_live_session_reminders()
+            return len(ctx.captured_queries)
+
+        self._session(hours=2)
+        one_session = tick_queries()
+
+        for i in range(10):
+            self._session(hours=1.5 + i / 10, course=Course.objects.create(title=f"Extra {i}", description="x"))
+        self.assertEqual(tick_queries(), one_session)
+
+
+#---------------------Notification Events---------------------
+class NotificationEventTests(TestCase):
+    """Admin save_model and the post_save receivers both emit; students see one notification."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("boss", "boss@example.com", "pass12345"))
+        self.course = Course.objects.create(title="Chemistry", description="Chem")
+        self.students = []
+        for i in range(3):
+            user = User.objects.create_user(f"chem{i}", f"chem{i}@example.com", "pass12345")
+            Enrollment.objects.create(
+                user=user, full_name=f"Chem {i}", email=user.email, program="Online Program",
+                course=self.course, class_type="Weekend Class", skill_level="Beginner",
+            )
+            self.students.append(user)
+
+    def assertOneEach(self, obj, event):
+        notified = Notification.objects.filter(obj_id=obj.pk, event=event)
+        self.assertEqual(
+            sorted(notified.values_list("student_id", flat=True)), sorted(user.pk for user in self.students)
+        )
+
+    def test_live_session_created_in_admin(self):
+        start = timezone.localtime() + timedelta(days=2)
+        response = self.client.post(reverse("admin:main_livesession_add"), {
+            "course": self.course.pk, "title": "Titration", "description": "", "link": "https://meet.example.com/t",
+            "start_time_0": start.strftime("%Y-%m-%d"), "start_time_1": start.strftime("%H:%M:%S"),
+            "students": [self.students[0].pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertOneEach(LiveSession.objects.get(), "live_session.created")
+
+    def test_global_timetable_created_in_admin(self):
+        response = self.client.post(reverse("admin:main_globaltimetable_add"), {
+            "course": self.course.pk, "date": "2030-01-10", "start_time": "10:00", "end_time": "11:00",
+            "instructor": "Dr. Mole", "join_link": "",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertOneEach(GlobalTimetable.objects.get(), "globaltimetable.created")
+
+    def test_repeated_emission_is_a_no_op(self):
+        session = LiveSession.objects.create(
+            course=self.course, title="Bonds", link="https://meet.example.com/b", start_time=timezone.now(),
+        )
+        counts = fan_out_notifications(self.students, title="Again", obj=session, event="live_session.created")
+        self.assertEqual(counts, {"recipients": 3, "attempted": 0})
+        self.assertOneEach(session, "live_session.created")
+
+        # Without an event nothing is de-duplicated
+        fan_out_notifications(self.students, title="Manual", obj=session)
+        fan_out_notifications(self.students, title="Manual", obj=session)
+        self.assertEqual(Notification.objects.filter(title="Manual").count(), 6)
+
+
+#---------------------Public Home Page Cache---------------------
+class HomePageCacheTests(TestCase):
+    """The home page version survives cache expiry and other workers; only content changes move it."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_version_outlives_the_cache(self):
+        with mock.patch("main.utils.page_cache.time.time", return_value=1_700_000_000):
+            version = page_cache.home_content_version()
+        # Expired entry, or a worker with its own locmem cache
+        cache.clear()
+        with mock.patch("main.utils.page_cache.time.time", return_value=1_700_000_900):
+            self.assertEqual(page_cache.home_content_version(), version)
+
+    def test_conditional_get_until_content_changes(self):
+        self.client.get(reverse("home"))  # the ETag covers the CSRF cookie set here
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        cache.clear()
+        self.assertEqual(self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Course.objects.create(title="Chemistry", description="Chem")
+        cache.clear()  # the bump reaches a worker that did not handle the save
+        response = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+#---------------------Email Template Cache---------------------
+class EmailTemplateCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        template_cache.invalidate_email_templates()
+        self.template = EmailTemplate.objects.create(
+            name="contact_auto_reply", subject="Hi {{ name }}", body="Thanks {{ name }}, we got: {{ message }}",
+        )
+
+    def test_compiled_once_then_served_without_queries(self):
+        template_cache.get_email_template("contact_auto_reply")
+        with self.assertNumQueries(0):
+            for i in range(50):
+                subject, body = template_cache.get_email_template("contact_auto_reply").render(
+                    {"name": f"S{i}", "message": "hello"}
+                )
+        self.assertEqual((subject, body), ("Hi S49", "Thanks S49, we got: hello"))
+
+    def test_save_and_delete_invalidate(self):
+        template_cache.get_email_template("contact_auto_reply")
+
+        self.template.body = "Updated for {{ name }}"
+        self.template.save()
+        self.assertEqual(template_cache.get_email_template("contact_auto_reply").render_body({"name": "A"}), "Updated for A")
+
+        self.template.delete()
+        self.assertIsNone(template_cache.get_email_template("contact_auto_reply"))
+
+    def test_missing_template_is_cached_until_created(self):
+        self.assertIsNone(template_cache.get_email_template("welcome"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(template_cache.get_email_template("welcome"))
+
+        EmailTemplate.objects.create(name="welcome", subject="Welcome", body="Hello {{ name }}")
+        self.assertEqual(template_cache.get_email_template("welcome").render({"name": "B"}), ("Welcome", "Hello B"))
+
+
+#---------------------Email Outbox---------------------
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        http_client.close_sessions()
+        self.addCleanup(http_client.close_sessions)
+
+    def _queue(self, count, bad=()):
+        addresses = [f"bad{i}@example.com" if i in bad else f"user{i}@example.com" for i in range(count)]
+        queue_emails(build_email(address, "Hello", "<p>Hi</p>") for address in addresses)
+        return OutgoingEmail.objects.order_by("id")
+
+    def _deliver(self, responses, **kwargs):
+        with StubServer(responses) as stub, self.settings(BREVO_API_URL=stub.url, BREVO_API_KEY="test"):
+            result = deliver_pending(**kwargs)
+        return result, [json.loads(body) for _, _, body in stub.requests]
+
+    def test_queue_skips_blank_addresses(self):
+        queued = queue_emails([build_email("a@example.com", "Hi", None), build_email("", "Hi", "<p>x</p>")])
+        self.assertEqual(queued, 1)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.html_content), ("pending", 0, ""))
+
+    def test_batch_sent_in_one_call(self):
+        emails = self._queue(5)
+        result, calls = self._deliver([(201, {"messageIds": []})])
+        self.assertEqual(result, (5, 0))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]["messageVersions"]), 5)
+        self.assertFalse(emails.exclude(status="sent").exists())
+        self.assertFalse(emails.filter(sent_at__isnull=True).exists())
+
+    def test_outage_retries_whole_batch_with_backoff(self):
+        emails = self._queue(4)
+        before = timezone.now()
+        result, calls = self._deliver([(500, {"message": "down"})])
+        self.assertEqual(result, (0, 4))
+        self.assertEqual(len(calls), 1)  # a 5xx is not bisected
+        for email in emails:
+            self.assertEqual((email.status, email.attempts), ("pending", 1))
+            self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=email_outbox.RETRY_BASE_SECONDS))
+            self.assertIn("[500]", email.last_error)
+
+        # Not due yet
+        self.assertEqual(self._deliver([(201, {})])[0], (0, 0))
+
+    def test_gives_up_after_max_attempts(self):
+        emails = self._queue(2)
+        emails.update(attempts=email_outbox.MAX_ATTEMPTS - 1)
+        self.assertEqual(self._deliver([(500, {})])[0], (0, 2))
+        self.assertEqual(set(emails.values_list("status", flat=True)), {"failed"})
+
+    def test_rejected_batch_is_split_to_the_bad_address(self):
+        emails = self._queue(8, bad={5})
+
+        def brevo(body):
+            addresses = [version["to"][0]["email"] for version in json.loads(body)["messageVersions"]]
+            if "bad5@example.com" in addresses:
+                return 400, {"code": "invalid_parameter", "message": "email is not valid"}
+            return 201, {}
+
+        result, calls = self._deliver([brevo])
+        self.assertEqual(result, (7, 1))
+        # 8 -> 4+4 -> 2+2 -> 1+1: log2(8) levels, not one call per email
+        self.assertEqual(len(calls), 7)
+        bad = emails.get(to_email="bad5@example.com")
+        self.assertEqual((bad.status, bad.attempts), ("pending", 1))
+        self.assertEqual(emails.filter(status="sent").count(), 7)
+
+    def test_account_errors_are_not_split(self):
+        self._queue(4)
+        result, calls = self._deliver([(401, {"message": "Key not found"})])
+        self.assertEqual(result, (0, 4))
+        self.assertEqual(len(calls), 1)
+
+    def test_rows_are_leased_while_sending(self):
+        emails = self._queue(2)
+        seen = []
+
+        def send(batch, broadcast=None):
+            seen.extend(emails.values_list("status", "next_attempt_at"))
+
+        with mock.patch("main.utils.email_outbox._send", side_effect=send):
+            self.assertEqual(deliver_pending(), (2, 0))
+        self.assertTrue(all(status == "sending" and due > timezone.now() for status, due in seen))
+
+        # A worker that died mid-send: its rows are claimed again once the lease is over
+        emails.update(status="sending", next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._deliver([(201, {})])[0], (2, 0))
+
+
+#---------------------Broadcast Emails---------------------
+class BroadcastEmailTests(TestCase):
+
+    def setUp(self):
+        http_client.close_sessions()
+        self.course = Course.objects.create(title="Physics", description="Phys")
+        users = User.objects.bulk_create([User(username=f"phys{i:02}", email=f"phys{i:02}@example.com") for i in range(60)])
+        Enrollment.objects.bulk_create([
+            Enrollment(
+                user=user, full_name=user.username, email=user.email, program="Online Program",
+                course=self.course, class_type="Weekend Class", skill_level="Beginner",
+            )
+            for user in users
+        ])
+        User.objects.filter(username="phys00").update(first_name="Ann", last_name="& <Bo>")
+
+    def tearDown(self):
+        http_client.close_sessions()
+
+    def _create_assignment(self):
+        with mock.patch("main.signals.render_to_string", wraps=render_to_string) as render:
+            Assignment.objects.create(course=self.course, title="Optics", due_date=timezone.now().date())
+        self.assertEqual(render.call_count, 1)
+        return OutgoingEmail.objects.filter(subject="New Assignment: Optics")
+
+    def _deliver(self, **kwargs):
+        with StubServer() as stub, self.settings(BREVO_API_URL=stub.url, BREVO_API_KEY="test"):
+            while deliver_pending(**kwargs) != (0, 0):
+                pass
+        return [json.loads(body) for _, _, body in stub.requests]
+
+    def test_rendered_once_and_sent_with_brevo_params(self):
+        emails = self._create_assignment()
+        self.assertEqual(emails.count(), 60)
+        self.assertEqual(EmailBroadcast.objects.count(), 1)
+        self.assertEqual(emails.get(to_email="phys00@example.com").params, {"student_name": "Ann &amp; &lt;Bo&gt;"})
+
+        calls = self._deliver(broadcast_batch_size=25)
+        self.assertEqual(len(calls), 3)
+        self.assertIn("{{ params.student_name }}", calls[0]["htmlContent"])
+        versions = [version for call in calls for version in call["messageVersions"]]
+        self.assertEqual(len(versions), 60)
+        self.assertEqual(
+            versions[0], {"to": [{"email": "phys00@example.com"}], "params": {"student_name": "Ann &amp; &lt;Bo&gt;"}}
+        )
+        self.assertFalse(emails.exclude(status="sent").exists())
+
+    @mock.patch("main.utils.email_outbox.USE_BREVO_PARAMS", False)
+    def test_local_substitution_fallback(self):
+        self._create_assignment()
+        calls = self._deliver()
+        versions = [version for call in calls for version in call["messageVersions"]]
+        self.assertEqual(len(versions), 60)
+        self.assertIn("Hello Ann &amp; &lt;Bo&gt;", versions[0]["htmlContent"])
+        self.assertNotIn("params.", versions[1]["htmlContent"])
+
+    def test_template_syntax_from_admins_never_reaches_brevo(self):
+        title = "Loops <b>{% for %}</b>"
+        message = "Write {{ name }} then {# note #}\nand {{ params.student_name }}"
+        request = RequestFactory().post("/", {
+            "apply": "1", "title": title, "message": message,
+            "_selected_action": list(User.objects.filter(username__in=["phys00", "phys01"]).values_list("pk", flat=True)),
+        })
+        request.user = User.objects.create_superuser("boss", "boss@example.com", "pw")
+        model_admin = AdminMessageAdmin(AdminMessage, admin.site)
+        with mock.patch.object(model_admin, "message_user"):
+            model_admin.send_message_to_selected_students(request, AdminMessage.objects.none())
+
+        broadcast = EmailBroadcast.objects.get(subject="New Message: Loops <b>{ % for %}</b>")
+        self.assertNotIn("Loops", broadcast.html_content)
+        params = broadcast.emails.get(to_email="phys01@example.com").params
+        self.assertEqual(params["title"], "Loops &lt;b&gt;&#123;% for %}&lt;/b&gt;")
+        self.assertEqual(
+            params["message"],
+            "Write &#123;{ name }} then &#123;# note #}<br>and &#123;{ params.student_name }}",
+        )
+
+        calls = self._deliver()
+        self.assertEqual(len(calls), 1)
+        sent = json.dumps(calls[0])
+        for opener in ("{%", "{#", "{{ name"):
+            self.assertNotIn(opener, sent)
+        self.assertEqual(PARAM_PATTERN.findall(calls[0]["htmlContent"]), ["student_name", "title", "message"])
+
+    def test_template_syntax_in_rendered_body_is_defused(self):
+        with mock.patch("main.signals.render_to_string", wraps=render_to_string):
+            Assignment.objects.create(course=self.course, title="{{ x }} and {% if %}", due_date=timezone.now().date())
+        html = EmailBroadcast.objects.get().html_content
+        self.assertIn("{{ params.student_name }}", html)
+        self.assertIn("&#123;{ x }}", html)
+        self.assertNotIn("{%", html)
+
+
+#---------------------Streaming Exports---------------------
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(title="Robotics", description="Robots")
+        other = Course.objects.create(title="Art", description="Art")
+        users = User.objects.bulk_create([User(username=f"rob{i:02}", email=f"rob{i:02}@example.com") for i in range(40)])
+        Enrollment.objects.bulk_create([
+            Enrollment(
+                user=user, full_name=user.username, email=user.email, program="Online Program",
+                course=self.course if i < 30 else other, class_type="Weekend Class", skill_level="Beginner",
+            )
+            for i, user in enumerate(users)
+        ])
+        Enrollment.objects.filter(full_name="rob00").update(full_name="=HYPERLINK(\"x\")")
+
+    def _export(self, name, fmt, query=""):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, f"{name}.{fmt}")
+        call_command("export_records", name, format=fmt, output=path, query=query, chunk_size=7, stderr=StringIO())
+        return path
+
+    def test_csv_matches_changelist_filter_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            path = self._export("enrollments", "csv", query=f"course__id__exact={self.course.id}&o=1")
+        # The changelist itself costs a few fixed queries (filter choices,
+        # counts); the 30 rows come from one JOINed SELECT, whatever the chunks
+        row_queries = [q["sql"] for q in queries.captured_queries if '"main_enrollment"."full_name"' in q["sql"]]
+        self.assertEqual(len(row_queries), 1)
+        self.assertIn('"auth_user"."username"', row_queries[0])
+        self.assertLessEqual(len(queries.captured_queries), 5)
+
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][:5], ["ID", "Full name", "Email", "Username", "Course"])
+        self.assertEqual(len(rows), 31)
+        self.assertEqual({row[4] for row in rows[1:]}, {"Robotics"})
+        self.assertIn("'=HYPERLINK(\"x\")", [row[1] for row in rows])
+        self.assertNotIn("Secret", ",".join(rows[0]))
+
+    def test_search_query(self):
+        path = self._export("enrollments", "csv", query="q=rob1")
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            self.assertEqual(len(list(csv.reader(f))), 11)
+
+    def test_xlsx_is_a_readable_workbook(self):
+        path = self._export("enrollments", "xlsx")
+        with zipfile.ZipFile(path) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        ns = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        rows = sheet.findall("s:sheetData/s:row", ns)
+        self.assertEqual(len(rows), 41)
+        self.assertEqual(rows[0].find("s:c/s:is/s:t", ns).text, "ID")
+
+    def test_admin_action_streams_filtered_changelist(self):
+        admin_user = User.objects.create_superuser("boss", "boss@example.com", "pw")
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse("admin:main_enrollment_changelist") + f"?course__id__exact={self.course.id}",
+            {"action": "export_as_csv", "select_across": "1", "index": "0", "_selected_action": ["1"]},
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn("enrollments-", response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode("utf-8-sig")
+        self.assertEqual(len(list(csv.reader(StringIO(body)))), 31)
+
+
+#---------------------Submissions Zip---------------------
+@override_settings(STORAGES=LOCAL_STORAGES)
+class SubmissionZipTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        http_client.close_sessions()
+        self.addCleanup(http_client.close_sessions)
+
+        course = Course.objects.create(title="Chemistry", description="Chem")
+        self.assignment = Assignment.objects.create(course=course, title="Titration", due_date=timezone.now().date())
+        users = User.objects.bulk_create([User(username=f"chem{i:02}", email=f"chem{i:02}@example.com") for i in range(12)])
+        self.submissions = [
+            AssignmentSubmission.objects.create(
+                assignment=self.assignment, student=user,
+                file=SimpleUploadedFile(f"work{i}.txt", f"answer from {user.username}".encode()),
+            )
+            for i, user in enumerate(users)
+        ]
+
+    def _read(self, chunks):
+        with zipfile.ZipFile(BytesIO(b"".join(chunks))) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+
+    def test_admin_url_streams_named_entries(self):
+        os.remove(self.submissions[0].file.path)
+        self.client.force_login(User.objects.create_superuser("boss", "boss@example.com", "pw"))
+
+        response = self.client.get(reverse("admin:assignment_submissions_zip", args=[self.assignment.pk]))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        files = self._read(response.streaming_content)
+
+        submitted_at = timezone.localtime(self.submissions[5].submitted_at).strftime("%Y-%m-%d_%H%M%S")
+        self.assertEqual(files[f"chem05_{submitted_at}.txt"], b"answer from chem05")
+        self.assertEqual(len(files), 12)  # 11 files + MISSING_FILES.txt
+        self.assertIn(b"chem00_", files["MISSING_FILES.txt"])
+
+    def test_fetches_are_bounded(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_fetch(file_field):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+            return fetch(file_field)
+
+        submissions = AssignmentSubmission.objects.select_related("assignment", "student")
+        with mock.patch("main.utils.submission_zip.fetch", side_effect=slow_fetch):
+            files = self._read(submission_zip_chunks(submissions, workers=3))
+        self.assertEqual(len(files), 12)
+        self.assertLessEqual(max(peak), 3)
+        self.assertGreater(max(peak), 1)
+
+    def test_remote_storage_goes_through_pooled_client(self):
+        http_client.reset_metrics()
+        submissions = list(AssignmentSubmission.objects.select_related("assignment", "student")[:2])
+        storage = FileSystemStorage
+        with StubServer(responses=[(200, b"remote bytes")]) as stub, \
+                mock.patch.object(storage, "path", side_effect=NotImplementedError), \
+                mock.patch.object(storage, "url", return_value=stub.url + "/raw/work.txt"):
+            files = self._read(submission_zip_chunks(submissions, workers=1))
+        self.assertEqual(list(files.values()), [b"remote bytes", b"remote bytes"])
+        self.assertEqual(stub.connections, 1)
+        self.assertEqual(http_client.metrics_snapshot()["storage GET file"]["calls"], 2)
+
+
+#---------------------Bulk Corrections---------------------
+@override_settings(STORAGES=LOCAL_STORAGES)
+class BulkCorrectionTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        course = Course.objects.create(title="Biology", description="Bio")
+        self.assignment = Assignment.objects.create(course=course, title="Cells", due_date=timezone.now().date())
+        users = User.objects.bulk_create(
+            [User(username=f"bio{i:02}", email=f"bio{i:02}@example.com") for i in range(20)]
+            + [User(username="bio01_x", email="bio01x@example.com")]
+        )
+        for user in users:
+            AssignmentSubmission.objects.create(
+                assignment=self.assignment, student=user, file=SimpleUploadedFile("cells.txt", b"my answer"),
+            )
+
+    def _zip(self, files):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+        buffer.seek(0)
+        return buffer
+
+    def test_match_username_prefers_longest(self):
+        usernames = ["bio01", "bio01_x"]
+        self.assertEqual(match_username("Cells/bio01_x_2026-01-01_101010.pdf", usernames), "bio01_x")
+        self.assertEqual(match_username("BIO01_graded.pdf", usernames), "bio01")
+        self.assertIsNone(match_username("bio011.pdf", usernames))
+
+    def test_submissions_zip_round_trip(self):
+        submissions = AssignmentSubmission.objects.select_related("assignment", "student")
+        with zipfile.ZipFile(BytesIO(b"".join(submission_zip_chunks(submissions)))) as downloaded:
+            files = {name: b"graded " + downloaded.read(name) for name in downloaded.namelist()}
+        files["nobody.pdf"] = b"?"
+        files["__MACOSX/._bio00.txt"] = b""
+        comments = BytesIO(b"username,feedback\nbio02,Well done\nBIO03,Check part 2\nghost,Hi\n")
+
+        with CaptureQueriesContext(connection) as queries:
+            result = apply_corrections(self.assignment, self._zip(files), comments)
+        self.assertEqual(result["updated"], 21)
+        self.assertEqual(result["files"], 21)
+        self.assertEqual(result["comments"], 2)
+        self.assertEqual(result["unmatched_files"], ["nobody.pdf"])
+        self.assertEqual(result["unmatched_comments"], ["ghost"])
+        # One SELECT, one UPDATE for all rows, one notification INSERT (+ content type lookup)
+        self.assertLessEqual(len(queries.captured_queries), 4)
+
+        submission = AssignmentSubmission.objects.get(student__username="bio03")
+        self.assertEqual(submission.feedback_comments, "Check part 2")
+        with submission.correction_file.open("rb") as f:
+            self.assertEqual(f.read(), b"graded my answer")
+        self.assertEqual(
+            Notification.objects.filter(obj_id=self.assignment.pk, title="Correction returned: Cells").count(), 21
+        )
+
+    def test_admin_upload_reports_unmatched(self):
+        self.client.force_login(User.objects.create_superuser("boss", "boss@example.com", "pw"))
+        archive = SimpleUploadedFile("corrections.zip", self._zip({"bio05.pdf": b"ok", "stranger.pdf": b"?"}).read())
+        response = self.client.post(
+            reverse("admin:assignment_bulk_corrections", args=[self.assignment.pk]), {"archive": archive}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "stranger.pdf")
+        self.assertContains(response, "1 submission(s) updated")
+        self.assertTrue(AssignmentSubmission.objects.get(student__username="bio05").correction_file)
+
+
+#---------------------Direct Uploads---------------------
+@override_settings(STORAGES=LOCAL_STORAGES)
+class DirectUploadTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        course = Course.objects.create(title="Geography", description="Geo")
+        self.assignment = Assignment.objects.create(course=course, title="Maps", due_date=timezone.now().date())
+        self.other_assignment = Assignment.objects.create(course=course, title="Rivers", due_date=timezone.now().date())
+        self.student = User.objects.create_user("geo", "geo@example.com", "pw")
+        self.assignment.recipients.add(self.student)
+        self.other_assignment.recipients.add(self.student)
+        self.client.force_login(self.student)
+
+    def _direct_upload(self, purpose, object_id, data=b"%PDF my map", filename="my map.pdf"):
+        signed = self.client.post(
+            reverse("direct_upload_sign"), {"purpose": purpose, "object_id": object_id, "filename": filename}
+        )
+        self.assertEqual(signed.status_code, 200)
+        upload = signed.json()
+        stored = self.client.post(
+            upload["upload_url"], {**upload["fields"], upload["file_field"]: SimpleUploadedFile(filename, data)}
+        )
+        self.assertEqual(stored.status_code, 200, stored.content)
+        return upload["token"], stored.json()["public_id"]
+
+    def test_submission_recorded_from_token(self):
+        token, key = self._direct_upload("submission", self.assignment.id)
+        self.assertTrue(key.startswith("assignments/submissions/my_map_"))
+
+        self.client.post(reverse("submit_assignment", args=[self.assignment.id]), {"upload_token": token})
+        submission = AssignmentSubmission.objects.get(assignment=self.assignment, student=self.student)
+        self.assertEqual(submission.file.name, key)
+        with submission.file.open("rb") as f:
+            self.assertEqual(f.read(), b"%PDF my map")
+
+    def test_token_is_bound_to_its_scope(self):
+        token, _ = self._direct_upload("submission", self.assignment.id)
+        self.client.post(reverse("submit_assignment", args=[self.other_assignment.id]), {"upload_token": token})
+
+        other = User.objects.create_user("geo2", "geo2@example.com", "pw")
+        self.assignment.recipients.add(other)
+        self.client.force_login(other)
+        self.client.post(reverse("submit_assignment", args=[self.assignment.id]), {"upload_token": token})
+        self.client.post(reverse("submit_assignment", args=[self.assignment.id]), {"upload_token": token + "x"})
+        self.assertFalse(AssignmentSubmission.objects.exists())
+
+        self.client.logout()
+        response = self.client.post(reverse("direct_upload_sign"), {"purpose": "submission", "object_id": self.assignment.id})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse("direct_upload_sign"), {"purpose": "material", "object_id": ""})
+        self.assertEqual(response.status_code, 403)
+
+    def test_claim_checks_storage(self):
+        token = issue_upload("submission", f"{self.student.pk}:{self.assignment.pk}", "late.pdf")["token"]
+        with self.assertRaisesMessage(UploadError, "not found"):
+            claim_upload(token, "submission", f"{self.student.pk}:{self.assignment.pk}")
+
+        token, key = self._direct_upload("submission", self.assignment.id, data=b"x" * 2048)
+        limits = {**direct_upload.PURPOSES, "submission": (AssignmentSubmission, "file", 1024)}
+        with mock.patch.dict(direct_upload.PURPOSES, limits), self.assertRaisesMessage(UploadError, "larger"):
+            claim_upload(token, "submission", f"{self.student.pk}:{self.assignment.pk}")
+        self.assertFalse(default_storage.exists(key))
+
+        # A token stores one file only
+        upload = issue_upload("submission", "1:1", "a.pdf")
+        self.assertEqual(receive_local_upload(upload["token"], SimpleUploadedFile("a.pdf", b"1")), upload["fields"]["token"] and
+                         signing.loads(upload["token"], salt=direct_upload.SALT)["k"])
+        with self.assertRaisesMessage(UploadError, "already used"):
+            receive_local_upload(upload["token"], SimpleUploadedFile("a.pdf", b"2"))
+
+    def test_cloudinary_upload_is_signed(self):
+        field = SimpleNamespace(storage=MediaCloudinaryStorage(), generate_filename=lambda instance, name: f"course_materials/{name}")
+        with mock.patch("main.utils.direct_upload._field", return_value=(field, 10)):
+            upload = issue_upload("material", "staff", "Week 1.mp4")
+
+        fields = dict(upload["fields"])
+        signature = fields.pop("signature")
+        api_key = fields.pop("api_key")
+        self.assertEqual(api_key, cloudinary.config().api_key)
+        self.assertEqual(signature, cloudinary.utils.api_sign_request(fields, cloudinary.config().api_secret))
+        self.assertIn("overwrite=false", cloudinary.utils.api_string_to_sign(fields).split("&"))
+        self.assertRegex(fields["public_id"], r"^course_materials/Week_1_[0-9a-f]{12}$")
+        self.assertIn("/image/upload", upload["upload_url"])
+
+    def test_material_admin_accepts_token(self):
+        staff = User.objects.create_superuser("boss", "boss@example.com", "pw")
+        self.client.force_login(staff)
+        token, key = self._direct_upload("material", "", data=b"video", filename="lesson.mp4")
+
+        response = self.client.post(reverse("admin:main_material_add"), {
+            "course": self.assignment.course_id, "title": "Lesson 1", "description": "", "upload_token": token,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Material.objects.get(title="Lesson 1").file.name, key)
+
+
+#---------------------Protected material delivery---------------------
+@override_settings(STORAGES=LOCAL_STORAGES)
+class ProtectedMaterialTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("reader", "reader@example.com", "pw")
+        course = Course.objects.create(title="Physics", description="Physics")
+        enrollment = Enrollment.objects.create(
+            user=self.user, full_name="Reader", email=self.user.email, program="Online Program",
+            course=course, class_type="Weekend Class", skill_level="Beginner",
+        )
+        self.payment = CoursePayment.objects.create(
+            enrollment=enrollment, course=course, amount_paid=100, payment_type="full",
+            payment_method="paystack", reference="ref-material-1", is_verified=True,
+        )
+        self.material = Material.objects.create(
+            course=course, title="Notes", file=SimpleUploadedFile("notes.pdf", b"0123456789")
+        )
+        self.url = reverse("download_material", args=[self.material.id])
+        self.client.force_login(self.user)
+
+    def test_streamed_with_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=20-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_handed_to_web_server(self):
+        with mock.patch.object(protected_media, "SERVER", "nginx"):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/" + self.material.file.name)
+        self.assertEqual(response.content, b"")
+
+        with mock.patch.object(protected_media, "SERVER", "apache"):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Sendfile"], self.material.file.path)
+        self.assertEqual(response.content, b"")
+
+    def test_cloudinary_gets_expiring_signed_url(self):
+        field = SimpleNamespace(storage=MediaCloudinaryStorage(), name="course_materials/notes_abc123")
+        with mock.patch("time.time", return_value=1_700_000_000):
+            response = protected_media.protected_file_response(None, field)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/image/download?", response.url)
+        self.assertIn("public_id=course_materials%2Fnotes_abc123", response.url)
+        self.assertIn(f"expires_at={1_700_000_000 + protected_media.URL_TTL}", response.url)
+        self.assertIn("signature=", response.url)
+
+    def test_entitlement_checked_first(self):
+        self.payment.is_verified = False
+        self.payment.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse("profile_view"), fetch_redirect_response=False)
+
+        self.payment.is_verified = True
+        self.payment.save()
+        self.material.file.storage.delete(self.material.file.name)
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse("profile_view"), fetch_redirect_response=False)
+
+
+#---------------------Course access---------------------
+class CourseAccessTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("learner", "learner@example.com", "pw")
+        self.course = Course.objects.create(title="Chemistry", description="Chem")
+        self.enrollment = Enrollment.objects.create(
+            user=self.user, full_name="Learner", email=self.user.email, program="Online Program",
+            course=self.course, class_type="Weekend Class", skill_level="Beginner",
+        )
+
+    def _pay(self, **fields):
+        return CoursePayment.objects.create(
+            enrollment=self.enrollment, course=self.course, amount_paid=100, payment_type="full",
+            payment_method="bank", reference=f"ref-access-{CoursePayment.objects.count()}", **fields,
+        )
+
+    def test_signals_keep_access_current(self):
+        status = lambda: entitlements.access_status(self.user, self.course)
+        self.assertEqual(status(), CourseAccess.UNPAID)
+
+        payment = self._pay()
+        self.assertEqual(status(), CourseAccess.UNPAID)
+        payment.is_verified = True
+        payment.save(update_fields=["is_verified"])
+        self.assertTrue(entitlements.has_access(self.user, self.course.id))
+
+        payment.dashboard_blocked = True
+        payment.save(update_fields=["dashboard_blocked"])
+        self.assertEqual(status(), CourseAccess.BLOCKED)
+        self.assertFalse(entitlements.has_access(self.user, self.course))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        self.assertEqual(status(), CourseAccess.UNPAID)
+
+        self.enrollment.is_course_activated = True
+        self.enrollment.save(update_fields=["is_course_activated"])
+        self.assertEqual(status(), CourseAccess.ACTIVE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._pay(is_verified=True)
+            self.enrollment.delete()
+        self.assertIsNone(status())
+        self.assertFalse(CourseAccess.objects.exists())
+
+    def test_check_is_cached(self):
+        self._pay(is_verified=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(entitlements.has_access(self.user, self.course))
+            self.assertTrue(entitlements.has_access(self.user, self.course))
+            self.assertFalse(entitlements.has_access(self.user, self.course.id + 1))
+        self.assertEqual(len(queries), 1)
+
+    def test_rebuild_repairs_writes_without_signals(self):
+        self._pay()
+        CoursePayment.objects.update(is_verified=True)
+        self.assertFalse(entitlements.has_access(self.user, self.course))
+
+        out = StringIO()
+        call_command("rebuild_course_access", stdout=out)
+        self.assertIn("1 enrollment", out.getvalue())
+        self.assertTrue(entitlements.has_access(self.user, self.course))
+
+    def test_views_agree(self):
+        material = Material.objects.create(course=self.course, title="Lab", file="course_materials/lab.pdf")
+        self._pay(is_verified=True, dashboard_blocked=True)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("profile_view"))
+        self.assertRedirects(response, reverse("portal"), fetch_redirect_response=False)
+        response = self.client.get(reverse("download_material", args=[material.id]))
+        self.assertRedirects(response, reverse("profile_view"), fetch_redirect_response=False)
+        self.assertIn("blocked", str(list(response.wsgi_request._messages)[-1]))
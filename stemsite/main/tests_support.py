@@ -0,0 +1,100 @@
+# main/tests_support.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for Brevo/Paystack, for tests and benchmarks. Point the
+# client at it with override_settings(BREVO_API_URL=stub.url) (or
+# PAYSTACK_API_URL). It answers every POST/GET with `responses` in turn
+# (then the last one forever) and keeps HTTP/1.1 connections alive.
+# A bytes payload is sent as is (a stored file), anything else as JSON.
+# A response may also be a callable taking the request body and returning
+# (status, payload), to answer depending on what was sent. A status of
+# None closes the connection without answering, as a reset after the
+# request arrived would.
+#
+#   handshake_ms: delay when a new connection is accepted (stands in for TCP+TLS setup)
+#   latency_ms:   delay before every response
+
+
+class StubServer:
+
+    def __init__(self, responses=None, handshake_ms=0, latency_ms=0):
+        self.responses = list(responses or [(200, {"status": True})])
+        self.handshake_ms = handshake_ms
+        self.latency_ms = latency_ms
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_response(self):
+        with self.lock:
+            index = min(len(self.requests) - 1, len(self.responses) - 1)
+            return self.responses[index]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this a
+            # reused connection stalls on Nagle + delayed ACK (~40ms/request)
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+                if stub.handshake_ms:
+                    time.sleep(stub.handshake_ms / 1000)
+
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with stub.lock:
+                    stub.requests.append((self.command, self.path, body))
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+
+                response = stub._next_response()
+                status, payload = response(body) if callable(response) else response
+                if status is None:
+                    self.close_connection = True
+                    return
+                if isinstance(payload, bytes):
+                    data, content_type = payload, "application/octet-stream"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _reply
+            do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -135,6 +135,10 @@ urlpatterns = [
     path('payment/receipt/<str:reference>/', payment_receipt_confirmation, name='payment_receipt'),
     path('paystack/course/<int:course_id>/', course_payment_request, name='course_payment_request'),
     path('paystack/course/verify/<str:reference>/', course_payment_verify, name='course_payment_verify'),
+    path('paystack/webhook/', views.paystack_webhook, name='paystack_webhook'),
+    path('ops/http-metrics/', views.http_client_metrics, name='http_client_metrics'),
+    path('uploads/sign/', views.direct_upload_sign, name='direct_upload_sign'),
+    path('uploads/direct/', views.direct_upload_local, name='direct_upload_local'),
     #path('course/payment/', views.course_payment_page, name='course_payment'),
 
     #path('course/payment/<int:enrollment_id>/', views.course_payment_page, name='course_payment'),
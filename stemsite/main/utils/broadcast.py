@@ -0,0 +1,99 @@
+# main/utils/broadcast.py
+
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from main.models import EmailBroadcast, OutgoingEmail
+
+# Render once, personalise many.
+#
+# A bulk email is rendered a single time with param("student_name") (etc.)
+# in place of the per-student values, which leaves Brevo placeholders like
+# {{ params.student_name }} in the HTML. queue_broadcast() stores that body
+# once (EmailBroadcast) plus one light OutgoingEmail per recipient carrying
+# only its address and params. The outbox worker ships a whole broadcast
+# batch as one Brevo call: the shared htmlContent plus a messageVersion
+# {to, params} per recipient.
+#
+# With BREVO_BROADCAST_PARAMS = False the worker substitutes the params
+# locally (personalize()) and sends one full body per version instead.
+USE_BREVO_PARAMS = getattr(settings, "BREVO_BROADCAST_PARAMS", True)
+
+PARAM_PATTERN = re.compile(r"\{\{\s*params\.(\w+)\s*\}\}")
+
+# Brevo runs the body through its template language, so a "{{", "{%" or
+# "{#" that is not one of our placeholders (code in a course title, a
+# message) would be evaluated or get the whole batch rejected. Its brace
+# is written as an HTML entity instead, which renders the same; subjects
+# are plain text (and templated too), so there a space splits the pair.
+TEMPLATE_SYNTAX = re.compile(r"(\{\{\s*params\.\w+\s*\}\})|\{(?=[{%#])")
+TEMPLATE_OPENER = re.compile(r"\{(?=[{%#])")
+
+
+def param(name):
+    """Placeholder for a per-recipient value, to use in the render context."""
+    return mark_safe("{{ params.%s }}" % name)
+
+
+def personalize(html_content, params):
+    """Local fallback: fill the placeholders the way Brevo does."""
+    return PARAM_PATTERN.sub(lambda match: params.get(match.group(1), ""), html_content)
+
+
+def neutralize(html_content):
+    """Keep param() placeholders, defuse any other template syntax."""
+    return TEMPLATE_SYNTAX.sub(lambda match: match.group(1) or "&#123;", html_content)
+
+
+def _escape_params(params):
+    # Escaped once here, as the Django render would have; both Brevo and
+    # personalize() then insert the values as they are
+    return {
+        key: TEMPLATE_OPENER.sub("&#123;", str(conditional_escape(value))) if value is not None else ""
+        for key, value in params.items()
+    }
+
+
+def queue_broadcast(recipients, subject, html_content):
+    """
+    Queue one email for many recipients.
+    recipients: iterable of (to_email, params) pairs; params values are
+    escaped unless marked safe. html_content: rendered once, with param()
+    placeholders. Returns the number of queued emails.
+    """
+    return queue_broadcasts([(recipients, subject, html_content)])
+
+
+def queue_broadcasts(broadcasts):
+    """
+    Several queue_broadcast() calls in two INSERTs: `broadcasts` is an
+    iterable of (recipients, subject, html_content).
+    """
+    pending = []
+    for recipients, subject, html_content in broadcasts:
+        recipients = [(to_email, params) for to_email, params in recipients if to_email]
+        if recipients:
+            broadcast = EmailBroadcast(
+                subject=TEMPLATE_OPENER.sub("{ ", subject), html_content=neutralize(html_content)
+            )
+            pending.append((broadcast, recipients))
+    if not pending:
+        return 0
+
+    with transaction.atomic():
+        EmailBroadcast.objects.bulk_create([broadcast for broadcast, _ in pending])
+        emails = OutgoingEmail.objects.bulk_create(
+            [
+                OutgoingEmail(
+                    to_email=to_email, subject=broadcast.subject, broadcast=broadcast, params=_escape_params(params)
+                )
+                for broadcast, recipients in pending
+                for to_email, params in recipients
+            ],
+            batch_size=500,
+        )
+    return len(emails)
@@ -0,0 +1,160 @@
+# main/utils/bulk_corrections.py
+
+import csv
+import io
+import logging
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+
+from main.models import AssignmentSubmission
+from main.utils import dashboard_cache
+from main.utils.notifications import fan_out_notifications
+
+logger = logging.getLogger(__name__)
+
+# Return the corrections of a whole class in one upload.
+#
+# The zip holds one graded file per student, named after the username:
+# "ada.pdf", "ada_feedback.docx" or the "<student>_<submitted_at>" names of
+# the submissions zip (main/utils/submission_zip.py), so a downloaded zip
+# can be graded and sent back as is. An optional CSV (username, feedback)
+# fills feedback_comments.
+#
+# Files are uploaded to storage by a bounded thread pool (each Cloudinary
+# upload is an HTTP round trip), then every touched row is written with a
+# single bulk_update and the students get one notification pass. Files and
+# CSV rows that match no submission are reported back, not guessed.
+WORKERS = getattr(settings, "BULK_CORRECTION_WORKERS", 8)
+
+COMMENT_COLUMNS = ("feedback", "feedback_comments", "comments", "comment")
+
+
+def match_username(filename, usernames):
+    """
+    The username `filename` belongs to: the longest username equal to the
+    file stem or followed by "_" (usernames may contain "_" themselves).
+    Case-insensitive; None when nothing matches.
+    """
+    stem = posixpath.splitext(posixpath.basename(filename))[0].lower()
+    best = None
+    for username in usernames:
+        lowered = username.lower()
+        if stem == lowered or stem.startswith(lowered + "_"):
+            if best is None or len(username) > len(best):
+                best = username
+    return best
+
+
+def read_comments(comments_file):
+    """{username: feedback} from a CSV with a username column and a feedback column."""
+    reader = csv.DictReader(io.StringIO(comments_file.read().decode("utf-8-sig")))
+    fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+    username_column = fields.get("username")
+    comment_column = next((fields[name] for name in COMMENT_COLUMNS if name in fields), None)
+    if not username_column or not comment_column:
+        raise ValueError("The CSV needs a 'username' column and a 'feedback' column.")
+
+    comments = {}
+    for row in reader:
+        username = (row.get(username_column) or "").strip()
+        if username:
+            comments[username] = (row.get(comment_column) or "").strip()
+    return comments
+
+
+def _entries(archive):
+    for info in archive.infolist():
+        name = posixpath.basename(info.filename)
+        if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        yield info, name
+
+
+def _upload(archive, info, name, submission):
+    # Sets submission.correction_file to the stored name; saved by bulk_update
+    with archive.open(info) as entry:
+        content = File(entry, name=name)
+        content.size = info.file_size
+        submission.correction_file.save(name, content, save=False)
+    return submission
+
+
+def apply_corrections(assignment, archive_file, comments_file=None, workers=WORKERS, notify=True):
+    """
+    Attach the corrections in `archive_file` (a zip) and the feedback in
+    `comments_file` (a CSV, optional) to the submissions of `assignment`.
+
+    Returns {"updated", "files", "comments", "unmatched_files",
+    "unmatched_comments", "failed"}; the unmatched/failed entries are lists
+    of names for the admin to fix.
+    """
+    submissions = {}
+    for submission in AssignmentSubmission.objects.filter(assignment=assignment) \
+            .select_related("student").order_by("submitted_at"):
+        # A student who resubmitted gets the correction on the latest one
+        submissions[submission.student.username] = submission
+
+    comments = read_comments(comments_file) if comments_file else {}
+    result = {"updated": 0, "files": 0, "comments": 0,
+              "unmatched_files": [], "unmatched_comments": [], "failed": []}
+
+    changed = {}
+    with zipfile.ZipFile(archive_file) as archive:
+        matched = {}
+        for info, name in _entries(archive):
+            username = match_username(name, submissions)
+            if username is None:
+                result["unmatched_files"].append(info.filename)
+            elif username in matched:
+                result["unmatched_files"].append(f"{info.filename} (second file for {username})")
+            else:
+                matched[username] = (info, name)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                username: pool.submit(_upload, archive, info, name, submissions[username])
+                for username, (info, name) in matched.items()
+            }
+            for username, future in futures.items():
+                try:
+                    changed[username] = future.result()
+                    result["files"] += 1
+                except Exception as e:
+                    logger.error(f"[CORRECTIONS ❌] {matched[username][0].filename}: {e}")
+                    result["failed"].append(f"{matched[username][0].filename}: {e}")
+
+    lowered = {username.lower(): username for username in submissions}
+    for csv_username, feedback in comments.items():
+        username = lowered.get(csv_username.lower())
+        if username is None:
+            result["unmatched_comments"].append(csv_username)
+            continue
+        submission = changed.setdefault(username, submissions[username])
+        submission.feedback_comments = feedback
+        result["comments"] += 1
+
+    if not changed:
+        return result
+
+    AssignmentSubmission.objects.bulk_update(
+        changed.values(), ["correction_file", "feedback_comments"], batch_size=500
+    )
+    result["updated"] = len(changed)
+
+    # bulk_update sends no post_save: drop the cached dashboards ourselves
+    students = [submission.student for submission in changed.values()]
+    dashboard_cache.invalidate_users([student.pk for student in students], "assignments", "student_profile")
+
+    if notify:
+        fan_out_notifications(
+            students,
+            title=f"Correction returned: {assignment.title}",
+            message=f"Your submission for '{assignment.title}' has been graded. Check your assignments page.",
+            notif_type="assignment",
+            obj=assignment,
+        )
+    return result
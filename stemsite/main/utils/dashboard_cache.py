@@ -0,0 +1,102 @@
+# main/utils/dashboard_cache.py
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 120)
+
+# Dashboard sections. Each one is cached per user under a key made of two
+# version tokens:
+#   - a shared token, bumped when admin content for everybody changes
+#     (a new Assignment, Material, LiveSession, GlobalTimetable ...)
+#   - a per-user token, bumped when that student's own rows change
+#     (CoursePayment, AdminMessage, Enrollment, Timetable ...)
+# Bumping a token never deletes anything: old entries just stop being read
+# and age out with DASHBOARD_CACHE_TIMEOUT.
+SECTIONS = (
+    "access",
+    "materials",
+    "assignments",
+    "live_sessions",
+    "schedule",
+    "admin_messages",
+    "complaints",
+    "student_profile",
+)
+
+
+def _shared_version_key(section):
+    return f"dashboard:v:{section}"
+
+
+def _user_version_key(section, user_id):
+    return f"dashboard:v:{section}:{user_id}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+# -------------------------------
+# Read path
+# -------------------------------
+def get_sections(user_id, builders):
+    """
+    Return {section: value} for the given {section: builder} mapping.
+
+    Versions and cached values are fetched with one get_many each; only
+    the sections that miss call their builder (no arguments), and the
+    fresh values are written back with one set_many.
+    """
+    version_keys = {}
+    for section in builders:
+        version_keys[section] = (_shared_version_key(section), _user_version_key(section, user_id))
+
+    wanted = [key for pair in version_keys.values() for key in pair]
+    versions = cache.get_many(wanted)
+
+    missing_versions = {key: _new_version() for key in wanted if key not in versions}
+    if missing_versions:
+        cache.set_many(missing_versions, timeout=None)
+        versions.update(missing_versions)
+
+    data_keys = {
+        section: f"dashboard:{section}:{user_id}:{versions[shared]}:{versions[own]}"
+        for section, (shared, own) in version_keys.items()
+    }
+    cached = cache.get_many(list(data_keys.values()))
+
+    values, fresh = {}, {}
+    for section, builder in builders.items():
+        key = data_keys[section]
+        if key in cached:
+            values[section] = cached[key]
+        else:
+            values[section] = fresh[key] = builder()
+
+    if fresh:
+        cache.set_many(fresh, timeout=DASHBOARD_CACHE_TIMEOUT)
+    return values
+
+
+# -------------------------------
+# Invalidation (called from main/signals.py)
+# -------------------------------
+def invalidate_shared(*sections):
+    """Drop the given sections for every student."""
+    cache.set_many({_shared_version_key(section): _new_version() for section in sections}, timeout=None)
+
+
+def invalidate_users(user_ids, *sections):
+    """Drop the given sections (all of them by default) for these students."""
+    sections = sections or SECTIONS
+    versions = {
+        _user_version_key(section, user_id): _new_version()
+        for user_id in set(user_ids)
+        if user_id
+        for section in sections
+    }
+    if versions:
+        cache.set_many(versions, timeout=None)
@@ -0,0 +1,162 @@
+# main/utils/direct_upload.py
+
+import os
+import secrets
+import time
+
+import cloudinary
+import cloudinary.utils
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.text import get_valid_filename
+
+from main.models import AssignmentSubmission, Enrollment, Material
+from services.models import Payment
+
+# Signed direct-to-storage uploads.
+#
+# Instead of posting the file through a Django worker (which then
+# re-uploads it to Cloudinary synchronously), the browser:
+#   1. asks /uploads/sign/ for an upload: the server picks the storage key
+#      and returns a short-lived signed Cloudinary upload plus a token;
+#   2. uploads the file straight to Cloudinary with those fields;
+#   3. submits the form with the token instead of the file.
+# claim_upload() then checks the token (signature, age, purpose, scope)
+# and that the file really is in storage within the size limit, and
+# returns the key to store in the FileField. The client never chooses
+# the key, so it cannot point a record at someone else's file.
+#
+# With any other storage (FileSystemStorage in development and tests)
+# step 2 goes to /uploads/direct/, a local stand-in that writes the file
+# under the same key (receive_local_upload()).
+UPLOAD_TTL = getattr(settings, "DIRECT_UPLOAD_TTL", 15 * 60)
+
+SALT = "main.direct_upload"
+
+MB = 1024 * 1024
+
+# purpose -> (model, FileField name, max bytes)
+PURPOSES = {
+    "submission": (AssignmentSubmission, "file", 50 * MB),
+    "enrollment_proof": (Enrollment, "proof_of_payment", 5 * MB),
+    "service_payment_proof": (Payment, "proof", 5 * MB),
+    "material": (Material, "file", 2048 * MB),
+}
+
+
+class UploadError(Exception):
+    """A direct upload that cannot be accepted; the message is safe to show."""
+
+
+def _field(purpose):
+    model, field_name, max_bytes = PURPOSES[purpose]
+    return model._meta.get_field(field_name), max_bytes
+
+
+def is_cloudinary(storage):
+    # isinstance() sees through default_storage's lazy wrapper
+    return isinstance(storage, MediaCloudinaryStorage)
+
+
+def _new_key(field, filename, on_cloudinary):
+    stem, extension = os.path.splitext(os.path.basename(filename or "upload"))
+    name = get_valid_filename(f"{stem[:60] or 'upload'}_{secrets.token_hex(6)}{extension.lower()}")
+    key = field.generate_filename(None, name)
+    if on_cloudinary:
+        # The public_id Cloudinary storage itself would return: no extension
+        key = os.path.splitext(key)[0]
+    return key
+
+
+def issue_upload(purpose, scope, filename):
+    """
+    Everything the browser needs for one direct upload of `filename`:
+    {"upload_url", "fields", "file_field", "token", "max_bytes"}.
+    `scope` ties the token to the object the caller was authorised for.
+    """
+    field, max_bytes = _field(purpose)
+    storage = field.storage
+    on_cloudinary = is_cloudinary(storage)
+    key = _new_key(field, filename, on_cloudinary)
+    token = signing.dumps({"p": purpose, "s": str(scope), "k": key}, salt=SALT)
+
+    if on_cloudinary:
+        config = cloudinary.config()
+        # The key is unique, but a replayed signature must still not replace
+        # a stored file. A string: the signer drops a False value.
+        params = {
+            "public_id": key,
+            "timestamp": int(time.time()),
+            "tags": storage.TAG,
+            "overwrite": "false",
+        }
+        fields = {
+            **params,
+            "api_key": config.api_key,
+            "signature": cloudinary.utils.api_sign_request(params, config.api_secret),
+        }
+        upload_url = cloudinary.utils.cloudinary_api_url("upload", resource_type=storage._get_resource_type(key))
+    else:
+        fields = {"token": token}
+        upload_url = reverse("direct_upload_local")
+
+    return {"upload_url": upload_url, "fields": fields, "file_field": "file", "token": token, "max_bytes": max_bytes}
+
+
+def _load(token, max_age=UPLOAD_TTL):
+    try:
+        return signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise UploadError("The upload expired. Please choose the file again.")
+    except signing.BadSignature:
+        raise UploadError("Invalid upload. Please choose the file again.")
+
+
+def _stored_size(storage, key):
+    try:
+        return storage.size(key)
+    except (FileNotFoundError, OSError):
+        return None
+
+
+def claim_upload(token, purpose, scope):
+    """
+    The storage key of a finished direct upload, to assign to the purpose's
+    FileField. Raises UploadError if the token is not valid for this
+    purpose and scope, or the file is missing or too large (it is then
+    deleted).
+    """
+    data = _load(token)
+    if data.get("p") != purpose or data.get("s") != str(scope):
+        raise UploadError("This upload belongs to another form.")
+
+    field, max_bytes = _field(purpose)
+    key = data["k"]
+    size = _stored_size(field.storage, key)
+    if size is None:
+        raise UploadError("The uploaded file was not found. Please upload it again.")
+    if size > max_bytes:
+        field.storage.delete(key)
+        raise UploadError(f"The file is larger than {max_bytes // MB} MB.")
+    return key
+
+
+def receive_local_upload(token, uploaded_file):
+    """The /uploads/direct/ stand-in for Cloudinary: store the file under the token's key."""
+    data = _load(token)
+    field, max_bytes = _field(data["p"])
+    storage = field.storage
+    if is_cloudinary(storage):
+        raise UploadError("Direct uploads go to Cloudinary.")
+    if uploaded_file.size > max_bytes:
+        raise UploadError(f"The file is larger than {max_bytes // MB} MB.")
+    if storage.exists(data["k"]):
+        raise UploadError("This upload was already used.")
+
+    saved = storage.save(data["k"], uploaded_file)
+    if saved != data["k"]:
+        storage.delete(saved)
+        raise UploadError("This upload was already used.")
+    return saved
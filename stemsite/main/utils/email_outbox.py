@@ -0,0 +1,197 @@
+# main/utils/email_outbox.py
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from main.brevo_email import send_brevo_batch, send_brevo_broadcast
+from main.models import EmailBroadcast, OutgoingEmail
+from main.utils.broadcast import USE_BREVO_PARAMS, personalize
+
+logger = logging.getLogger(__name__)
+
+# Brevo accepts many messageVersions per call; keep batches modest so one
+# bad address or a slow response does not hold back a whole broadcast.
+# A batch Brevo rejects (4xx) is split in halves until the bad rows are
+# on their own, so only they are retried; an outage (5xx, network) retries
+# the whole batch with backoff.
+#
+# Rows are claimed in one short transaction (status "sending", leased for
+# EMAIL_OUTBOX_LEASE_SECONDS), sent with no transaction or row lock held,
+# and the results written in another. A worker that dies mid-send leaves
+# its rows to be claimed again when the lease runs out.
+BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 100)
+# Broadcast versions are only an address and a few params each, so one
+# call can carry many more of them (main/utils/broadcast.py)
+BROADCAST_BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BROADCAST_BATCH_SIZE", 500)
+MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+RETRY_BASE_SECONDS = getattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+RETRY_MAX_SECONDS = getattr(settings, "EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600)
+# Longer than one Brevo call with its client retries (30 s read timeout)
+LEASE_SECONDS = getattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", 300)
+
+# 4xx answers about the account rather than the batch: retry it whole
+ACCOUNT_ERROR_STATUSES = (401, 403, 429)
+
+
+# -------------------------------
+# Request path: enqueue only
+# -------------------------------
+def build_email(to_email, subject, html_content):
+    """Return an unsaved OutgoingEmail, ready for queue_emails()."""
+    return OutgoingEmail(to_email=to_email, subject=subject, html_content=html_content or "")
+
+
+def queue_emails(emails):
+    """
+    Insert many OutgoingEmail rows with a single bulk INSERT.
+    Returns the number of queued emails.
+    """
+    emails = [email for email in emails if email.to_email]
+    if not emails:
+        return 0
+
+    OutgoingEmail.objects.bulk_create(emails)
+    return len(emails)
+
+
+def queue_email(to_email, subject, html_content):
+    """Queue a single email (same path as queue_emails)."""
+    return queue_emails([build_email(to_email, subject, html_content)])
+
+
+# -------------------------------
+# Worker path: drain the outbox
+# -------------------------------
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at RETRY_MAX_SECONDS."""
+    delay = min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay + random.uniform(0, RETRY_BASE_SECONDS))
+
+
+def _send(emails, broadcast=None):
+    """One Brevo call for plain emails, or for a slice of one broadcast."""
+    if broadcast is None:
+        send_brevo_batch(
+            {
+                "to_email": email.to_email,
+                "subject": email.subject,
+                "html_content": email.html_content,
+            }
+            for email in emails
+        )
+    elif USE_BREVO_PARAMS:
+        send_brevo_broadcast(
+            broadcast.subject,
+            broadcast.html_content,
+            ((email.to_email, email.params) for email in emails),
+        )
+    else:
+        send_brevo_batch(
+            {
+                "to_email": email.to_email,
+                "subject": broadcast.subject,
+                "html_content": personalize(broadcast.html_content, email.params),
+            }
+            for email in emails
+        )
+
+
+def _rejected(error):
+    """Did Brevo refuse this batch's content (as opposed to being unavailable)?"""
+    status = getattr(error, "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in ACCOUNT_ERROR_STATUSES
+
+
+def _send_split(emails, broadcast, failures):
+    """
+    Send `emails`, bisecting a rejected batch so only the rows Brevo
+    refuses fail. Returns the emails sent; failed groups are appended to
+    `failures` as (emails, error).
+    """
+    try:
+        _send(emails, broadcast)
+        return emails
+    except Exception as e:
+        if len(emails) == 1 or not _rejected(e):
+            failures.append((emails, e))
+            return []
+
+    middle = len(emails) // 2
+    return (
+        _send_split(emails[:middle], broadcast, failures)
+        + _send_split(emails[middle:], broadcast, failures)
+    )
+
+
+def _record_failure(emails, error, now):
+    for email in emails:
+        email.attempts += 1
+        email.last_error = str(error)[:2000]
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = "failed"
+        else:
+            email.status = "pending"
+            email.next_attempt_at = now + retry_delay(email.attempts)
+    OutgoingEmail.objects.bulk_update(
+        emails, ["attempts", "last_error", "status", "next_attempt_at"]
+    )
+
+
+def _claim(batch_size, broadcast_batch_size, now):
+    """Lease due rows to this worker (status "sending") and return them."""
+    with transaction.atomic():
+        due = (
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=("pending", "sending"), next_attempt_at__lte=now)
+            .order_by("id")
+        )
+        batch = (
+            list(due.filter(broadcast__isnull=True)[:batch_size])
+            + list(due.filter(broadcast__isnull=False)[:broadcast_batch_size])
+        )
+        if batch:
+            OutgoingEmail.objects.filter(id__in=[email.id for email in batch]).update(
+                status="sending", next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+            )
+    return batch
+
+
+def deliver_pending(batch_size=BATCH_SIZE, broadcast_batch_size=BROADCAST_BATCH_SIZE):
+    """
+    Claim up to `batch_size` due emails and `broadcast_batch_size` due
+    broadcast emails, send them with one Brevo call per kind (per
+    broadcast) and record the outcome. Returns (sent, failed) counts.
+    """
+    now = timezone.now()
+    batch = _claim(batch_size, broadcast_batch_size, now)
+    if not batch:
+        return 0, 0
+
+    groups = {}
+    for email in batch:
+        groups.setdefault(email.broadcast_id, []).append(email)
+    broadcasts = EmailBroadcast.objects.in_bulk([key for key in groups if key is not None])
+
+    # No transaction here: the Brevo calls hold no lock or connection
+    sent = []
+    failures = []
+    for broadcast_id, emails in groups.items():
+        sent.extend(_send_split(emails, broadcasts.get(broadcast_id), failures))
+
+    with transaction.atomic():
+        if sent:
+            OutgoingEmail.objects.filter(id__in=[email.id for email in sent]).update(
+                status="sent", sent_at=timezone.now(), last_error=""
+            )
+        for emails, error in failures:
+            logger.error(f"[OUTBOX ❌] Batch of {len(emails)} failed: {error}")
+            _record_failure(emails, error, now)
+
+    if sent:
+        logger.info(f"[OUTBOX ✅] Sent batch of {len(sent)} email(s)")
+    return len(sent), sum(len(emails) for emails, _ in failures)
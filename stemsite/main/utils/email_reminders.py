@@ -1,52 +1,170 @@
+# main/utils/email_reminders.py
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
 from django.template.loader import render_to_string
 from django.utils import timezone
-from main.models import LiveSession, StudentCourse
-
-def send_upcoming_live_session_reminders():
-    now = timezone.now()
-
-    def send_reminder(sessions, reminder_type, hours):
-        for session in sessions:
-            students = StudentCourse.objects.filter(course=session.course)
-            for sc in students:
-                context = {
-                    'name': sc.student.get_full_name() or sc.student.username,
-                    'course': session.course.title,
-                    'time': session.start_time.strftime('%A, %d %B %Y %I:%M %p'),
-                    'link': session.link,
-                }
-                subject = f"{reminder_type} Reminder – {session.course.title}"
-                html_message = render_to_string('emails/live_session_reminder.html', context)
-                plain_message = f"Reminder: Your live session for {session.course.title} is coming up at {context['time']}."
-
-                # ✅ Send asynchronously
-                send_email_async(
-                    subject=subject,
-                    message=plain_message,
-                    recipients=[sc.student.email],
-                    html_message=html_message,
-                    fail_silently=True,
-                )
-
-            # Mark session reminder sent
-            if hours == 24:
-                session.reminder_24hr_sent = True
-            elif hours == 1:
-                session.reminder_1hr_sent = True
-            session.save()
-
-    # 24-hour reminders
-    sessions_24hr = LiveSession.objects.filter(
-        reminder_24hr_sent=False,
-        start_time__gt=now,
-        start_time__lte=now + timezone.timedelta(hours=24)
+from django.utils.timezone import localtime
+
+from main.models import LiveSession, LiveSessionReminder, Notification
+from main.utils.broadcast import param, queue_broadcasts
+from main.utils.notifications import RECIPIENT_FIELDS
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Live session reminders, set-based:
+#
+# - Each tick picks every due (session, student) pair of a window with one
+#   query: students picked on the session or actively enrolled in its
+#   course, minus those already in the LiveSessionReminder ledger.
+# - Pairs are delivered in batches. A batch writes its ledger rows,
+#   dashboard Notifications and outbox emails (rendered once per session)
+#   in one transaction, so a crash loses nothing and a re-run sends
+#   nothing twice. The outbox worker does the actual Brevo sending and
+#   retries.
+# - A window only covers the time until the next one opens: a session
+#   created 2 hours before it starts gets the 3-hour reminder only.
+#   Once a session has moved past a window its LiveSession flag is set,
+#   which drops it from that window's partial index (live_due_*_idx).
+BATCH_SIZE = getattr(settings, "LIVE_REMINDER_BATCH_SIZE", 500)
+
+# (window, hours before start, LiveSession flag), widest first
+WINDOWS = (
+    ("24hr", 24, "reminder_24hr_sent"),
+    ("3hr", 3, "reminder_sent"),
+    ("1hr", 1, "reminder_1hr_sent"),
+)
+
+SUBJECTS = {
+    "24hr": "⏰ Reminder: Your Live Session in 24 Hours – {course}",
+    "3hr": "⚡ Reminder: Your Live Session in 3 Hours – {course}",
+    "1hr": "🚨 Live Session Starting in 1 Hour – {course}",
+}
+
+MESSAGES = {
+    "24hr": "Your live session '{title}' for {course} starts in 24 hours.",
+    "3hr": "Your live session '{title}' for {course} starts in 3 hours.",
+    "1hr": "Your live session '{title}' for {course} starts in 1 hour.",
+}
+
+
+# -------------------------------
+# Due pairs
+# -------------------------------
+def due_reminders(window, flag, after, until):
+    """
+    (session_id, student_id) pairs owed the `window` reminder, for sessions
+    starting in (after, until] whose window is still open. One query.
+    """
+    sessions = LiveSession.objects.filter(**{flag: False}, start_time__gt=after, start_time__lte=until)
+    already_sent = LiveSessionReminder.objects.filter(
+        session_id=OuterRef("session_id"), student_id=OuterRef("student_id"), window=window
+    )
+
+    picked = (
+        LiveSession.students.through.objects.filter(livesession__in=sessions, user__email__gt="")
+        .annotate(session_id=F("livesession_id"), student_id=F("user_id"))
+        .filter(~Exists(already_sent))
+        .values_list("session_id", "student_id")
+    )
+    enrolled = (
+        sessions.filter(course__enrollments__is_active=True, course__enrollments__user__email__gt="")
+        .annotate(session_id=F("id"), student_id=F("course__enrollments__user_id"))
+        .filter(~Exists(already_sent))
+        .values_list("session_id", "student_id")
     )
-    send_reminder(sessions_24hr, "⏰ 24-Hour", 24)
+    # UNION also removes students who are both picked and enrolled
+    return picked.union(enrolled).order_by("session_id", "student_id")
 
-    # 1-hour reminders
-    sessions_1hr = LiveSession.objects.filter(
-        reminder_1hr_sent=False,
-        start_time__gt=now,
-        start_time__lte=now + timezone.timedelta(hours=1)
+
+# -------------------------------
+# Delivery
+# -------------------------------
+def _deliver_batch(window, pairs):
+    """Ledger, notifications and emails for one batch; the caller wraps it in a transaction."""
+    sessions = (
+        LiveSession.objects.select_related("course")
+        .only("id", "title", "link", "start_time", "course__title")
+        .in_bulk({session_id for session_id, _ in pairs})
+    )
+    students = User.objects.only(*RECIPIENT_FIELDS).in_bulk({student_id for _, student_id in pairs})
+
+    # Raises IntegrityError (and rolls the batch back) if another scheduler got here first
+    LiveSessionReminder.objects.bulk_create(
+        [LiveSessionReminder(session_id=session_id, student_id=student_id, window=window)
+         for session_id, student_id in pairs]
+    )
+
+    content_type = ContentType.objects.get_for_model(LiveSession)
+    notifications = []
+    students_by_session = {}
+    for session_id, student_id in pairs:
+        session = sessions[session_id]
+        student = students[student_id]
+        students_by_session.setdefault(session_id, []).append(student)
+
+        notifications.append(Notification(
+            student=student,
+            notif_type="live",
+            title=SUBJECTS[window].format(course=session.course.title),
+            message=MESSAGES[window].format(title=session.title, course=session.course.title),
+            obj_content_type=content_type,
+            obj_id=session.id,
+        ))
+    Notification.objects.bulk_create(notifications)
+
+    # One render per session, personalised per student (main/utils/broadcast.py)
+    queue_broadcasts(
+        (
+            ((student.email, {"name": student.get_full_name() or student.username}) for student in session_students),
+            SUBJECTS[window].format(course=sessions[session_id].course.title),
+            render_to_string("emails/live_session_reminder.html", {
+                "name": param("name"),
+                "course": sessions[session_id].course.title,
+                "time": localtime(sessions[session_id].start_time).strftime("%A, %d %B %Y %I:%M %p"),
+                "link": sessions[session_id].link,
+            }),
+        )
+        for session_id, session_students in students_by_session.items()
     )
-    send_reminder(sessions_1hr, "🚨 1-Hour", 1)
+
+
+def send_upcoming_live_session_reminders(batch_size=BATCH_SIZE, now=None):
+    """
+    One scheduler tick over all windows. Returns (queued, failed) counts;
+    failed pairs are still due and are picked up by the next tick.
+    """
+    now = now or timezone.now()
+    queued = failed = 0
+
+    for position, (window, hours, flag) in enumerate(WINDOWS):
+        next_hours = WINDOWS[position + 1][1] if position + 1 < len(WINDOWS) else 0
+        closes_at = now + timedelta(hours=next_hours)
+
+        pairs = list(due_reminders(window, flag, closes_at, now + timedelta(hours=hours)))
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            try:
+                with transaction.atomic():
+                    _deliver_batch(window, batch)
+                queued += len(batch)
+            except IntegrityError:
+                logger.warning(f"[REMINDERS 🔁] {window}: batch already taken by another scheduler")
+                failed += len(batch)
+            except Exception as e:
+                logger.error(f"[REMINDERS ❌] {window}: batch of {len(batch)} failed: {e}")
+                failed += len(batch)
+
+        # Sessions that have moved past this window are done with it
+        LiveSession.objects.filter(**{flag: False}, start_time__lte=closes_at).update(**{flag: True})
+
+    if queued:
+        logger.info(f"[REMINDERS ✅] Queued {queued} live session reminder(s)")
+    return queued, failed
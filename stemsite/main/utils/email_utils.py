@@ -2,18 +2,10 @@
 
 import logging
 from django.conf import settings
-from django.template import Template, Context
 from django.template.loader import render_to_string
-from django.utils import timezone
 from django.utils.html import strip_tags
-from django.contrib.contenttypes.models import ContentType
 from django.core.mail import EmailMultiAlternatives
-from main.models import (
-    EmailTemplate,
-    LiveSession,
-    StudentCourse,
-    Notification
-)
+from main.utils.template_cache import get_email_template
 
 logger = logging.getLogger(__name__)
 
@@ -25,11 +17,12 @@ def send_templated_email(student, template_name, context, fallback_subject, fall
     Send an email using admin-defined EmailTemplate.
     If template not found, use fallback subject/message.
     """
-    try:
-        template = EmailTemplate.objects.get(name=template_name)
+    # Compiled once per process, see main/utils/template_cache.py
+    template = get_email_template(template_name)
+    if template is not None:
         subject = template.subject or fallback_subject
-        body = Template(template.body).render(Context(context))
-    except EmailTemplate.DoesNotExist:
+        body = template.render_body(context)
+    else:
         subject = fallback_subject
         body = fallback_message
 
@@ -190,86 +183,6 @@ def send_html_email(subject, to_email, context, template):
         logger.error(f"Failed to send HTML email to {to_email}: {e}")
 
 
-# -------------------------------
-# Upcoming Live Session Reminders
-# -------------------------------
-def send_upcoming_live_session_reminders():
-    """
-    Sends 24-hour, 3-hour, and 1-hour reminders for upcoming live sessions.
-    Also creates dashboard notifications for students.
-    """
-    now = timezone.now()
-
-    def send_reminder(session, student, hours_left):
-        context = {
-            'name': student.get_full_name() or student.username,
-            'course': session.course.title,
-            'time': session.start_time.strftime('%A, %d %B %Y %I:%M %p'),
-            'link': session.link,
-        }
-
-        if hours_left == 24:
-            subject = f"⏰ Reminder: Your Live Session in 24 Hours – {session.course.title}"
-            msg = f"Your live session '{session.title}' for {session.course.title} starts in 24 hours."
-        elif hours_left == 3:
-            subject = f"⚡ Reminder: Your Live Session in 3 Hours – {session.course.title}"
-            msg = f"Your live session '{session.title}' for {session.course.title} starts in 3 hours."
-        else:
-            subject = f"🚨 Live Session Starting in 1 Hour – {session.course.title}"
-            msg = f"Your live session '{session.title}' for {session.course.title} starts in 1 hour."
-
-        # Send email
-        send_html_email(subject, student.email, context, 'email/live_session_reminder.html')
-
-        # Dashboard notification
-        Notification.objects.create(
-            student=student,
-            notif_type='live',
-            title=subject,
-            message=msg,
-            obj_content_type=ContentType.objects.get_for_model(LiveSession),
-            obj_id=session.id
-        )
-
-    # 24-hour
-    sessions_24hr = LiveSession.objects.filter(
-        reminder_24hr_sent=False,
-        start_time__gt=now,
-        start_time__lte=now + timezone.timedelta(hours=24)
-    )
-    for session in sessions_24hr:
-        students = StudentCourse.objects.filter(course=session.course)
-        for sc in students:
-            send_reminder(session, sc.student, 24)
-        session.reminder_24hr_sent = True
-        session.save()
-
-    # 3-hour
-    sessions_3hr = LiveSession.objects.filter(
-        reminder_sent=False,
-        start_time__gt=now,
-        start_time__lte=now + timezone.timedelta(hours=3)
-    )
-    for session in sessions_3hr:
-        students = StudentCourse.objects.filter(course=session.course)
-        for sc in students:
-            send_reminder(session, sc.student, 3)
-        session.reminder_sent = True
-        session.save()
-
-    # 1-hour
-    sessions_1hr = LiveSession.objects.filter(
-        reminder_1hr_sent=False,
-        start_time__gt=now,
-        start_time__lte=now + timezone.timedelta(hours=1)
-    )
-    for session in sessions_1hr:
-        students = StudentCourse.objects.filter(course=session.course)
-        for sc in students:
-            send_reminder(session, sc.student, 1)
-        session.reminder_1hr_sent = True
-        session.save()
-
 # main/utils/email_utils.py
 def send_payment_receipt(enrollment):
     """
@@ -0,0 +1,133 @@
+# main/utils/entitlements.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from main.models import CourseAccess, CoursePayment, Enrollment
+
+# Who may use which course, answered from one table.
+#
+# The rule, applied per enrollment:
+#   - BLOCKED if a verified payment of the enrollment has dashboard_blocked
+#   - ACTIVE  if it has a verified payment, or the admin activated the
+#             course (is_course_activated)
+#   - UNPAID  otherwise
+# and a user without an enrollment for the course has no access at all.
+#
+# The result is stored in CourseAccess, refreshed by the Enrollment and
+# CoursePayment receivers in main/signals.py. Reads go through a per-user
+# {course_id: status} map cached for COURSE_ACCESS_CACHE_TIMEOUT seconds
+# and dropped whenever one of the user's rows changes, so a check is a
+# cache hit or one indexed query.
+#
+# Writes that skip signals (queryset.update(), raw SQL, fixtures) are
+# repaired by `python manage.py rebuild_course_access`.
+CACHE_TIMEOUT = getattr(settings, "COURSE_ACCESS_CACHE_TIMEOUT", 300)
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def _cache_key(user_id):
+    return f"course_access:{user_id}"
+
+
+def _pk(value):
+    return getattr(value, "pk", value)
+
+
+# -------------------------------
+# Computing
+# -------------------------------
+def _with_payment_state(enrollments):
+    verified = CoursePayment.objects.filter(
+        enrollment=OuterRef("pk"), course=OuterRef("course"), is_verified=True
+    )
+    return enrollments.annotate(
+        has_verified_payment=Exists(verified),
+        has_blocked_payment=Exists(verified.filter(dashboard_blocked=True)),
+    )
+
+
+def _status(enrollment):
+    if enrollment.has_blocked_payment:
+        return CourseAccess.BLOCKED
+    if enrollment.has_verified_payment or enrollment.is_course_activated:
+        return CourseAccess.ACTIVE
+    return CourseAccess.UNPAID
+
+
+def _write(enrollments):
+    """Upsert the CourseAccess rows of annotated `enrollments`; returns the user ids touched."""
+    rows = [
+        CourseAccess(enrollment_id=e.pk, user_id=e.user_id, course_id=e.course_id, status=_status(e))
+        for e in enrollments
+    ]
+    CourseAccess.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["enrollment"],
+        update_fields=["user", "course", "status", "updated_at"],
+    )
+    return {row.user_id for row in rows}
+
+
+def refresh_enrollments(enrollment_ids):
+    """Recompute the access of these enrollments."""
+    # An enrollment moved to another user: the previous owner's map changes too
+    previous = set(CourseAccess.objects.filter(enrollment_id__in=enrollment_ids).values_list("user_id", flat=True))
+    enrollments = _with_payment_state(
+        Enrollment.objects.filter(pk__in=enrollment_ids)
+        .only("id", "user_id", "course_id", "is_course_activated")
+    )
+    invalidate_users(previous | _write(enrollments))
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute the row of every enrollment; returns the number of rows."""
+    enrollments = _with_payment_state(
+        Enrollment.objects.only("id", "user_id", "course_id", "is_course_activated").order_by("pk")
+    )
+    total = 0
+    batch = []
+    for enrollment in enrollments.iterator(chunk_size=batch_size):
+        batch.append(enrollment)
+        if len(batch) >= batch_size:
+            invalidate_users(_write(batch))
+            total += len(batch)
+            batch = []
+    if batch:
+        invalidate_users(_write(batch))
+        total += len(batch)
+    # Rows of deleted enrollments went with them (CASCADE)
+    return total
+
+
+def invalidate_users(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+# -------------------------------
+# Reading
+# -------------------------------
+def statuses(user):
+    """{course_id: status} for every course the user is enrolled in (cached)."""
+    user_id = _pk(user)
+    key = _cache_key(user_id)
+    result = cache.get(key)
+    if result is None:
+        result = dict(CourseAccess.objects.filter(user_id=user_id).values_list("course_id", "status"))
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def access_status(user, course):
+    """CourseAccess.ACTIVE / UNPAID / BLOCKED, or None when the user is not enrolled."""
+    if user is None or not getattr(user, "is_authenticated", True):
+        return None
+    return statuses(user).get(_pk(course))
+
+
+def has_access(user, course):
+    """May `user` use `course` (a Course or its id)?"""
+    return access_status(user, course) == CourseAccess.ACTIVE
@@ -0,0 +1,241 @@
+# main/utils/exports.py
+
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from main.models import AssignmentSubmission, CoursePayment, Enrollment
+
+# Streaming CSV / XLSX exports for the admin (actions on the changelist)
+# and `python manage.py export_records`.
+#
+# Rows come from queryset.values_list(...).iterator(chunk_size): related
+# columns ("course__title") are JOINed in SQL, no model instances are
+# built and only one chunk is held in memory, whatever the row count.
+# XLSX is written as a zip stream with the standard library, so it is as
+# flat as the CSV and needs no extra dependency.
+CHUNK_SIZE = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+# (column header, values_list path)
+ENROLLMENT_COLUMNS = (
+    ("ID", "id"),
+    ("Full name", "full_name"),
+    ("Email", "email"),
+    ("Username", "user__username"),
+    ("Course", "course__title"),
+    ("Program", "program"),
+    ("Class type", "class_type"),
+    ("Skill level", "skill_level"),
+    ("Enrollment paid", "is_enrollment_paid"),
+    ("Paid at", "paid_at"),
+    ("Payment method", "payment_method"),
+    ("Payment reference", "payment_reference"),
+    ("Course activated", "is_course_activated"),
+    ("Active", "is_active"),
+    ("Submitted at", "submitted_at"),
+)
+
+COURSE_PAYMENT_COLUMNS = (
+    ("ID", "id"),
+    ("Reference", "reference"),
+    ("Student", "enrollment__full_name"),
+    ("Email", "enrollment__email"),
+    ("Course", "course__title"),
+    ("Amount paid", "amount_paid"),
+    ("Payment type", "payment_type"),
+    ("Payment method", "payment_method"),
+    ("Session option", "session_option"),
+    ("Verified", "is_verified"),
+    ("Dashboard blocked", "dashboard_blocked"),
+    ("Created at", "created_at"),
+)
+
+SUBMISSION_COLUMNS = (
+    ("ID", "id"),
+    ("Assignment", "assignment__title"),
+    ("Course", "assignment__course__title"),
+    ("Due date", "assignment__due_date"),
+    ("Username", "student__username"),
+    ("Email", "student__email"),
+    ("Submitted at", "submitted_at"),
+    ("File", "file"),
+    ("Correction file", "correction_file"),
+    ("Feedback", "feedback_comments"),
+)
+
+# Name used by export_records -> (model, columns)
+EXPORTS = {
+    "enrollments": (Enrollment, ENROLLMENT_COLUMNS),
+    "payments": (CoursePayment, COURSE_PAYMENT_COLUMNS),
+    "submissions": (AssignmentSubmission, SUBMISSION_COLUMNS),
+}
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# -------------------------------
+# Rows
+# -------------------------------
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    return value
+
+
+def export_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Header row, then one tuple per record, read chunk by chunk."""
+    yield [header for header, _ in columns]
+    values = queryset.values_list(*[path for _, path in columns])
+    for row in values.iterator(chunk_size=chunk_size):
+        yield [_cell(value) for value in row]
+
+
+# -------------------------------
+# CSV
+# -------------------------------
+class _Echo:
+    """File-like object whose write() hands the data back (Django's streaming CSV pattern)."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    # A leading = + - @ would make Excel evaluate the cell as a formula
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+def csv_chunks(rows):
+    writer = csv.writer(_Echo())
+    yield "﻿"  # BOM, so Excel opens UTF-8 names correctly
+    for row in rows:
+        yield writer.writerow([_csv_safe(value) for value in row])
+
+
+# -------------------------------
+# XLSX
+# -------------------------------
+class ZipStream:
+    """Unseekable sink for zipfile: collects what was written until drained (also used by submission_zip)."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(row):
+    cells = []
+    for value in row:
+        if isinstance(value, (int, float, Decimal)):
+            cells.append(f"<c t=\"n\"><v>{value}</v></c>")
+        else:
+            text = escape(str(value))
+            cells.append(f"<c t=\"inlineStr\"><is><t xml:space=\"preserve\">{text}</t></is></c>")
+    return "<row>" + "".join(cells) + "</row>"
+
+
+def xlsx_chunks(rows, rows_per_chunk=500):
+    sink = ZipStream()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            buffered = []
+            for row in rows:
+                buffered.append(_xlsx_row(row))
+                if len(buffered) >= rows_per_chunk:
+                    sheet.write("".join(buffered).encode())
+                    buffered = []
+                    yield sink.drain()
+            sheet.write(("".join(buffered) + "</sheetData></worksheet>").encode())
+    yield sink.drain()
+
+
+# -------------------------------
+# Entry points
+# -------------------------------
+def export_chunks(queryset, columns, fmt, chunk_size=CHUNK_SIZE):
+    rows = export_rows(queryset, columns, chunk_size=chunk_size)
+    return csv_chunks(rows) if fmt == "csv" else xlsx_chunks(rows)
+
+
+def export_response(queryset, columns, filename, fmt):
+    """StreamingHttpResponse with the export of `queryset` as <filename>.<fmt>."""
+    stamp = timezone.localtime().strftime("%Y%m%d-%H%M")
+    response = StreamingHttpResponse(export_chunks(queryset, columns, fmt), content_type=FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}-{stamp}.{fmt}"'
+    return response
@@ -0,0 +1,234 @@
+# main/utils/http_client.py
+
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+# One client for every third-party API the site talks to (Brevo, Paystack,
+# and file downloads from remote storage via get_url()).
+#
+# - One keep-alive requests.Session per upstream host and process, so bulk
+#   sends reuse TCP+TLS connections instead of handshaking on every call.
+# - Uniform (connect, read) timeouts; callers may raise the read timeout.
+# - Bounded retries with jittered exponential backoff, only where a retry
+#   cannot duplicate side effects (see _should_retry).
+# - Per-endpoint call counts and latency histograms, see metrics_snapshot().
+#
+# Base URLs come from settings at call time (BREVO_API_URL, PAYSTACK_API_URL),
+# so tests and benchmarks can point the client at a local stub server.
+SERVICES = {
+    "brevo": ("BREVO_API_URL", "https://api.brevo.com"),
+    "paystack": ("PAYSTACK_API_URL", "https://api.paystack.co"),
+}
+
+CONNECT_TIMEOUT = getattr(settings, "HTTP_CONNECT_TIMEOUT", 3.05)
+READ_TIMEOUT = getattr(settings, "HTTP_READ_TIMEOUT", 10)
+MAX_RETRIES = getattr(settings, "HTTP_MAX_RETRIES", 2)
+RETRY_BASE_SECONDS = getattr(settings, "HTTP_RETRY_BASE_SECONDS", 0.25)
+RETRY_MAX_SECONDS = getattr(settings, "HTTP_RETRY_MAX_SECONDS", 5)
+POOL_MAXSIZE = getattr(settings, "HTTP_POOL_MAXSIZE", 10)
+
+# The upstream refused or could not take the request: safe to send again
+RETRY_STATUSES = (429, 503)
+# A gateway error may come after the upstream acted on the request:
+# resent only when repeating it has no side effects
+IDEMPOTENT_RETRY_STATUSES = (502, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Latency histogram bucket upper bounds, in milliseconds (last one is +Inf)
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def base_url(service):
+    setting, default = SERVICES[service]
+    return getattr(settings, setting, None) or default
+
+
+# -------------------------------
+# Connection pools
+# -------------------------------
+_sessions = {}
+_sessions_pid = None
+_sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """The pooled Session for the host of `url` (created on first use)."""
+    global _sessions_pid
+    host = urlsplit(url).netloc
+
+    with _sessions_lock:
+        # A forked worker must not share sockets with its parent
+        if _sessions_pid != os.getpid():
+            _sessions.clear()
+            _sessions_pid = os.getpid()
+
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _record(endpoint, outcome, elapsed_ms):
+    with _metrics_lock:
+        stats = _metrics.get(endpoint)
+        if stats is None:
+            stats = _metrics[endpoint] = {
+                "calls": 0,
+                "outcomes": {},
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            }
+        stats["calls"] += 1
+        stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+
+def metrics_snapshot():
+    """
+    {endpoint: {calls, outcomes, avg_ms, max_ms, histogram}} for this process.
+    Every attempt is one call; outcomes are "2xx".."5xx", "error" or "retry".
+    """
+    labels = [f"le_{bound}" for bound in LATENCY_BUCKETS_MS] + ["le_inf"]
+    with _metrics_lock:
+        return {
+            endpoint: {
+                "calls": stats["calls"],
+                "outcomes": dict(stats["outcomes"]),
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0,
+                "max_ms": round(stats["max_ms"], 2),
+                "histogram": dict(zip(labels, stats["buckets"])),
+            }
+            for endpoint, stats in _metrics.items()
+        }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+# -------------------------------
+# Requests
+# -------------------------------
+def _retry_delay(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_SECONDS)
+    delay = min(RETRY_BASE_SECONDS * (2 ** attempt), RETRY_MAX_SECONDS)
+    return delay + random.uniform(0, RETRY_BASE_SECONDS)
+
+
+def _never_sent(error):
+    """Did `error` happen while connecting, before the upstream could see the request?"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _should_retry(method, error=None, response=None):
+    if response is not None:
+        if response.status_code in RETRY_STATUSES:
+            return True
+        return method in IDEMPOTENT_METHODS and response.status_code in IDEMPOTENT_RETRY_STATUSES
+    if method in IDEMPOTENT_METHODS:
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout))
+    # A reset or read timeout after sending may mean the upstream already
+    # charged / sent: only a request that never connected is resent
+    return _never_sent(error)
+
+
+def request(service, method, path, endpoint=None, timeout=None, retries=None, **kwargs):
+    """
+    Call `path` on a configured service and return the requests.Response.
+    `endpoint` names the metrics series (defaults to "<service> <METHOD> <path>");
+    pass a stable label when the path carries ids. Raises the last
+    requests exception when every attempt failed to get a response.
+    """
+    method = method.upper()
+    url = base_url(service).rstrip("/") + path
+    endpoint = endpoint or f"{service} {method} {path}"
+    return _send(method, url, endpoint, timeout, retries, **kwargs)
+
+
+def _send(method, url, endpoint, timeout=None, retries=None, **kwargs):
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if not isinstance(timeout, tuple):
+        timeout = (CONNECT_TIMEOUT, timeout)
+    retries = MAX_RETRIES if retries is None else retries
+
+    session = get_session(url)
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if attempt < retries and _should_retry(method, error=e):
+                _record(endpoint, "retry", elapsed_ms)
+                attempt += 1
+                time.sleep(_retry_delay(attempt))
+                continue
+            _record(endpoint, "error", elapsed_ms)
+            logger.error(f"[HTTP ❌] {endpoint} failed after {attempt + 1} attempt(s): {e}")
+            raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if attempt < retries and _should_retry(method, response=response):
+            _record(endpoint, "retry", elapsed_ms)
+            attempt += 1
+            time.sleep(_retry_delay(attempt, response))
+            continue
+
+        _record(endpoint, f"{response.status_code // 100}xx", elapsed_ms)
+        return response
+
+
+def get(service, path, **kwargs):
+    return request(service, "GET", path, **kwargs)
+
+
+def post(service, path, **kwargs):
+    return request(service, "POST", path, **kwargs)
+
+
+def get_url(url, endpoint, **kwargs):
+    """
+    GET an absolute URL, e.g. a file in remote storage (Cloudinary), through
+    the same pools, retries and metrics. Pass stream=True for large bodies.
+    """
+    return _send("GET", url, endpoint, **kwargs)
@@ -0,0 +1,96 @@
+# main/utils/notifications.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import QuerySet
+
+from main.models import Notification
+
+User = get_user_model()
+
+NOTIFICATION_BATCH_SIZE = 500
+
+# Columns needed for dashboard notifications and personalised emails
+RECIPIENT_FIELDS = ("id", "username", "email", "first_name", "last_name")
+
+# Events emitted from more than one code path (admin save_model and the
+# post_save receiver): pass as fan_out_notifications(event=...) so each
+# recipient is notified once, whichever path runs first.
+LIVE_SESSION_CREATED = "live_session.created"
+TIMETABLE_CREATED = "timetable.created"
+GLOBAL_TIMETABLE_CREATED = "globaltimetable.created"
+
+
+# -------------------------------
+# Recipients
+# -------------------------------
+def resolve_recipients(users):
+    """
+    Return a de-duplicated list of User objects for `users`.
+
+    `users` may be a User queryset, an iterable of User objects or an
+    iterable of user ids. Querysets and ids are resolved with one query;
+    already-loaded User objects are used as they are.
+    """
+    if isinstance(users, QuerySet):
+        return list(users.only(*RECIPIENT_FIELDS).distinct().order_by("id"))
+
+    users = list(users or [])
+    if users and all(isinstance(user, User) for user in users):
+        unique = {}
+        for user in users:
+            unique.setdefault(user.pk, user)
+        return list(unique.values())
+
+    ids = {getattr(user, "pk", user) for user in users}
+    if not ids:
+        return []
+    return list(User.objects.filter(id__in=ids).only(*RECIPIENT_FIELDS).order_by("id"))
+
+
+# -------------------------------
+# Fan-out
+# -------------------------------
+def fan_out_notifications(users, title, message="", notif_type="general", obj=None,
+                          batch_size=NOTIFICATION_BATCH_SIZE, event=""):
+    """
+    Create one dashboard Notification per recipient with chunked bulk_create.
+
+    title / message may be strings or callables taking the recipient User,
+    for per-student text. `obj` optionally links every notification to a
+    model instance. With an `event` (and `obj`), recipients who already have
+    that event for that object are skipped, and the notif_event_once
+    constraint turns a concurrent duplicate into a no-op.
+    Returns {"recipients": n, "attempted": n}: "attempted" rows were sent
+    to the database, but a concurrent emitter of the same event may have
+    inserted some of them first, so it is an upper bound on rows created.
+    """
+    recipients = resolve_recipients(users)
+    if not recipients:
+        return {"recipients": 0, "attempted": 0}
+
+    content_type = ContentType.objects.get_for_model(obj) if obj is not None else None
+    obj_id = obj.pk if obj is not None else None
+
+    pending = recipients
+    if event:
+        notified = set(
+            Notification.objects.filter(event=event, obj_id=obj_id).values_list("student_id", flat=True)
+        )
+        pending = [user for user in recipients if user.pk not in notified]
+
+    notifications = [
+        Notification(
+            student=user,
+            notif_type=notif_type,
+            title=title(user) if callable(title) else title,
+            message=message(user) if callable(message) else message,
+            obj_content_type=content_type,
+            obj_id=obj_id,
+            event=event,
+        )
+        for user in pending
+    ]
+    Notification.objects.bulk_create(notifications, batch_size=batch_size, ignore_conflicts=bool(event))
+
+    return {"recipients": len(recipients), "attempted": len(notifications)}
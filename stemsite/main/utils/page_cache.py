@@ -0,0 +1,69 @@
+# main/utils/page_cache.py
+
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from main.models import SiteSetting
+
+# The public home page is rebuilt from the database only when its content
+# version changes. The version is a unix timestamp (seconds), so it doubles
+# as the Last-Modified date and as the ETag seed.
+#
+# The version itself lives in the database (SiteSetting HOME_VERSION_KEY),
+# so every worker and every cache expiry agree on it and conditional GETs
+# keep answering 304 until the content really changes. The cache only holds
+# a copy of it, and the built context, for PUBLIC_PAGE_CACHE_TIMEOUT: with
+# a per-process (locmem) cache, a worker that missed a bump reads the new
+# version within that window.
+PUBLIC_PAGE_CACHE_TIMEOUT = getattr(settings, "PUBLIC_PAGE_CACHE_TIMEOUT", 300)
+
+HOME_VERSION_KEY = "public:home:version"
+
+
+def _stored_version():
+    setting, _ = SiteSetting.objects.get_or_create(key=HOME_VERSION_KEY, defaults={"value": str(int(time.time()))})
+    return int(setting.value)
+
+
+def home_content_version():
+    """Return the current home page content version (unix seconds)."""
+    version = cache.get(HOME_VERSION_KEY)
+    if version is None:
+        version = _stored_version()
+        cache.set(HOME_VERSION_KEY, version, timeout=PUBLIC_PAGE_CACHE_TIMEOUT)
+    return version
+
+
+def home_last_modified(version):
+    return datetime.fromtimestamp(version, tz=dt_timezone.utc)
+
+
+def bump_home_content():
+    """Called from main/signals.py when any home page model changes."""
+    with transaction.atomic():
+        setting, created = SiteSetting.objects.select_for_update().get_or_create(
+            key=HOME_VERSION_KEY, defaults={"value": str(int(time.time()))}
+        )
+        if not created:
+            # Never reuse a version within the same second
+            setting.value = str(max(int(time.time()), int(setting.value) + 1))
+            setting.save(update_fields=["value"])
+    cache.set(HOME_VERSION_KEY, int(setting.value), timeout=PUBLIC_PAGE_CACHE_TIMEOUT)
+
+
+def get_home_content(build):
+    """
+    Return (version, content) for the home page. `build` is only called
+    when nothing is cached for the current version.
+    """
+    version = home_content_version()
+    key = f"public:home:{version}"
+    content = cache.get(key)
+    if content is None:
+        content = build()
+        cache.set(key, content, timeout=PUBLIC_PAGE_CACHE_TIMEOUT)
+    return version, content
@@ -0,0 +1,243 @@
+# main/utils/paystack.py
+
+import hashlib
+import hmac
+import json
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from main.models import CoursePayment, Enrollment, PaymentEvent
+from main.utils.email_outbox import queue_email, retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Enrollment fee charged by enrolment_payment_request (in kobo)
+ENROLLMENT_FEE_KOBO = 2500 * 100
+
+BATCH_SIZE = getattr(settings, "PAYSTACK_EVENTS_BATCH_SIZE", 50)
+MAX_ATTEMPTS = getattr(settings, "PAYSTACK_EVENTS_MAX_ATTEMPTS", 5)
+
+# Only successful charges change local state; everything else is acknowledged
+HANDLED_EVENTS = ("charge.success",)
+
+
+class PaymentMismatch(Exception):
+    """The charge does not match what we asked for; never retried."""
+
+
+# -------------------------------
+# Request path: verify and record
+# -------------------------------
+def verify_signature(body, signature):
+    """x-paystack-signature is the HMAC-SHA512 of the raw body, keyed with the secret key."""
+    if not signature:
+        return False
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def record_event(body):
+    """
+    Store a verified webhook body. Returns the PaymentEvent, or None when
+    the event is not one we handle. A reference seen before is not
+    stored again, so replays and retries are harmless.
+    """
+    payload = json.loads(body)
+    event = payload.get("event", "")
+    reference = (payload.get("data") or {}).get("reference")
+    if event not in HANDLED_EVENTS or not reference:
+        return None
+
+    try:
+        with transaction.atomic():
+            return PaymentEvent.objects.create(reference=reference, event=event, payload=payload)
+    except IntegrityError:
+        logger.info(f"[PAYSTACK 🔁] Duplicate event for {reference}, ignored")
+        return PaymentEvent.objects.get(reference=reference)
+
+
+# -------------------------------
+# Worker path: apply recorded events
+# -------------------------------
+def _paid_at(data):
+    return parse_datetime(data.get("paid_at") or data.get("paidAt") or "") or timezone.now()
+
+
+def _check_amount(data, expected_kobo):
+    paid = int(data.get("amount") or 0)
+    if paid < expected_kobo:
+        raise PaymentMismatch(f"paid {paid} kobo, expected {expected_kobo}")
+
+
+def _apply_enrollment_fee(enrollment, data):
+    if enrollment.is_enrollment_paid:
+        return
+    _check_amount(data, ENROLLMENT_FEE_KOBO)
+
+    enrollment.is_enrollment_paid = True
+    enrollment.payment_method = "Paystack"
+    enrollment.paid_at = _paid_at(data)
+    # post_save (main/signals.py) generates and emails the secret code
+    enrollment.save(update_fields=["is_enrollment_paid", "payment_method", "paid_at"])
+
+    queue_email(
+        enrollment.email,
+        "Enrollment Payment Successful",
+        "<pre>"
+        f"Dear {enrollment.full_name},\n\n"
+        f"Your enrollment payment for {enrollment.course} "
+        f"({enrollment.program}) has been successfully received.\n\n"
+        "Your secret login code is on its way in a separate email.\n\n"
+        "- STEM CodeMaster Team"
+        "</pre>",
+    )
+
+
+def _apply_course_payment(payment, data):
+    if payment.is_verified:
+        return
+    _check_amount(data, int(payment.amount_paid * 100))
+
+    payment.is_verified = True
+    payment.save(update_fields=["is_verified"])
+
+    enrollment = payment.enrollment
+    queue_email(
+        enrollment.email,
+        "STEM CodeMaster - Payment Receipt",
+        "<pre>"
+        f"Dear {enrollment.full_name},\n\n"
+        f"This is to confirm receipt of your payment of ₦{payment.amount_paid} "
+        f"for the course: {payment.course.title}.\n\n"
+        f"Reference: {payment.reference}\n"
+        f"Payment Type: {payment.payment_type.upper()}\n"
+        f"Payment Method: {payment.payment_method.upper()}\n\n"
+        "Your access has been granted. Use your secret login code to log in.\n\n"
+        "Best regards,\n"
+        "STEM CodeMaster Team"
+        "</pre>",
+    )
+
+
+def _apply_service_payment(service_request, reference, data):
+    from services.models import Payment
+
+    if service_request.status == "paid":
+        return
+    _check_amount(data, int(Decimal(service_request.amount_due) * 100))
+
+    Payment.objects.get_or_create(
+        service_request=service_request,
+        reference=reference,
+        defaults={"method": "paystack", "is_confirmed": True},
+    )
+    service_request.status = "paid"
+    service_request.save(update_fields=["status"])
+
+    queue_email(
+        service_request.email,
+        f"Invoice for Service: {service_request.service.name}",
+        "<pre>"
+        f"Hello {service_request.name},\n\n"
+        f"Your payment of ₦{service_request.amount_due} for the service "
+        f"'{service_request.service.name}' has been confirmed.\n\n"
+        "Thank you for choosing our services!"
+        "</pre>",
+    )
+
+
+def apply_event(event):
+    """
+    Apply one charge.success event to whatever local record owns its
+    reference. Returns "processed", or "ignored" when nothing matches.
+    """
+    data = event.payload.get("data") or {}
+    if data.get("status") != "success":
+        return "ignored"
+
+    reference = event.reference
+
+    enrollment = Enrollment.objects.select_for_update().filter(payment_reference=reference).first()
+    if enrollment:
+        _apply_enrollment_fee(enrollment, data)
+        return "processed"
+
+    payment = (
+        CoursePayment.objects.select_for_update()
+        .select_related("enrollment", "course")
+        .filter(reference=reference)
+        .first()
+    )
+    if payment:
+        _apply_course_payment(payment, data)
+        return "processed"
+
+    # pay_service() tags the transaction with the request id
+    service_request_id = (data.get("metadata") or {}).get("service_request_id")
+    if service_request_id:
+        from services.models import ServiceRequest
+
+        service_request = (
+            ServiceRequest.objects.select_for_update()
+            .select_related("service")
+            .filter(pk=service_request_id)
+            .first()
+        )
+        if service_request:
+            _apply_service_payment(service_request, reference, data)
+            return "processed"
+
+    return "ignored"
+
+
+def apply_pending_events(batch_size=BATCH_SIZE):
+    """
+    Apply up to `batch_size` due events, each in its own transaction and
+    row lock, so several workers can run side by side. Failures are
+    retried with the outbox backoff. Returns (processed, failed) counts.
+    """
+    now = timezone.now()
+    ids = list(
+        PaymentEvent.objects.filter(status="pending", next_attempt_at__lte=now)
+        .order_by("id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+
+    processed = failed = 0
+    for event_id in ids:
+        with transaction.atomic():
+            event = PaymentEvent.objects.select_for_update(skip_locked=True).filter(pk=event_id, status="pending").first()
+            if event is None:
+                continue  # another worker got there first
+
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    event.status = apply_event(event)
+                event.processed_at = timezone.now()
+                event.last_error = ""
+                processed += 1
+            except PaymentMismatch as e:
+                logger.error(f"[PAYSTACK ❌] {event.reference}: {e}")
+                event.status = "failed"
+                event.last_error = str(e)
+                failed += 1
+            except Exception as e:
+                logger.error(f"[PAYSTACK ❌] {event.reference} (attempt {event.attempts}): {e}")
+                event.last_error = str(e)[:2000]
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = "failed"
+                else:
+                    event.next_attempt_at = now + retry_delay(event.attempts)
+                failed += 1
+
+            event.save(update_fields=["status", "attempts", "last_error", "processed_at", "next_attempt_at"])
+
+    if processed:
+        logger.info(f"[PAYSTACK ✅] Applied {processed} payment event(s)")
+    return processed, failed
@@ -0,0 +1,168 @@
+# main/utils/protected_media.py
+
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote
+
+import cloudinary.utils
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from main.utils.direct_upload import is_cloudinary
+
+# Hand a protected file (course materials) to the client once the view has
+# checked the user may have it, without the bytes going through Django:
+#
+# - Cloudinary storage: redirect to a signed download URL that expires
+#   after PROTECTED_MEDIA_URL_TTL seconds, so a shared link stops working.
+# - Local storage behind nginx (PROTECTED_MEDIA_SERVER = "nginx"):
+#   X-Accel-Redirect to an internal location serving MEDIA_ROOT, e.g.
+#       location /protected-media/ { internal; alias /path/to/media/; }
+# - Local storage behind Apache / lighttpd ("apache"): X-Sendfile with
+#   the file path (mod_xsendfile).
+# - Otherwise (runserver, tests): streamed from Python in chunks, with
+#   single Range requests answered so videos can seek.
+#
+# In the first three cases range requests, seeking and retries go to the
+# web server or CDN and never reach the entitlement check again.
+SERVER = getattr(settings, "PROTECTED_MEDIA_SERVER", "")
+ACCEL_PREFIX = getattr(settings, "PROTECTED_MEDIA_ACCEL_PREFIX", "/protected-media/")
+URL_TTL = getattr(settings, "PROTECTED_MEDIA_URL_TTL", 300)
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def delivery_for(storage):
+    """"signed", "accel", "sendfile" or "stream"."""
+    if is_cloudinary(storage):
+        return "signed"
+    return {"nginx": "accel", "apache": "sendfile"}.get(SERVER, "stream")
+
+
+def _content_type(name):
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+# -------------------------------
+# Cloudinary
+# -------------------------------
+def signed_url(file_field, as_attachment=True, ttl=URL_TTL):
+    """A private download URL for a Cloudinary-stored file, valid for `ttl` seconds."""
+    storage = file_field.storage
+    name = storage._prepend_prefix(file_field.name)
+    resource_type = storage._get_resource_type(name)
+    if resource_type == "raw":
+        # Raw public_ids keep their extension
+        public_id, extension = name, ""
+    else:
+        public_id, extension = os.path.splitext(name)
+    return cloudinary.utils.private_download_url(
+        public_id,
+        extension.lstrip("."),
+        resource_type=resource_type,
+        type="upload",
+        attachment=as_attachment,
+        expires_at=int(time.time()) + ttl,
+    )
+
+
+# -------------------------------
+# Local files
+# -------------------------------
+def _byte_range(header, size):
+    """
+    (start, end) for a single "bytes=" range, None to send the whole file
+    (no header, several ranges or a malformed one), ValueError if it
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _chunks(opened, start, length):
+    with opened:
+        opened.seek(start)
+        while length > 0:
+            data = opened.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def stream_response(request, file_field, as_attachment=True):
+    """The file from Python, honouring a single Range request."""
+    storage, name = file_field.storage, file_field.name
+    filename = os.path.basename(name)
+    size = storage.size(name)
+    try:
+        byte_range = _byte_range(request.headers.get("Range"), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(storage.open(name, "rb"), as_attachment=as_attachment, filename=filename)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _chunks(storage.open(name, "rb"), start, end - start + 1),
+            status=206,
+            content_type=_content_type(name),
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _offloaded_response(header, value, name, as_attachment):
+    # Empty body: the web server replaces it with the file
+    response = HttpResponse(content_type=_content_type(name))
+    response[header] = value
+    response["Content-Disposition"] = content_disposition_header(as_attachment, os.path.basename(name))
+    return response
+
+
+# -------------------------------
+# Entry point
+# -------------------------------
+def protected_file_response(request, file_field, as_attachment=True):
+    """
+    Response delivering `file_field` to a user the caller has already
+    authorised. Raises FileNotFoundError when a local file is missing.
+    """
+    storage, name = file_field.storage, file_field.name
+    delivery = delivery_for(storage)
+
+    if delivery == "signed":
+        # No existence check: it would be a request to Cloudinary on every download
+        return HttpResponseRedirect(signed_url(file_field, as_attachment))
+
+    if not name or not storage.exists(name):
+        raise FileNotFoundError(name)
+    if delivery == "accel":
+        return _offloaded_response("X-Accel-Redirect", ACCEL_PREFIX + quote(name), name, as_attachment)
+    if delivery == "sendfile":
+        return _offloaded_response("X-Sendfile", storage.path(name), name, as_attachment)
+    return stream_response(request, file_field, as_attachment)
@@ -0,0 +1,134 @@
+# main/utils/submission_zip.py
+
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from main.utils import http_client
+from main.utils.exports import ZipStream
+
+logger = logging.getLogger(__name__)
+
+# "Download all submissions" as one streamed zip.
+#
+# Files are fetched from storage by a bounded thread pool: at most
+# SUBMISSION_ZIP_WORKERS downloads are in flight, each spooled to a temp
+# file (in memory up to SUBMISSION_ZIP_SPOOL_BYTES, on disk beyond), and
+# written to the archive as soon as it arrives. Archive bytes are handed to
+# the response as they are produced, so memory stays flat whatever the
+# number or size of submissions.
+#
+# Remote files (Cloudinary) are streamed over the pooled HTTP client rather
+# than storage.open(), which reads the whole file into memory on a fresh
+# connection every time.
+WORKERS = getattr(settings, "SUBMISSION_ZIP_WORKERS", 8)
+SPOOL_BYTES = getattr(settings, "SUBMISSION_ZIP_SPOOL_BYTES", 1024 * 1024)
+COPY_CHUNK = 64 * 1024
+
+MISSING_FILE = "MISSING_FILES.txt"
+
+
+def entry_name(submission, by_assignment=False):
+    """<student>_<submitted_at><ext>, in an <assignment> folder when several are zipped."""
+    submitted_at = timezone.localtime(submission.submitted_at).strftime("%Y-%m-%d_%H%M%S")
+    extension = os.path.splitext(submission.file.name)[1]
+    name = get_valid_filename(f"{submission.student.username}_{submitted_at}{extension}")
+    if by_assignment:
+        folder = get_valid_filename(f"{submission.assignment_id}_{submission.assignment.title}")
+        name = f"{folder}/{name}"
+    return name
+
+
+def fetch(file_field):
+    """Copy a stored file to a spooled temp file, rewound; the caller closes it."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    storage = file_field.storage
+    try:
+        path = storage.path(file_field.name)
+    except NotImplementedError:
+        path = None
+
+    try:
+        if path:
+            with open(path, "rb") as source:
+                shutil.copyfileobj(source, spool, COPY_CHUNK)
+        else:
+            with http_client.get_url(storage.url(file_field.name), "storage GET file", stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(COPY_CHUNK):
+                    spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def submission_zip_chunks(submissions, workers=WORKERS):
+    """
+    Zip archive bytes for `submissions` (with assignment and student
+    selected), yielded as they are produced.
+    """
+    submissions = [submission for submission in submissions if submission.file]
+    by_assignment = len({submission.assignment_id for submission in submissions}) > 1
+
+    sink = ZipStream()
+    pending = iter(submissions)
+    missing = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        in_flight = {}
+
+        def submit_next():
+            submission = next(pending, None)
+            if submission is not None:
+                in_flight[pool.submit(fetch, submission.file)] = submission
+
+        for _ in range(workers):
+            submit_next()
+
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    submission = in_flight.pop(future)
+                    submit_next()
+                    name = entry_name(submission, by_assignment)
+                    try:
+                        spool = future.result()
+                    except Exception as e:
+                        logger.error(f"[SUBMISSIONS ZIP ❌] {submission.file.name}: {e}")
+                        missing.append(f"{name}: {e}")
+                        continue
+
+                    with spool, archive.open(name, "w", force_zip64=True) as entry:
+                        while True:
+                            chunk = spool.read(COPY_CHUNK)
+                            if not chunk:
+                                break
+                            entry.write(chunk)
+                            yield sink.drain()
+                    yield sink.drain()
+        finally:
+            # Client gone or a write failed: don't keep downloading for nobody
+            for future in in_flight:
+                future.cancel()
+
+        if missing:
+            archive.writestr(MISSING_FILE, "\n".join(missing) + "\n")
+    yield sink.drain()
+
+
+def submission_zip_response(submissions, filename):
+    response = StreamingHttpResponse(submission_zip_chunks(submissions), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{get_valid_filename(filename)}.zip"'
+    return response
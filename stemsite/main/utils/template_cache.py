@@ -0,0 +1,80 @@
+# main/utils/template_cache.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context, Template
+
+from main.models import EmailTemplate
+
+# Admin-defined EmailTemplates, compiled once per process and reused for
+# every recipient (no SELECT, no template parse per email).
+#
+# Compiled templates are keyed by (name, version). The version lives in the
+# shared cache and is bumped by main/signals.py whenever an EmailTemplate
+# is saved or deleted; any bump drops every compiled template, so renames
+# are covered too. Like the page cache, the version expires after
+# EMAIL_TEMPLATE_CACHE_TIMEOUT, so with a per-process (locmem) cache a
+# worker that missed a bump still recompiles within that window.
+EMAIL_TEMPLATE_CACHE_TIMEOUT = getattr(settings, "EMAIL_TEMPLATE_CACHE_TIMEOUT", 300)
+
+VERSION_KEY = "email_templates:version"
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+class CompiledEmailTemplate:
+    """Parsed subject and body of one EmailTemplate."""
+
+    def __init__(self, subject, body):
+        self.subject = subject
+        self.subject_template = Template(subject)
+        self.body_template = Template(body)
+
+    def render(self, context):
+        """Return (subject, body) rendered with `context` (a dict)."""
+        context = Context(context)
+        return self.subject_template.render(context), self.body_template.render(context)
+
+    def render_body(self, context):
+        return self.body_template.render(Context(context))
+
+
+def templates_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=EMAIL_TEMPLATE_CACHE_TIMEOUT)
+        version = cache.get(VERSION_KEY) or time.time_ns()
+    return version
+
+
+def invalidate_email_templates():
+    """Called from main/signals.py when an EmailTemplate is saved or deleted."""
+    cache.set(VERSION_KEY, time.time_ns(), timeout=EMAIL_TEMPLATE_CACHE_TIMEOUT)
+    with _lock:
+        _compiled.clear()
+
+
+def get_email_template(name):
+    """
+    The CompiledEmailTemplate called `name`, or None when there is no such
+    template (also cached, so a missing template costs no query either).
+    """
+    key = (name, templates_version())
+    try:
+        return _compiled[key]
+    except KeyError:
+        pass
+
+    row = EmailTemplate.objects.filter(name=name).values_list("subject", "body").first()
+    compiled = CompiledEmailTemplate(*row) if row else None
+
+    with _lock:
+        # Anything compiled under an older version is stale
+        for stale in [k for k in _compiled if k[1] != key[1]]:
+            del _compiled[stale]
+        _compiled[key] = compiled
+    return compiled
@@ -1,24 +1,25 @@
 import os
 import uuid
+import hashlib
 import random
 import string
-import requests
 
 from django.db.models import Q 
 
 from collections import defaultdict
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, HttpResponseRedirect, FileResponse
+from django.http import HttpResponse, HttpResponseRedirect, FileResponse, JsonResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.conf import settings
-from django.template import Template, Context
 #from django.core.mail import send_mail
 from main.forms import ContactForm
 from main.brevo_email import send_brevo_email
 
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 
@@ -29,12 +30,13 @@ from django.contrib.auth import login, logout, authenticate, update_session_auth
 from django.contrib.auth.forms import SetPasswordForm
 
 from .models import (
-    Enrollment, Course, CoursePayment, EmailTemplate, BankDetails, CoursePlan, StudentCourse, Profile,
+    Enrollment, Course, CoursePayment, BankDetails, CoursePlan, StudentCourse, Profile,
     Timetable, Assignment, AssignmentSubmission, AdminMessage, ParentTestimonial,
-     LiveSession, Complaint, IssueReport, AboutSection, ProgramIntro, Program 
+     LiveSession, Complaint, IssueReport, AboutSection, ProgramIntro, Program,
+    Material, Notification
 )
 
-from .models import Timetable, GlobalTimetable, Enrollment, Course
+from .models import Timetable, GlobalTimetable, Enrollment, Course, CourseAccess
 
 from .forms import (
     EnrollmentForm, PaymentProofForm, ContactForm, StudentRegisterForm, CustomUserChangeForm,
@@ -46,9 +48,16 @@ from django.contrib.auth import get_user_model
 from main.forms import EnrollmentForm
 
 #from .utils import email_notifications
-from main.utils.email_utils import send_payment_receipt
+from main.utils import dashboard_cache, entitlements, page_cache, paystack, http_client
+from main.utils.direct_upload import PURPOSES as UPLOAD_PURPOSES
+from main.utils.direct_upload import UploadError, issue_upload, receive_local_upload
+from main.utils.protected_media import protected_file_response
+from main.utils.paystack import ENROLLMENT_FEE_KOBO
+from main.utils.template_cache import get_email_template
 
 from chat.models import ChatMessage, ChatRoom
+from chat.utils import GUEST_COOKIE_NAME, student_room_name
+from services.models import ServiceRequest
 
 from . import utils  
 from main.utils import generate_secret_code
@@ -63,15 +72,48 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 # -------------- HOME VIEW --------------
-def home(request):
-    courses = Course.objects.all()
-    testimonials = ParentTestimonial.objects.all()
-    course_plans = CoursePlan.objects.all().order_by('class_type')
+def _home_content():
+    return {
+        'courses': list(Course.objects.all()),
+        'testimonials': list(ParentTestimonial.objects.all()),
+        'course_plans': list(CoursePlan.objects.all().order_by('class_type')),
+
+        # NEW: Dynamic About + Program content
+        'about': AboutSection.objects.first(),
+        'program_intro': ProgramIntro.objects.first(),
+        'programs': list(Program.objects.all().order_by('order')),
+    }
+
+
+def _home_is_cacheable(request):
+    # Anonymous GETs only, and never while a flash message is waiting
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
 
-    # NEW: Dynamic About + Program content
-    about = AboutSection.objects.first()
-    program_intro = ProgramIntro.objects.first()
-    programs = Program.objects.all().order_by('order')  
+def _home_etag(request):
+    if not _home_is_cacheable(request):
+        return None
+    # The page embeds a CSRF token tied to the visitor's cookie, and the
+    # chat widget's guest id once they have opened it
+    visitor = f"{request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')}:{request.COOKIES.get(GUEST_COOKIE_NAME, '')}"
+    return f"{page_cache.home_content_version()}-{hashlib.sha1(visitor.encode()).hexdigest()[:12]}"
+
+
+def _home_last_modified(request):
+    if not _home_is_cacheable(request):
+        return None
+    return page_cache.home_last_modified(page_cache.home_content_version())
+
+
+@condition(etag_func=_home_etag, last_modified_func=_home_last_modified)
+def home(request):
+    # Courses, testimonials, plans and programs come from the page cache;
+    # main/signals.py bumps its version whenever one of them is saved/deleted.
+    _, content = page_cache.get_home_content(_home_content)
 
     if request.method == "POST":
         form = ContactForm(request.POST)
@@ -91,11 +133,10 @@ def home(request):
             # -----------------------------
             # 2️⃣ Auto-reply email to user
             # -----------------------------
-            try:
-                template = EmailTemplate.objects.get(name="contact_auto_reply")
-                subject = Template(template.subject).render(Context(context))
-                message = Template(template.body).render(Context(context))
-            except EmailTemplate.DoesNotExist:
+            template = get_email_template("contact_auto_reply")
+            if template is not None:
+                subject, message = template.render(context)
+            else:
                 subject = f"Thank you for contacting us"
                 message = (
                     f"Hi {contact.name},\n\n"
@@ -149,23 +190,24 @@ def home(request):
     else:
         form = ContactForm()
 
-    return render(request, 'base.html', {
+    response = render(request, 'base.html', {
         'form': form,
-        'courses': courses,
-        'testimonials': testimonials,
-        'course_plans': course_plans,
-
-        # NEW CONTEXT VARIABLES
-        'about': about,
-        'program_intro': program_intro,
-        'programs': programs,
+        **content,
     })
+    if _home_is_cacheable(request):
+        # Let browsers keep the page but revalidate (cheap 304) on every visit
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
     
 # -------------- PORTAL VIEW --------------
 @login_required
 def portal(request):
     user = request.user
-    enrollment = Enrollment.objects.filter(user=user).order_by('-submitted_at').first()
+    # Shares the cached "access" section with the dashboard
+    enrollments = dashboard_cache.get_sections(user.id, {
+        "access": lambda: _dashboard_access(user),
+    })["access"]["enrollments"]
+    enrollment = max(enrollments, key=lambda e: e.submitted_at, default=None)
     enrollment_id = enrollment.id if enrollment else None
 
     context = {
@@ -250,7 +292,7 @@ def enroll_now(request):
                 email=enrollment_data.get("email", "").strip(),
                 program=enrollment_data.get("program", ""),
                 class_type=enrollment_data.get("class_type", ""),
-                course=enrollment_data.get("course", ""),
+                course=enrollment_data.get("course"),
                 skill_level=enrollment_data.get("skill_level", ""),
                 payment_reference=str(uuid.uuid4()),
                 is_enrollment_paid=False,
@@ -363,7 +405,7 @@ def enrolment_payment_request(request, enrollment_id):
         return redirect('secret_code_login_simple')
 
     # Amount (in kobo)
-    amount_kobo = 2500 * 100  
+    amount_kobo = ENROLLMENT_FEE_KOBO
 
     # Callback
     callback_url = request.build_absolute_uri(
@@ -385,11 +427,12 @@ def enrolment_payment_request(request, enrollment_id):
     print("🚀 Initializing Paystack with:", data)
 
     try:
-        response = requests.post(
-            "https://api.paystack.co/transaction/initialize",
+        response = http_client.post(
+            "paystack",
+            "/transaction/initialize",
+            endpoint="paystack.initialize",
             json=data,
             headers=headers,
-            timeout=10
         )
         print("PAYSTACK RAW RESPONSE:", response.text)  # 🔍 Debugging
         res_data = response.json()
@@ -413,6 +456,10 @@ def enrolment_payment_request(request, enrollment_id):
 # -------------- PAYSTACK CALLBACK/VERIFICATION FOR ENROLLMENT FEE --------------
 @csrf_exempt
 def enrolment_payment_verify(request, enrollment_id):
+    """
+    Browser redirect after checkout. Only reads local state: the payment
+    itself is confirmed by paystack_webhook and the payment worker.
+    """
     enrollment = get_object_or_404(Enrollment, id=enrollment_id)
     reference = request.GET.get("reference")
 
@@ -420,105 +467,48 @@ def enrolment_payment_verify(request, enrollment_id):
         messages.error(request, "No payment reference provided.")
         return redirect("enrolment_success", enrollment_id=enrollment.id)
 
-    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-    verify_url = f"https://api.paystack.co/transaction/verify/{reference}"
-
-    try:
-        response = requests.get(verify_url, headers=headers, timeout=10)
-        result = response.json()
-    except Exception:
-        messages.error(request, "Error verifying payment. Please try again.")
-        return redirect("enrolment_success", enrollment_id=enrollment.id)
-
-    # ✅ Payment success
-    if result.get("status") and result["data"]["status"] == "success":
-        # Mark enrollment as paid
-        enrollment.is_enrollment_paid = True
-        enrollment.payment_method = "Paystack"
-        enrollment.paid_at = timezone.now()
-
-        # Generate and save secret code
-        secret_code = generate_secret_code().strip().upper()
-        enrollment.secret_code = secret_code
-        enrollment.save()
-
-        # Link or create user if not already linked
-        if not enrollment.user:
-            username = generate_unique_username(enrollment.full_name, enrollment.id)
-            user = User.objects.create(
-                username=username,
-                email=enrollment.email,
-                first_name=enrollment.full_name.split()[0],
-                last_name=" ".join(enrollment.full_name.split()[1:]) or "",
-            )
-            user.set_unusable_password()
-            user.save()
-
-            enrollment.user = user
-            enrollment.save()
-
-        # -----------------------------
-        # 1️⃣ Send enrollment secret code email via Brevo HTTP API
-        # -----------------------------
-        secret_email_subject = "Enrollment Payment Successful"
-        secret_email_message = (
-            f"Dear {enrollment.full_name},\n\n"
-            f"Your enrollment payment for {enrollment.course} "
-            f"({enrollment.program}) has been successfully received.\n\n"
-            f"Here is your secret login code: {secret_code}\n\n"
-            "Keep it safe to log in and access your course.\n\n"
-            "- STEM CodeMaster Team"
-        )
-
-        try:
-            send_brevo_email(
-                to_email=enrollment.email,
-                subject=secret_email_subject,
-                html_content=f"<pre>{secret_email_message}</pre>"
-            )
-        except Exception as e:
-            logger.error(f"Failed to send secret code email: {e}")
-
-        # -----------------------------
-        # 2️⃣ Send payment receipt (Brevo-safe)
-        # -----------------------------
-        try:
-            send_payment_receipt(enrollment)
-        except Exception as e:
-            logger.error(f"Failed to send payment receipt: {e}")
-
-        # Success message
+    # ✅ Payment already confirmed
+    if enrollment.is_enrollment_paid:
         messages.success(
             request,
             "Enrollment fee payment successful! A secret login code has been sent to your email.",
         )
         return redirect("secret_code_login_simple")
 
-    # ❌ Payment failed
-    else:
-        messages.error(request, "Payment verification failed or was not successful.")
-        return redirect("enrolment_success", enrollment_id=enrollment.id)
+    # ⏳ Not confirmed yet (webhook still on its way)
+    messages.info(
+        request,
+        "Thanks! Your payment is being confirmed. Your secret login code will be emailed to you shortly.",
+    )
+    return redirect("enrolment_success", enrollment_id=enrollment.id)
 
 # --------------------------- BREAK ------------------------------------
 
 # -------------- BANK TRANSFER PROOF FOR ENROLMENT UPLOAD --------------
-def upload_bank_payment_proof(request, enrollment_id):
-    enrollment = get_object_or_404(Enrollment, id=enrollment_id)
-
+def enrollment_proof_denied(request, enrollment):
+    """Why this visitor may not upload proof for `enrollment`, or None if they may."""
     # ✅ Ensure ownership via authenticated user OR session fallback
     if request.user.is_authenticated:
         if enrollment.email != request.user.email:
-            messages.error(request, "This enrollment does not match your account.")
-            return redirect('enrolment_success', enrollment_id=enrollment.id)
+            return "This enrollment does not match your account."
     else:
         session_email = request.session.get("enrollment_email")
         if not session_email or enrollment.email != session_email:
-            messages.error(request, "You are not authorized to upload proof for this enrollment.")
-            return redirect("enrolment_success", enrollment_id=enrollment.id)
+            return "You are not authorized to upload proof for this enrollment."
+    return None
 
-    # ✅ Handle upload
-    if request.method == 'POST' and request.FILES.get('proof_of_payment'):
-        form = PaymentProofForm(request.POST, request.FILES, instance=enrollment)
+
+def upload_bank_payment_proof(request, enrollment_id):
+    enrollment = get_object_or_404(Enrollment, id=enrollment_id)
+
+    denied = enrollment_proof_denied(request, enrollment)
+    if denied:
+        messages.error(request, denied)
+        return redirect('enrolment_success', enrollment_id=enrollment.id)
+
+    # ✅ Handle upload: the file itself, or an upload_token for a direct upload
+    if request.method == 'POST' and (request.FILES.get('proof_of_payment') or request.POST.get('upload_token')):
+        form = PaymentProofForm(request.POST, request.FILES, instance=enrollment, upload_scope=enrollment.id)
         if form.is_valid():
             enrollment = form.save(commit=False)
             enrollment.payment_method = 'Bank Transfer'
@@ -552,7 +542,8 @@ We will verify the payment and send you your secret code shortly.
             )
             return redirect('secret_code_login_simple')
         else:
-            messages.error(request, "Invalid file. Please upload again.")
+            errors = form.errors.get('proof_of_payment')
+            messages.error(request, errors[0] if errors else "Invalid file. Please upload again.")
     else:
         messages.error(request, "Failed to upload proof. Please try again.")
 
@@ -608,7 +599,7 @@ def course_payment_page(request, enrollment_id):
 
     else:
         # For GET, pre-select the enrollment course
-        form = CoursePaymentForm(initial={"course": enrollment.course})
+        form = CoursePaymentForm(initial={"course": enrollment.course_id})
 
     return render(request, "payments/course_payment.html", {
         "form": form,
@@ -616,67 +607,6 @@ def course_payment_page(request, enrollment_id):
         "bank_details": bank_details,
     })
 
-#------Email Notification with Temporary Login Details--------
-def send_payment_receipt(payment):
-    enrollment = payment.enrollment
-
-    # ✅ Ensure enrollment is linked to a real user
-    if not enrollment.user:
-        # Generate a consistent username
-        username = generate_unique_username(enrollment.full_name, enrollment.id)
-
-        # Try to fetch existing user first
-        user = User.objects.filter(username=username).first()
-        if not user:
-            user = User.objects.create(
-                username=username,
-                email=enrollment.email,
-                first_name=enrollment.full_name.split()[0],
-                last_name=" ".join(enrollment.full_name.split()[1:]) if len(enrollment.full_name.split()) > 1 else "",
-                is_active=True
-            )
-
-        enrollment.user = user
-        enrollment.save()
-    else:
-        user = enrollment.user
-
-    # ✅ Generate secret code if missing (logic preserved)
-    if not enrollment.secret_code:
-        code = enrollment.generate_and_set_secret_code()
-        send_secret_code_email(enrollment, code)
-
-    # -----------------------------
-    # ✅ Send payment receipt email (Brevo HTTP API)
-    # -----------------------------
-    subject = "STEM CodeMaster - Payment Receipt"
-    body = f"""
-Dear {enrollment.full_name},
-
-This is to confirm receipt of your payment of ₦{payment.amount_paid} for the course: {payment.course.title}.
-
-Reference: {payment.reference}
-Payment Type: {payment.payment_type.upper()}
-Payment Method: {payment.payment_method.upper()}
-
-Your access has been granted. Use your secret login code to log in.
-
-Best regards,
-STEM CodeMaster Team
-"""
-
-    try:
-        send_brevo_email(
-            to_email=enrollment.email,
-            subject=subject,
-            html_content=f"<pre>{body}</pre>"
-        )
-    except Exception as e:
-        logger.error(
-            f"Failed to send payment receipt email to {enrollment.email}: {e}"
-        )
-
-
 #----payment_receipt_confirmation------
 @login_required
 def payment_receipt_confirmation(request, reference):
@@ -771,11 +701,12 @@ def course_payment_request(request, course_id):
                 }
 
                 try:
-                    response = requests.post(
-                        "https://api.paystack.co/transaction/initialize",
+                    response = http_client.post(
+                        "paystack",
+                        "/transaction/initialize",
+                        endpoint="paystack.initialize",
                         json=data,
                         headers=headers,
-                        timeout=10,
                     )
                     res_data = response.json()
                     if res_data.get("status") and "authorization_url" in res_data["data"]:
@@ -805,37 +736,100 @@ def course_payment_request(request, course_id):
 # ====================================
 @login_required
 def course_payment_verify(request, reference):
-    payment = CoursePayment.objects.filter(reference=reference).first()
+    """Browser redirect after checkout; reads local state only (see paystack_webhook)."""
+    payment = CoursePayment.objects.filter(reference=reference).only("is_verified").first()
     if not payment:
         messages.error(request, "Invalid or unknown payment reference.")
         return redirect('profile_view')
 
-    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-    verify_url = f"https://api.paystack.co/transaction/verify/{reference}"
+    if payment.is_verified:
+        messages.success(request, "Course payment verified successfully! Receipt sent to your email.")
+    else:
+        messages.info(request, "Thanks! Your payment is being confirmed. Your receipt will be emailed to you shortly.")
+    return redirect('profile_view')
+
+
+# ====================================
+#  PAYSTACK WEBHOOK
+# ====================================
+@csrf_exempt
+@require_POST
+def paystack_webhook(request):
+    """
+    Paystack server-to-server notification. Verifies x-paystack-signature,
+    records the event once per reference and answers immediately; the
+    payment worker (`manage.py process_payment_events`) applies it.
+    """
+    if not paystack.verify_signature(request.body, request.headers.get("x-paystack-signature")):
+        logger.warning("[PAYSTACK ⚠️] Webhook with a bad signature rejected")
+        return HttpResponse(status=400)
 
     try:
-        response = requests.get(verify_url, headers=headers, timeout=10)
-        result = response.json()
-    except Exception:
-        messages.error(request, "Network error verifying payment. Try again later.")
-        return redirect('profile_view')
+        paystack.record_event(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
 
-    if result.get("status") and result["data"]["status"] == "success":
-        if not payment.is_verified:
-            payment.is_verified = True
-            payment.save()
+    return HttpResponse(status=200)
 
-            # ✅ Update enrollment or send receipt
-            try:
-                send_payment_receipt(payment)
-            except Exception:
-                messages.warning(request, "Payment verified but receipt email failed. Contact admin.")
 
-        messages.success(request, "Course payment verified successfully! Receipt sent to your email.")
-        return redirect('profile_view')
-    else:
-        messages.error(request, "Payment verification failed or not successful.")
-        return redirect('profile_view')
+# ====================================
+#  UPSTREAM HTTP METRICS (staff)
+# ====================================
+@staff_member_required
+def http_client_metrics(request):
+    """Brevo/Paystack call counts and latency histograms of this worker process."""
+    return JsonResponse({"pid": os.getpid(), "endpoints": http_client.metrics_snapshot()})
+
+
+# ====================================
+#  DIRECT UPLOADS (main/utils/direct_upload.py)
+# ====================================
+def direct_upload_scope(request, purpose, object_id):
+    """What the visitor may upload to for `purpose` (the token scope), or None."""
+    if purpose == "submission":
+        # Same rule as submit_assignment
+        if request.user.is_authenticated and \
+                Assignment.objects.filter(pk=object_id, recipients=request.user).exists():
+            return f"{request.user.pk}:{object_id}"
+    elif purpose == "enrollment_proof":
+        enrollment = Enrollment.objects.filter(pk=object_id).first()
+        if enrollment and not enrollment_proof_denied(request, enrollment):
+            return enrollment.pk
+    elif purpose == "service_payment_proof":
+        if ServiceRequest.objects.filter(pk=object_id, status="approved").exists():
+            return object_id
+    elif purpose == "material":
+        if request.user.is_active and request.user.is_staff:
+            return "staff"
+    return None
+
+
+@require_POST
+def direct_upload_sign(request):
+    """Step 1: a signed, short-lived upload straight to storage."""
+    purpose = request.POST.get("purpose")
+    object_id = request.POST.get("object_id", "")
+    if purpose not in UPLOAD_PURPOSES or (purpose != "material" and not object_id.isdigit()):
+        return JsonResponse({"error": "Unknown upload."}, status=400)
+
+    scope = direct_upload_scope(request, purpose, object_id)
+    if scope is None:
+        return JsonResponse({"error": "You cannot upload here."}, status=403)
+    return JsonResponse(issue_upload(purpose, scope, request.POST.get("filename", "")))
+
+
+@csrf_exempt  # authorised by the signed token, like a Cloudinary upload
+@require_POST
+def direct_upload_local(request):
+    """Step 2 without Cloudinary: local stand-in for the storage upload endpoint."""
+    uploaded = request.FILES.get("file")
+    if not uploaded:
+        return JsonResponse({"error": "No file."}, status=400)
+    try:
+        key = receive_local_upload(request.POST.get("token", ""), uploaded)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"public_id": key})
 
 
 #-------------------------3RD PART END HERE----------------------------
@@ -1040,7 +1034,7 @@ def send_payment_receipt(enrollment):
     message = (
         f"Dear {enrollment.full_name},\n\n"
         f"Your payment for enrollment in "
-        f"{enrollment.course if isinstance(enrollment.course, str) else enrollment.course.title()} "
+        f"{enrollment.course.title} "
         f"has been successfully received.\n\n"
         f"Thank you for enrolling in the {enrollment.program} program at STEM CodeMaster!\n\n"
         "-- STEM CodeMaster Team"
@@ -1073,19 +1067,114 @@ def custom_logout(request):
 
 #---------------------Profile View---------------------
 User = get_user_model()
+
+# Dashboard sections are capped so the page costs the same number of
+# queries (and roughly the same time) however much history a student has.
+DASHBOARD_MATERIALS_LIMIT = 50
+DASHBOARD_ASSIGNMENTS_LIMIT = 50
+DASHBOARD_LIVE_SESSIONS_LIMIT = 20
+DASHBOARD_SCHEDULE_LIMIT = 50
+DASHBOARD_CHAT_LIMIT = 50
+DASHBOARD_ADMIN_MESSAGES_LIMIT = 20
+DASHBOARD_NOTIFICATIONS_LIMIT = 20
+DASHBOARD_COMPLAINTS_LIMIT = 20
+
+
+# ------------------ Dashboard sections (cached per student) ------------------
+# Each builder returns plain lists/dicts so the result can be pickled into
+# the cache; see main/utils/dashboard_cache.py and the invalidation
+# receivers in main/signals.py.
+def _enrolled_courses(user):
+    # Course ids as a subquery (course__in=...), never evaluated on its own
+    return Enrollment.objects.filter(user=user).values("course_id")
+
+
+def _dashboard_access(user):
+    profile, _ = Profile.objects.select_related("instructor").get_or_create(user=user)
+    enrollments = list(Enrollment.objects.filter(user=user).select_related("course").order_by("id"))
+    return {"profile": profile, "enrollments": enrollments}
+
+
+def _dashboard_materials(user):
+    # Direct recipients are matched through an id subquery instead of a join,
+    # so no row is duplicated and no DISTINCT is needed.
+    return list(
+        Material.objects.filter(
+            Q(course__in=_enrolled_courses(user)) | Q(pk__in=user.received_materials.values("pk"))
+        ).select_related("course").order_by("-uploaded_at")[:DASHBOARD_MATERIALS_LIMIT]
+    )
+
+
+def _dashboard_assignments(user):
+    assignments = list(
+        Assignment.objects.filter(
+            Q(course__in=_enrolled_courses(user)) | Q(pk__in=user.assignments.values("pk"))
+        ).select_related("course").order_by("-due_date")[:DASHBOARD_ASSIGNMENTS_LIMIT]
+    )
+    # Only the submissions for the assignments on the page
+    submissions = list(
+        AssignmentSubmission.objects.filter(
+            student=user, assignment_id__in=[a.id for a in assignments]
+        )
+    )
+    return {"assignments": assignments, "submissions": submissions}
+
+
+def _dashboard_live_sessions(user):
+    # Sessions that are not over yet, soonest first, so the limit only ever
+    # cuts the furthest ones (sessions without an end time count until midnight)
+    now = timezone.now()
+    today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return list(
+        LiveSession.objects.filter(
+            Q(course__in=_enrolled_courses(user)) | Q(pk__in=user.livesession_set.values("pk"))
+        ).filter(
+            Q(end_time__gte=now) | Q(end_time__isnull=True, start_time__gte=today)
+        ).select_related("course").order_by('start_time')[:DASHBOARD_LIVE_SESSIONS_LIMIT]
+    )
+
+
+def _dashboard_schedule(user):
+    # From today on, for the same reason
+    today = timezone.localdate()
+    timetable = list(
+        Timetable.objects.filter(student=user, date__gte=today)
+        .order_by('date', 'start_time')[:DASHBOARD_SCHEDULE_LIMIT]
+    )
+    schedule = list(
+        GlobalTimetable.objects.filter(course__in=_enrolled_courses(user), date__gte=today)
+        .select_related("course")
+        .order_by('date', 'start_time')[:DASHBOARD_SCHEDULE_LIMIT]
+    )
+    return {"timetable": timetable, "schedule": schedule}
+
+
+def _dashboard_admin_messages(user):
+    return list(
+        AdminMessage.objects.filter(student=user, is_archived=False)
+        .order_by("-created_at")[:DASHBOARD_ADMIN_MESSAGES_LIMIT]
+    )
+
+
+def _dashboard_complaints(user):
+    return list(
+        Complaint.objects.filter(user=user).order_by("-created_at")[:DASHBOARD_COMPLAINTS_LIMIT]
+    )
+
+
 @login_required
 def profile_view(request):
     user = request.user
-    profile, _ = Profile.objects.get_or_create(user=user)
     complaint_form = ComplaintForm()
 
-    # ------------------ Student Enrollments ------------------
-    student_enrollments = Enrollment.objects.filter(user=user)
-    enrollment = student_enrollments.first()  # Single enrollment
-    
-    enrolled_course_titles = student_enrollments.values_list('course', flat=True)
+    # ------------------ Enrollment, profile and payment ------------------
+    access = dashboard_cache.get_sections(user.id, {
+        "access": lambda: _dashboard_access(user),
+    })["access"]
+    profile = access["profile"]
+    student_enrollments = access["enrollments"]
+    enrollment = student_enrollments[0] if student_enrollments else None  # Single enrollment
 
-    enrolled_courses = Course.objects.filter(title__in=enrolled_course_titles)
     # ------------------ Enrollment existence check ------------------
     if not enrollment and not user.is_staff:
         messages.error(request, "Enrollment record not found. Please enroll first.")
@@ -1094,13 +1183,10 @@ def profile_view(request):
 
     # ------------------ Payment verification check ------------------
     if enrollment and not user.is_staff:
-        verified_payment = CoursePayment.objects.filter(
-            enrollment=enrollment,
-            is_verified=True
-        ).first()
+        access_status = entitlements.access_status(user, enrollment.course_id)
 
     # Redirect if payment not verified
-        if not verified_payment and not enrollment.is_course_activated:
+        if access_status not in (CourseAccess.ACTIVE, CourseAccess.BLOCKED):
             messages.warning(
                 request,
                 "Access denied: Please complete your course payment or wait for admin confirmation if you have paid."
@@ -1109,7 +1195,7 @@ def profile_view(request):
             return redirect(payment_url)
 
     # Redirect if dashboard is blocked
-        if verified_payment and verified_payment.dashboard_blocked:
+        if access_status == CourseAccess.BLOCKED:
             messages.error(
                 request,
                 "⚠️ Your dashboard access is currently blocked. Please complete or renew your payment."
@@ -1117,41 +1203,38 @@ def profile_view(request):
             return redirect("portal")
 
     # ------------------ Student-Specific Content ------------------
-    materials = Material.objects.filter(
-        Q(course__in=enrolled_courses) | Q(recipients=user)
-    ).distinct().order_by("-uploaded_at")
-
-    assignments = Assignment.objects.filter(
-        Q(course__in=enrolled_courses) | Q(recipients=user)
-    ).order_by("-due_date")
+    sections = dashboard_cache.get_sections(user.id, {
+        "materials": lambda: _dashboard_materials(user),
+        "assignments": lambda: _dashboard_assignments(user),
+        "live_sessions": lambda: _dashboard_live_sessions(user),
+        "schedule": lambda: _dashboard_schedule(user),
+        "admin_messages": lambda: _dashboard_admin_messages(user),
+        "complaints": lambda: _dashboard_complaints(user),
+    })
 
-    submissions = AssignmentSubmission.objects.filter(student=user)
-    submission_map = {sub.assignment.id: sub for sub in submissions} if submissions else {}
+    submissions = sections["assignments"]["submissions"]
+    submission_map = {sub.assignment_id: sub for sub in submissions}
 
     assigned_instructor = getattr(profile, "instructor", None)
 
-    # Chat messages
-    room_name = f"student_{user.username}_admin"
-    room, _ = ChatRoom.objects.get_or_create(name=room_name)
-    chat_messages = room.messages.all().order_by('timestamp')
-
-    # Timetables
-    timetable = Timetable.objects.filter(student=user).order_by('date', 'start_time')
-    schedule = GlobalTimetable.objects.filter(course__in=enrolled_courses).order_by('date', 'start_time')
-
-    # Admin messages
-    admin_messages = AdminMessage.objects.filter(student=user, is_archived=False).order_by("-created_at")
+    # Chat messages: latest page only, oldest first for display.
+    # The room itself is created by the chat consumer on first use.
+    room_name = student_room_name(user.username)
+    chat_messages = list(
+        ChatMessage.objects.filter(room__name=room_name)
+        .select_related("sender")
+        .order_by("-timestamp")[:DASHBOARD_CHAT_LIMIT]
+    )
+    chat_messages.reverse()
 
-    # Live sessions
     now = timezone.now()
-    live_sessions = LiveSession.objects.filter(
-        Q(course__in=enrolled_courses) | Q(students=user)
-    ).distinct().order_by('start_time')
 
-    # Payments, Complaints, Notifications
-    course_payments = CoursePayment.objects.filter(enrollment__user=user)
-    complaints = Complaint.objects.filter(user=user).order_by("-created_at")
-    notification_list = messages.get_messages(request)
+    # Payments, Notifications (notifications change too often to cache)
+    course_payments = CoursePayment.objects.filter(enrollment__user=user).select_related("course")
+    notification_list = list(
+        Notification.objects.filter(student=user, is_read=False)
+        .order_by("-created_at")[:DASHBOARD_NOTIFICATIONS_LIMIT]
+    )
 
     # ------------------ Render ------------------
     return render(request, "portal/profile.html", {
@@ -1159,17 +1242,17 @@ def profile_view(request):
         "instructors": [assigned_instructor] if assigned_instructor else [],
         "enrollment_id": enrollment.id if enrollment else None,
         "enrolled_courses": student_enrollments,
-        "materials": materials,
-        "assignments": assignments,
+        "materials": sections["materials"],
+        "assignments": sections["assignments"]["assignments"],
         "submissions": submissions,
         "submission_map": submission_map,
         "complaint_form": complaint_form,
-        "complaints": complaints,
+        "complaints": sections["complaints"],
         "chat_messages": chat_messages,
-        "timetable": timetable,
-        "schedule": schedule,
-        "admin_messages": admin_messages,
-        "live_sessions": live_sessions,
+        "timetable": sections["schedule"]["timetable"],
+        "schedule": sections["schedule"]["schedule"],
+        "admin_messages": sections["admin_messages"],
+        "live_sessions": sections["live_sessions"],
         "course_payments": course_payments,
         "notifications": notification_list,
         "now": now,
@@ -1307,51 +1390,48 @@ Complaint:
     )
 
 #-----------------Student Dashboard View-------------------------
-@login_required
-def student_profile(request):
-    student = request.user
-    submissions = AssignmentSubmission.objects.filter(student=student)
-    enrolled_courses = StudentCourse.objects.filter(student=student)
-
-    # grouped_course_materials - unchanged
-    grouped_course_materials = {}
-    for sc in enrolled_courses:
-        materials = CourseMaterial.objects.filter(course=sc.course).order_by('-uploaded_at')
-        grouped = defaultdict(list)
-        for mat in materials:
-            week = mat.uploaded_at.strftime("Week %W - %Y")
-            grouped[week].append(mat)
-        grouped_course_materials[sc.course.title] = dict(grouped)
-
-    timetable = Timetable.objects.filter(student=student).order_by('day', 'start_time')
-    admin_messages = AdminMessage.objects.filter(student=student, is_archived=False).order_by('-created_at')
-    assignments = Assignment.objects.filter(course__in=[sc.course for sc in enrolled_courses])
-    live_sessions = LiveSession.objects.filter(course__in=[sc.course for sc in enrolled_courses])
-    course_payments = CoursePayment.objects.filter(enrollment__user=student)
-    complaints = Complaint.objects.filter(user=student)
+def _student_profile_sections(student):
+    submissions = list(AssignmentSubmission.objects.filter(student=student))
+    enrolled_courses = list(StudentCourse.objects.filter(student=student).select_related("course"))
+    courses = [sc.course for sc in enrolled_courses]
+
+    # grouped_course_materials, loaded with one query for all courses
+    grouped_course_materials = {sc.course.title: defaultdict(list) for sc in enrolled_courses}
+    for mat in Material.objects.filter(course__in=courses).select_related("course").order_by('-uploaded_at'):
+        week = mat.uploaded_at.strftime("Week %W - %Y")
+        grouped_course_materials[mat.course.title][week].append(mat)
+    grouped_course_materials = {title: dict(grouped) for title, grouped in grouped_course_materials.items()}
 
     # build submission_map: assignment.id -> AssignmentSubmission instance (latest)
     submission_map = {}
     for sub in submissions:
         submission_map[sub.assignment_id] = sub
 
-    # also recent notifications
-    notifications = Notification.objects.filter(student=student, is_read=False)[:20]
-
-    context = {
+    return {
         'enrolled_courses': enrolled_courses,
         'grouped_course_materials': grouped_course_materials,
-        'timetable': timetable,
-        'admin_messages': admin_messages,
-        'assignments': assignments,
-        'live_sessions': live_sessions,
-        'course_payments': course_payments,
-        'complaints': complaints,
+        'timetable': list(Timetable.objects.filter(student=student).order_by('date', 'start_time')),
+        'admin_messages': list(AdminMessage.objects.filter(student=student, is_archived=False).order_by('-created_at')),
+        'assignments': list(Assignment.objects.filter(course__in=courses).select_related("course")),
+        'live_sessions': list(LiveSession.objects.filter(course__in=courses).select_related("course")),
+        'course_payments': list(CoursePayment.objects.filter(enrollment__user=student).select_related("course")),
+        'complaints': list(Complaint.objects.filter(user=student)),
         'submissions': submissions,
         'submission_map': submission_map,
-        'notifications': notifications,
-        'now': timezone.now(),
     }
+
+
+@login_required
+def student_profile(request):
+    student = request.user
+    sections = dashboard_cache.get_sections(student.id, {
+        "student_profile": lambda: _student_profile_sections(student),
+    })
+    context = dict(sections["student_profile"])
+
+    # also recent notifications (not cached, they change on every broadcast)
+    context['notifications'] = list(Notification.objects.filter(student=student, is_read=False)[:20])
+    context['now'] = timezone.now()
     return render(request, 'main/profile.html', context)
 
 
@@ -1524,7 +1604,10 @@ def submit_assignment(request, pk):
     assignment = get_object_or_404(Assignment, pk=pk, recipients=request.user)
 
     if request.method == 'POST':
-        form = AssignmentSubmissionForm(request.POST, request.FILES)
+        # The file, or an upload_token for a direct upload signed for this assignment
+        form = AssignmentSubmissionForm(
+            request.POST, request.FILES, upload_scope=f"{request.user.pk}:{assignment.pk}"
+        )
         if form.is_valid():
             submission = form.save(commit=False)
             submission.assignment = assignment
@@ -1599,14 +1682,11 @@ def student_dashboard(request):
     # All enrollments of this student
     enrolled_courses = Enrollment.objects.filter(user=user)
 
-    # Extract the course titles (strings)
-    enrolled_course_titles = enrolled_courses.values_list('course', flat=True)
-
     now = timezone.now()
 
-    # Match live sessions using course title
+    # Match live sessions on the enrolled course ids
     live_sessions = LiveSession.objects.filter(
-        Q(course__title__in=enrolled_course_titles) | Q(students=user),
+        Q(course__in=enrolled_courses.values('course_id')) | Q(students=user),
         Q(start_time__gte=now) | Q(end_time__gte=now)
     ).distinct().order_by('start_time')
 
@@ -1622,7 +1702,7 @@ def student_dashboard(request):
 @login_required
 def student_dashboard(request):
     user = request.user
-    enrollments = Enrollment.objects.filter(user=user).select_related('course', 'instructor')
+    enrollments = Enrollment.objects.filter(user=user).select_related('course')
 
     context = {
         'enrollments': enrollments,
@@ -1634,21 +1714,26 @@ def student_dashboard(request):
 @login_required
 def download_material(request, material_id):
     material = get_object_or_404(Material, id=material_id)
-    enrollment = Enrollment.objects.filter(email=request.user.email, course=material.course).first()
+    access_status = entitlements.access_status(request.user, material.course_id)
 
     # ❌ Block if no enrollment
-    if not enrollment:
+    if access_status is None:
         messages.error(request, "You are not enrolled in this course.")
         return redirect('profile_view')
 
+    # ❌ Block if the dashboard is blocked
+    if access_status == CourseAccess.BLOCKED:
+        messages.error(request, "⚠️ Your dashboard access is currently blocked. Please complete or renew your payment.")
+        return redirect('profile_view')
+
     # ❌ Block if payment not verified
-    if not CoursePayment.objects.filter(enrollment=enrollment, course=material.course, is_verified=True).exists():
+    if access_status != CourseAccess.ACTIVE:
         messages.warning(request, "Your payment has not been verified. You will gain access after confirmation.")
         return redirect('profile_view')
 
-    # ✅ Serve the file
-    if material.file and os.path.exists(material.file.path):
-        return FileResponse(open(material.file.path, 'rb'), as_attachment=True)
-    else:
+    # ✅ Hand the file over: signed Cloudinary URL, web server, or streamed (main/utils/protected_media.py)
+    try:
+        return protected_file_response(request, material.file)
+    except FileNotFoundError:
         messages.error(request, "File not found.")
         return redirect('profile_view')
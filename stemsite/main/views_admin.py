@@ -2,34 +2,38 @@
 from django.shortcuts import render, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.contrib.contenttypes.models import ContentType
+from django.contrib.auth import get_user_model
 #from django.core.mail import send_mail
-from django.conf import settings
-from django.utils.html import strip_tags
+from django.template.loader import render_to_string
 
 from .forms import AdminBroadcastForm
-from .models import Notification, StudentCourse, Material, Assignment, LiveSession, Course
+from .models import Material, Assignment, LiveSession, Course
+from main.utils.email_outbox import build_email, queue_emails
+from main.utils.notifications import fan_out_notifications
+
+User = get_user_model()
 
 
 def get_students_from_selection(course=None, students=None):
+    """Return a User queryset for the broadcast target (resolved in one query)."""
     if students:
-        return students
+        return User.objects.filter(pk__in=[s.pk for s in students])
     if course:
-        sc = StudentCourse.objects.filter(course=course)
-        return [s.student for s in sc]
-    return []
+        return User.objects.filter(studentcourse__course=course)
+    return User.objects.none()
 
 @staff_member_required
 def admin_broadcast_center(request):
     if request.method == 'POST':
         form = AdminBroadcastForm(request.POST)
         if form.is_valid():
-            broadcast_type = form.cleaned_data['broadcast_type']
-            course = form.cleaned_data['course']
-            students = form.cleaned_data['students']
-            title = form.cleaned_data['title']
-            message = form.cleaned_data['message']
-            related_object = form.cleaned_data['related_object']
+            data = form.cleaned_data
+            broadcast_type = data.get('broadcast_type') or 'message'
+            course = data.get('course')
+            students = data.get('students')
+            title = data['title']
+            message = data.get('message') or data.get('content') or ''
+            related_object = data.get('related_object')
 
             # determine object if selected
             obj = None
@@ -37,7 +41,7 @@ def admin_broadcast_center(request):
                 model_name, obj_id = related_object.split(':')
                 model_map = {
                     'assignment': Assignment,
-                    'material': CourseMaterial,
+                    'material': Material,
                     'live': LiveSession,
                 }
                 model_class = model_map.get(model_name)
@@ -45,33 +49,25 @@ def admin_broadcast_center(request):
                     obj = model_class.objects.filter(id=obj_id).first()
 
             target_students = get_students_from_selection(course, students)
-            total_sent = 0
-
-            for user in target_students:
-                Notification.objects.create(
-                    student=user,
-                    notif_type=broadcast_type,
-                    title=title,
-                    message=message,
-                    obj_content_type=ContentType.objects.get_for_model(obj) if obj else None,
-                    obj_id=obj.id if obj else None
-                )
 
-                # Send Email
-                try:
-                    send_email_async(
-                        subject=title,
-                        message=strip_tags(message),
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient=[user.email],
-                        fail_silently=True,
-                    )
-                except Exception as e:
-                    print("Email send error:", e)
+            counts = fan_out_notifications(
+                target_students,
+                notif_type=broadcast_type,
+                title=title,
+                message=message,
+                obj=obj,
+            )
 
-                total_sent += 1
+            # Same body for everyone: render once, queue one row per recipient
+            html_content = render_to_string(
+                "emails/broadcast_email.html", {"title": title, "content": message}
+            )
+            queue_emails(
+                build_email(email, title, html_content)
+                for email in target_students.exclude(email="").values_list("email", flat=True).distinct()
+            )
 
-            messages.success(request, f"✅ Broadcast sent to {total_sent} student(s).")
+            messages.success(request, f"✅ Broadcast sent to {counts['recipients']} student(s).")
             return redirect('admin_broadcast_center')
     else:
         form = AdminBroadcastForm()
@@ -81,4 +77,3 @@ def admin_broadcast_center(request):
         'form': form,
     }
     return render(request, 'admin/broadcast_center.html', context)
-
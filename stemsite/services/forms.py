@@ -1,6 +1,7 @@
 from django import forms
 from .models import ServiceRequest
 from .models import Payment
+from main.forms import DirectUploadModelForm
 class ServiceRequestForm(forms.ModelForm):
     class Meta:
         model = ServiceRequest
@@ -15,7 +16,10 @@ class ServiceRequestForm(forms.ModelForm):
 
 
 # services/forms.py
-class PaymentForm(forms.ModelForm):
+class PaymentForm(DirectUploadModelForm):
+    upload_purpose = "service_payment_proof"
+    upload_field = "proof"
+
     class Meta:
         model = Payment
         fields = ["proof"]
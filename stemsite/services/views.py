@@ -1,7 +1,10 @@
 # services/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
-import requests
+from django.contrib import messages
+
+from main.models import PaymentEvent
+from main.utils import http_client
 
 from .models import Service, Testimonial, ServiceRequest, BankDetail, Payment
 from .forms import ServiceRequestForm, PaymentForm
@@ -70,13 +73,18 @@ def pay_service(request, service_request_id):
         "metadata": {"service_request_id": service_request.id},
     }
 
-    response = requests.post(
-        "https://api.paystack.co/transaction/initialize",
-        json=data,
-        headers=headers,
-    )
+    try:
+        response = http_client.post(
+            "paystack",
+            "/transaction/initialize",
+            endpoint="paystack.initialize",
+            json=data,
+            headers=headers,
+        )
+        res = response.json()
+    except Exception:
+        return redirect("our_services")
 
-    res = response.json()
     if res.get("status"):
         return redirect(res["data"]["authorization_url"])
 
@@ -84,45 +92,35 @@ def pay_service(request, service_request_id):
 
 
 def paystack_callback(request, service_request_id):
-    """Handle Paystack callback verification."""
+    """
+    Browser redirect after checkout. The payment is confirmed (and the
+    invoice emailed) by main.views.paystack_webhook and the payment worker,
+    so this only reads local state. Paystack appends a reference to
+    cancelled and failed checkouts too, so its presence proves nothing.
+    """
     service_request = get_object_or_404(ServiceRequest, id=service_request_id)
     reference = request.GET.get("reference")
 
-    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-
-    res = requests.get(
-        f"https://api.paystack.co/transaction/verify/{reference}",
-        headers=headers,
-    ).json()
-
-    if res.get("status") and res["data"]["status"] == "success":
-        # Mark payment as completed
-        Payment.objects.create(
-            service_request=service_request,
-            method="paystack",
-            reference=reference,
-            is_confirmed=True,
-        )
-        service_request.status = "paid"
-        service_request.save()
-
-        # Send invoice after payment via Brevo
-        subject = f"Invoice for Service: {service_request.service.name}"
-        plain_text = (
-            f"Hello {service_request.name},\n\n"
-            f"Your payment of ₦{service_request.amount_due} for the service "
-            f"'{service_request.service.name}' has been confirmed.\n\n"
-            "Thank you for choosing our services!"
-        )
-
-        send_brevo_email(
-            to_email=service_request.email,
-            subject=subject,
-            plain_text=plain_text
-        )
+    if not reference:
+        messages.error(request, "No payment reference provided.")
+        return redirect("our_services")
 
+    # ✅ Payment already confirmed
+    if service_request.status == "paid":
         return redirect("services_thank_you")
 
+    # ⏳ Charge received by the webhook, the worker has yet to apply it
+    if PaymentEvent.objects.filter(reference=reference, status="pending").exists():
+        return render(request, "services/payment_confirming.html", {"service_request": service_request})
+
+    # ❌ Cancelled, failed or not (yet) reported by Paystack
+    messages.error(
+        request,
+        "We could not confirm this payment. If you were charged, your invoice will be emailed "
+        "once the payment is confirmed; otherwise please try again.",
+    )
+    if service_request.status == "approved":
+        return redirect("payment_page", service_request_id=service_request.id)
     return redirect("our_services")
 
 
@@ -132,7 +130,8 @@ def payment_page(request, service_request_id):
     bank_details = BankDetail.objects.filter(is_active=True)
 
     if request.method == "POST":
-        form = PaymentForm(request.POST, request.FILES)
+        # upload_scope: a direct upload must have been signed for this request
+        form = PaymentForm(request.POST, request.FILES, upload_scope=service_request.id)
         method = request.POST.get("method")
 
         if method == "bank":
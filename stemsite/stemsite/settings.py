@@ -154,6 +154,11 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Chat write-behind: broadcast first, save ChatMessage rows in batches
+CHAT_WRITE_BEHIND = env.bool("CHAT_WRITE_BEHIND", default=False)
+CHAT_WRITE_BEHIND_INTERVAL_MS = env.int("CHAT_WRITE_BEHIND_INTERVAL_MS", default=200)
+CHAT_WRITE_BEHIND_BATCH_SIZE = env.int("CHAT_WRITE_BEHIND_BATCH_SIZE", default=100)
+
 # -----------------------------
 # Database - PostgreSQL only
 # -----------------------------
@@ -168,6 +173,24 @@ DATABASES = {
 }
 
 
+# -----------------------------
+# Cache (student dashboard sections, public home page)
+# -----------------------------
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a file or
+# Redis cache to share entries (and invalidations) between worker processes.
+CACHE_BACKEND = env("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": env("CACHE_LOCATION", default="stemsite-cache"),
+    }
+}
+if "locmem" in CACHE_BACKEND or "filebased" in CACHE_BACKEND:
+    # Default of 300 entries is only a handful of students' dashboards
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": env.int("CACHE_MAX_ENTRIES", default=10000)}
+DASHBOARD_CACHE_TIMEOUT = env.int("DASHBOARD_CACHE_TIMEOUT", default=120)
+PUBLIC_PAGE_CACHE_TIMEOUT = env.int("PUBLIC_PAGE_CACHE_TIMEOUT", default=300)
+
 
 # Authentication
 LOGIN_URL = 'login'
@@ -228,6 +251,13 @@ STORAGES = {
 
 MEDIA_URL = "/"
 
+# Protected media (main/utils/protected_media.py): local files are handed to
+# the web server ("nginx": X-Accel-Redirect, "apache": X-Sendfile) or, when
+# unset, streamed by Django; Cloudinary files get signed URLs of this lifetime
+PROTECTED_MEDIA_SERVER = env("PROTECTED_MEDIA_SERVER", default="")
+PROTECTED_MEDIA_ACCEL_PREFIX = env("PROTECTED_MEDIA_ACCEL_PREFIX", default="/protected-media/")
+PROTECTED_MEDIA_URL_TTL = env.int("PROTECTED_MEDIA_URL_TTL", default=300)
+
 
 # Domain handling
 if DEBUG:  # Development